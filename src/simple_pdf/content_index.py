@@ -0,0 +1,211 @@
+import os
+import time
+
+import fitz  # PyMuPDF
+
+# PDF 全文索引
+# 使用 SQLite FTS5 在本地文件中保存每一页的文本，search_pdf_content 按相关度返回 (文件, 页码, 片段)。
+# 索引按文件大小和修改时间增量更新：只重新提取新增或修改过的文件，已删除的文件从索引中移除。
+# 文本提取由调用方分派到批量处理的进程池中执行（见 server.update_content_index）。
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "simple_pdf", "content_index.sqlite3")
+# 页面行号 = 文档 id * PAGE_ROWID_STRIDE + 页码，删除文档时可以按行号区间删除
+PAGE_ROWID_STRIDE = 1 << 20
+# trigram 分词器只能匹配长度不小于 3 的词，更短的词使用 LIKE 过滤
+MIN_MATCH_TERM_LENGTH = 3
+SNIPPET_TOKENS = 64
+
+
+def get_index_path():
+    """索引文件路径，可通过 PDF_INDEX_PATH 配置"""
+    return os.environ.get("PDF_INDEX_PATH") or DEFAULT_INDEX_PATH
+
+
+def connect(index_path=None):
+    """打开索引数据库（必要时创建表结构）"""
+    # sqlite3 只有全文索引使用，第一次搜索时才导入
+    import sqlite3
+
+    index_path = index_path or get_index_path()
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    conn = sqlite3.connect(index_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS documents ("
+        "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime_ns INTEGER, "
+        "page_count INTEGER, error TEXT, indexed_at REAL)"
+    )
+    try:
+        # trigram 分词器支持中文等没有空格分词的文本（SQLite 3.34+）
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text)")
+    return conn
+
+
+def extract_page_texts(pdf_path):
+    """
+    提取每一页的纯文本（在工作进程中执行，必须是顶层函数以便于 pickling）。
+    Returns: (page_texts, error)
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            return [page.get_text() for page in doc], None
+    except Exception as e:
+        return [], str(e)
+
+
+def plan_update(roots, pattern="**/*.pdf", index_path=None):
+    """
+    扫描各个根目录，对比索引找出需要（重新）提取的文件，并删除已不存在的文件的索引。
+    Returns: (to_index [(path, size, mtime_ns)], removed_count, scanned_count)
+    """
+    import glob
+
+    conn = connect(index_path)
+    try:
+        indexed = {}
+        for doc_id, path, size, mtime_ns in conn.execute("SELECT id, path, size, mtime_ns FROM documents"):
+            indexed[path] = (doc_id, size, mtime_ns)
+
+        to_index = []
+        current = set()
+        for root in roots:
+            root = os.path.abspath(root)
+            for file_path in glob.glob(os.path.join(root, pattern), recursive=True):
+                file_path = os.path.abspath(file_path)
+                if file_path in current:
+                    continue
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                current.add(file_path)
+                entry = indexed.get(file_path)
+                if entry is None or entry[1] != st.st_size or entry[2] != st.st_mtime_ns:
+                    to_index.append((file_path, st.st_size, st.st_mtime_ns))
+
+        removed_count = 0
+        for path, (doc_id, _, _) in indexed.items():
+            if path in current or not _is_under_roots(path, roots):
+                continue
+            _delete_document(conn, doc_id)
+            removed_count += 1
+        conn.commit()
+        return to_index, removed_count, len(current)
+    finally:
+        conn.close()
+
+
+def _is_under_roots(path, roots):
+    for root in roots:
+        root = os.path.join(os.path.abspath(root), "")
+        if path.startswith(root):
+            return True
+    return False
+
+
+def _delete_document(conn, doc_id):
+    conn.execute(
+        "DELETE FROM pages WHERE rowid >= ? AND rowid < ?",
+        (doc_id * PAGE_ROWID_STRIDE, (doc_id + 1) * PAGE_ROWID_STRIDE)
+    )
+    conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+
+def store_document(path, size, mtime_ns, page_texts, error=None, index_path=None):
+    """写入（替换）一个文件的全部页面文本。提取失败的文件也会记录，文件未变化时不再重试"""
+    conn = connect(index_path)
+    try:
+        row = conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row:
+            _delete_document(conn, row[0])
+        cursor = conn.execute(
+            "INSERT INTO documents (path, size, mtime_ns, page_count, error, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, len(page_texts), error, time.time())
+        )
+        doc_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO pages (rowid, text) VALUES (?, ?)",
+            [
+                (doc_id * PAGE_ROWID_STRIDE + i, text)
+                for i, text in enumerate(page_texts[:PAGE_ROWID_STRIDE])
+                if text.strip()
+            ]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _build_match_query(terms):
+    """把查询词转换为 FTS5 MATCH 表达式（每个词作为短语，多个词之间为 AND）"""
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search(query, roots=None, limit=20, index_path=None):
+    """
+    全文搜索。多个词（空格分隔）需同时出现在同一页中；
+    roots 不为空时只返回这些目录下的文件。
+    Returns: [(path, page_number, snippet, score)]，按相关度降序
+    """
+    terms = [t for t in query.split() if t]
+    if not terms:
+        return []
+    match_terms = [t for t in terms if len(t) >= MIN_MATCH_TERM_LENGTH]
+    like_terms = [t for t in terms if len(t) < MIN_MATCH_TERM_LENGTH]
+
+    conditions = []
+    params = []
+    if match_terms:
+        conditions.append("pages MATCH ?")
+        params.append(_build_match_query(match_terms))
+    for term in like_terms:
+        conditions.append("pages.text LIKE ? ESCAPE '\\'")
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+    if roots:
+        root_conditions = []
+        for root in roots:
+            prefix = os.path.join(os.path.abspath(root), "")
+            root_conditions.append("substr(d.path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        conditions.append("(" + " OR ".join(root_conditions) + ")")
+
+    if match_terms:
+        snippet_expr = f"snippet(pages, 0, '[', ']', '...', {SNIPPET_TOKENS})"
+        order = "bm25(pages)"
+    else:
+        # 短词无法使用 MATCH，只能返回页面开头作为片段，按文件和页码排序
+        snippet_expr = "substr(pages.text, 1, 200)"
+        order = "pages.rowid"
+
+    sql = (
+        f"SELECT d.path, pages.rowid, {snippet_expr}, {'bm25(pages)' if match_terms else '0'} "
+        f"FROM pages JOIN documents d ON d.id = pages.rowid / {PAGE_ROWID_STRIDE} "
+        f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ?"
+    )
+    params.append(limit)
+
+    conn = connect(index_path)
+    try:
+        results = []
+        for path, rowid, snippet, rank in conn.execute(sql, params):
+            snippet = " ".join(snippet.split())
+            # bm25 越小越相关，转换为越大越相关的分数
+            results.append((path, rowid % PAGE_ROWID_STRIDE + 1, snippet, -rank))
+        return results
+    finally:
+        conn.close()
+
+
+def index_stats(index_path=None):
+    """索引中的文档数、页数和提取失败的文件数"""
+    conn = connect(index_path)
+    try:
+        documents, pages, failed = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(page_count), 0), COUNT(error) FROM documents"
+        ).fetchone()
+        return {"documents": documents, "pages": pages, "failed": failed}
+    finally:
+        conn.close()
@@ -1,14 +1,9 @@
 import os
-import pypandoc
 import logging
 import sys
-from docx2pdf import convert
 
-# Try to import win32com for WPS support
-try:
-    import win32com.client
-except ImportError:
-    win32com = None
+# Conversion backends (pypandoc, docx2pdf, win32com) are imported on first use:
+# most sessions never convert documents, and the server must start without them.
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +22,8 @@ def markdown_to_docx(markdown_content: str, output_path: str) -> str:
         RuntimeError: If pandoc is not installed or conversion fails.
     """
     try:
+        import pypandoc
+
         # Verify pandoc is available
         # pypandoc.get_pandoc_version() will raise OSError if pandoc is not found
         try:
@@ -51,7 +48,9 @@ def convert_with_wps(docx_path: str, pdf_path: str):
     """
     Convert DOCX to PDF using WPS Office via COM interface.
     """
-    if not win32com:
+    try:
+        import win32com.client
+    except ImportError:
         raise ImportError("pywin32 is required for WPS conversion. Please install it with 'pip install pywin32'.")
 
     # Initialize COM
@@ -134,6 +133,8 @@ def docx_to_pdf(docx_path: str, pdf_path: str = None) -> str:
             
         # Strategy 1: Try MS Word (via docx2pdf)
         try:
+            from docx2pdf import convert
+
             # convert() uses 'Word.Application' COM object
             convert(docx_path, pdf_path)
             return pdf_path
@@ -0,0 +1,190 @@
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+# 已打开文档的缓存
+# 单文件工具（extract_pdf_content / get_pdf_metadata）在多次调用之间复用同一个 fitz.Document，
+# 避免每次请求都重新解析大文件的 xref 表和对象流。
+# 缓存按文件大小和修改时间校验，文件变化后自动重新打开；句柄数和总大小有上限，按最近使用淘汰。
+# 被淘汰的文档如果仍在使用中，会在最后一个使用者释放后再关闭。
+
+DEFAULT_MAX_HANDLES = 8
+DEFAULT_MAX_MB = 512
+
+_cache = None
+_cache_lock = threading.Lock()
+_uncached = None
+
+
+class CachedDocument:
+    """缓存中的一个已打开文档，以及打开时读取的页数、元数据和目录"""
+
+    def __init__(self, path, doc, size, mtime_ns):
+        self.path = path
+        self.doc = doc
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.page_count = doc.page_count
+        self.metadata = dict(doc.metadata or {})
+        self.toc = doc.get_toc()
+        # 文档级版面信息（layout_profile.LayoutProfile），第一次提取文本时计算
+        self.layout = None
+        # fitz.Document 不是线程安全的，同一文档的解析操作需要串行
+        self.lock = threading.Lock()
+        self.users = 0
+        self.uses = 0
+        self.evicted = False
+        self.opened_at = time.time()
+
+
+class DocumentCache:
+    """
+    已打开文档的 LRU 缓存。
+    max_handles: 最多同时缓存的文档数，为 0 时不缓存（每次打开、用完即关闭）
+    max_bytes: 缓存文档的文件总大小上限（作为 MuPDF 内存占用的近似）
+    """
+
+    def __init__(self, max_handles, max_bytes):
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, path, exclusive=True):
+        """
+        获取文档（with 语句中使用）。
+        exclusive: 为 True 时持有该文档的锁，用于访问 doc 本身；只读取缓存的页数/元数据/目录时可设为 False。
+        """
+        entry = self._checkout(path)
+        try:
+            if exclusive:
+                with entry.lock:
+                    yield entry
+            else:
+                yield entry
+        finally:
+            self._release(entry)
+
+    def _checkout(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                self._entries.move_to_end(path)
+                entry.users += 1
+                entry.uses += 1
+                self.hits += 1
+                return entry
+            if entry is not None:
+                # 文件已变化，丢弃旧句柄
+                self._evict(path)
+            self.misses += 1
+
+        # 打开文档较慢，在缓存锁之外进行
+        doc = fitz.open(path)
+        try:
+            entry = CachedDocument(path, doc, st.st_size, st.st_mtime_ns)
+        except Exception:
+            doc.close()
+            raise
+        entry.users = 1
+        entry.uses = 1
+
+        with self._lock:
+            if path in self._entries:
+                # 其他线程同时打开了同一文件，以新打开的为准
+                self._evict(path)
+            if self.max_handles > 0 and entry.size <= self.max_bytes:
+                self._entries[path] = entry
+                self._shrink()
+            else:
+                entry.evicted = True
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            if entry.evicted and entry.users == 0:
+                entry.doc.close()
+
+    def _evict(self, path):
+        entry = self._entries.pop(path)
+        entry.evicted = True
+        self.evictions += 1
+        if entry.users == 0:
+            entry.doc.close()
+
+    def _total_bytes(self):
+        return sum(entry.size for entry in self._entries.values())
+
+    def _shrink(self):
+        """淘汰最久未使用的文档，直到满足句柄数和总大小上限（至少保留最新的一个）"""
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_handles or self._total_bytes() > self.max_bytes
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def stats(self):
+        """缓存占用情况"""
+        with self._lock:
+            return {
+                "handles": len(self._entries),
+                "max_handles": self.max_handles,
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "documents": [
+                    {
+                        "path": entry.path,
+                        "pages": entry.page_count,
+                        "size": entry.size,
+                        "in_use": entry.users,
+                        "uses": entry.uses,
+                    }
+                    for entry in reversed(self._entries.values())
+                ],
+            }
+
+    def clear(self):
+        """关闭所有缓存的文档（服务器退出时调用）"""
+        with self._lock:
+            for path in list(self._entries):
+                self._evict(path)
+
+
+def _read_env(name, default):
+    try:
+        return max(0, int(os.environ.get(name) or default))
+    except ValueError:
+        return default
+
+
+def get_document_cache(use_cache=True):
+    """
+    获取（必要时创建）共享的文档缓存。
+    句柄数上限由 PDF_DOC_CACHE_MAX_HANDLES 配置（0 表示不缓存），总大小上限由 PDF_DOC_CACHE_MAX_MB 配置。
+    use_cache 为 False 时返回不缓存任何文档的实例（每次打开、用完即关闭）。
+    """
+    global _cache, _uncached
+    with _cache_lock:
+        if not use_cache:
+            if _uncached is None:
+                _uncached = DocumentCache(0, 0)
+            return _uncached
+        if _cache is None:
+            _cache = DocumentCache(
+                _read_env("PDF_DOC_CACHE_MAX_HANDLES", DEFAULT_MAX_HANDLES),
+                _read_env("PDF_DOC_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024
+            )
+        return _cache
@@ -0,0 +1,359 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+import sys
+import threading
+import time
+
+# 工具执行层
+# 所有 CPU/IO 密集型的工具处理函数都通过 run_blocking 分派到有界线程池中执行，
+# 这样在处理大文件（例如 800 页的标准模式提取）时，stdio 服务器的事件循环仍然可以
+# 响应其他请求（例如 get_pdf_metadata）。
+
+# 线程池大小，可通过环境变量 PDF_MAX_THREADS 配置
+# 注意不要与 CPU 核心数一一对应：单核机器上也必须保留空闲线程来响应轻量请求，
+# 真正的并发上限由下方的按工具限流控制
+DEFAULT_MAX_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+# 每个工具允许的最大并发数，未列出的工具使用 DEFAULT_TOOL_LIMIT
+DEFAULT_TOOL_LIMIT = 2
+TOOL_CONCURRENCY_LIMITS = {
+    "extract_pdf_content": 2,
+    "get_pdf_metadata": 4,
+    "search_pdf_files": 2,
+    "search_pdf_content": 2,
+    "generate_index_file": 1,
+    "convert_markdown_to_docx": 1,
+    # Word/WPS 的 COM 自动化不支持并发调用
+    "convert_docx_to_pdf": 1,
+}
+
+# 批量工具共享的常驻进程池
+# 进程数可通过 PDF_MAX_WORKERS 配置。为限制 MuPDF 长期运行导致的内存增长，进程池累计处理
+# 工作进程数 × PDF_WORKER_MAX_TASKS 个任务后，在下一次提交任务时（没有未完成的任务）整体重建。
+# 不使用 ProcessPoolExecutor 的 max_tasks_per_child：工作进程到达上限退出后，
+# 进程池不会补充新的工作进程，剩余任务永远等待（CPython 3.11 - 3.13 均可复现）。
+DEFAULT_MAX_WORKERS = min(32, os.cpu_count() or 4)
+DEFAULT_MAX_TASKS_PER_CHILD = 50
+# forkserver 模式下预加载的模块，工作进程 fork 时 fitz/mcp 已经导入完成
+WORKER_PRELOAD_MODULES = ["simple_pdf.server"]
+
+_thread_pool = None
+_thread_pool_size = 0
+_tool_semaphores = {}
+# 各工具正在线程池中执行的调用数和等待并发名额的调用数（只在事件循环线程中修改）
+_tool_running = {}
+_tool_waiting = {}
+_process_pool = None
+_process_pool_workers = 0
+# 当前进程池已提交的任务数和未完成的任务数
+_process_pool_tasks = 0
+_process_pool_pending = 0
+# 所有进程池累计完成的任务数，以及忙碌的工作进程数对时间的累计（用于计算平均利用率）
+_process_tasks_completed = 0
+_process_busy_seconds = 0.0
+_process_capacity_seconds = 0.0
+_process_last_change = None
+_process_pool_lock = threading.Lock()
+
+
+def _read_int_env(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        return default
+
+
+def get_thread_pool():
+    """获取（必要时创建）共享的工具线程池"""
+    global _thread_pool, _thread_pool_size
+    if _thread_pool is None:
+        max_workers = _read_int_env("PDF_MAX_THREADS", DEFAULT_MAX_THREADS)
+        _thread_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="simple-pdf-tool"
+        )
+        _thread_pool_size = max_workers
+    return _thread_pool
+
+
+def _get_tool_semaphore(tool_name):
+    semaphore = _tool_semaphores.get(tool_name)
+    if semaphore is None:
+        limit = TOOL_CONCURRENCY_LIMITS.get(tool_name, DEFAULT_TOOL_LIMIT)
+        semaphore = asyncio.Semaphore(limit)
+        _tool_semaphores[tool_name] = semaphore
+    return semaphore
+
+
+async def run_blocking(tool_name, func, *args, **kwargs):
+    """
+    在共享线程池中执行同步函数，并按工具名限制并发数。
+    超过并发上限的调用会在事件循环中排队等待，而不会占用线程池中的线程。
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _get_tool_semaphore(tool_name)
+    _tool_waiting[tool_name] = _tool_waiting.get(tool_name, 0) + 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _tool_waiting[tool_name] -= 1
+    _tool_running[tool_name] = _tool_running.get(tool_name, 0) + 1
+    try:
+        return await loop.run_in_executor(
+            get_thread_pool(),
+            functools.partial(func, *args, **kwargs)
+        )
+    finally:
+        _tool_running[tool_name] -= 1
+        semaphore.release()
+
+
+def _get_worker_context():
+    """
+    选择工作进程的启动方式。
+    优先使用 forkserver（Linux/macOS）：只在 forkserver 中导入一次 simple_pdf.server，
+    之后每个工作进程都从已经完成导入的 forkserver fork 出来；Windows 上只能使用 spawn。
+    multiprocessing 在第一次使用进程池时才导入，不计入服务器的启动时间。
+    """
+    import multiprocessing
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(WORKER_PRELOAD_MODULES)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _init_worker():
+    """
+    工作进程初始化：把标准输出重定向到标准错误。
+    MCP 使用 stdio 传输协议消息，工作进程继承了服务器的 stdout，
+    任何第三方库的 print 输出都会破坏协议流。
+    """
+    try:
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    except (AttributeError, OSError, ValueError):
+        sys.stdout = sys.stderr
+
+
+def _account_busy():
+    """累计上次变化以来忙碌的工作进程数 × 时间（调用方持有 _process_pool_lock，在未完成任务数变化之前调用）"""
+    global _process_busy_seconds, _process_capacity_seconds, _process_last_change
+    now = time.perf_counter()
+    if _process_pool is not None and _process_last_change is not None:
+        elapsed = now - _process_last_change
+        _process_busy_seconds += min(_process_pool_pending, _process_pool_workers) * elapsed
+        _process_capacity_seconds += _process_pool_workers * elapsed
+    _process_last_change = now
+
+
+def get_process_pool(reserve=0):
+    """
+    获取（必要时创建）批量工具共享的常驻进程池；已用满任务数且空闲的进程池会被回收重建。
+    reserve: 即将提交的任务数，在同一临界区内计入未完成任务数，
+        避免在取得进程池和提交任务之间，其他调用方认为进程池空闲而将其回收
+    """
+    global _process_pool, _process_pool_workers, _process_pool_tasks, _process_pool_pending
+    with _process_pool_lock:
+        _account_busy()
+        if _process_pool is not None and _process_pool_pending == 0:
+            max_tasks = _process_pool_workers * _read_int_env("PDF_WORKER_MAX_TASKS", DEFAULT_MAX_TASKS_PER_CHILD)
+            if _process_pool_tasks >= max_tasks:
+                _process_pool.shutdown(wait=False)
+                _process_pool = None
+        if _process_pool is None:
+            max_workers = _read_int_env("PDF_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+            _process_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=_get_worker_context(),
+                initializer=_init_worker,
+            )
+            _process_pool_workers = max_workers
+            _process_pool_tasks = 0
+            _process_pool_pending = 0
+        if reserve:
+            _process_pool_tasks += reserve
+            _process_pool_pending += reserve
+        return _process_pool
+
+
+def _task_done(pool, future):
+    global _process_pool_pending, _process_tasks_completed
+    with _process_pool_lock:
+        _process_tasks_completed += 1
+        if pool is _process_pool:
+            _account_busy()
+            _process_pool_pending -= 1
+
+
+def _release_reserved(pool, count):
+    """撤销未能提交的任务在未完成任务数中的登记"""
+    global _process_pool_pending
+    with _process_pool_lock:
+        if count and pool is _process_pool:
+            _account_busy()
+            _process_pool_pending -= count
+
+
+def _submit_calls(calls):
+    """
+    向常驻进程池提交一组 (func, args) 调用（即 func(args)），记录任务数用于回收进程池。
+    取得进程池时即登记全部任务，登记之后进程池不会被回收；如果进程池在此之前已损坏并被其他调用方丢弃
+    （提交时报告已关闭），且还没有提交任何任务，则改用重新创建的进程池。
+    Returns: (pool, futures)
+    """
+    calls = list(calls)
+    for attempt in range(2):
+        pool = get_process_pool(reserve=len(calls))
+        futures = []
+        try:
+            for func, args in calls:
+                future = pool.submit(func, args)
+                future.add_done_callback(functools.partial(_task_done, pool))
+                futures.append(future)
+        except concurrent.futures.BrokenExecutor:
+            _release_reserved(pool, len(calls) - len(futures))
+            _discard_process_pool(pool)
+            raise
+        except RuntimeError:
+            # cannot schedule new futures after shutdown
+            _release_reserved(pool, len(calls) - len(futures))
+            if futures or attempt:
+                raise
+            continue
+        return pool, futures
+
+
+def get_process_pool_size():
+    """进程池的工作进程数（进程池尚未创建时返回配置值）"""
+    if _process_pool is not None:
+        return _process_pool_workers
+    return _read_int_env("PDF_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+
+
+def _discard_process_pool(pool):
+    """丢弃已损坏的进程池（例如工作进程被 OOM 杀死），下次调用时重新创建"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _account_busy()
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_executor_stats():
+    """
+    执行层的占用情况：线程池中各工具运行中/等待并发名额的调用数，
+    进程池中忙碌的工作进程数、排队的任务数（队列深度）和利用率（当前值与进程池创建以来的平均值）
+    """
+    with _process_pool_lock:
+        _account_busy()
+        started = _process_pool is not None
+        workers = get_process_pool_size()
+        pending = _process_pool_pending if started else 0
+        busy = min(pending, workers)
+        process_pool = {
+            "started": started,
+            "workers": workers,
+            "busy": busy,
+            "queued": pending - busy,
+            "utilization": round(busy / workers, 3) if workers else None,
+            "average_utilization": round(_process_busy_seconds / _process_capacity_seconds, 3) if _process_capacity_seconds else None,
+            "tasks_completed": _process_tasks_completed,
+            "tasks_since_recycle": _process_pool_tasks if started else 0,
+        }
+    tools = {
+        name: {
+            "running": _tool_running.get(name, 0),
+            "waiting": _tool_waiting.get(name, 0),
+            "limit": TOOL_CONCURRENCY_LIMITS.get(name, DEFAULT_TOOL_LIMIT),
+        }
+        for name in sorted(set(_tool_running) | set(_tool_waiting))
+    }
+    return {
+        "thread_pool": {
+            "max_threads": _thread_pool_size or _read_int_env("PDF_MAX_THREADS", DEFAULT_MAX_THREADS),
+            "running": sum(tool["running"] for tool in tools.values()),
+            "waiting": sum(tool["waiting"] for tool in tools.values()),
+            "tools": tools,
+        },
+        "process_pool": process_pool,
+    }
+
+
+def _warm_up_worker(_=None):
+    return os.getpid()
+
+
+def warm_up_process_pool():
+    """
+    预热进程池：一次性提交与工作进程数相同的空任务，让所有工作进程提前启动。
+    提交任务时会同步启动进程，因此放在线程池中执行，不阻塞事件循环。
+    """
+    def _submit():
+        _, futures = _submit_calls([(_warm_up_worker, None)] * get_process_pool_size())
+        return futures
+    return get_thread_pool().submit(_submit)
+
+
+async def run_in_process_pool(calls):
+    """
+    在常驻进程池中并行执行一组 (func, args) 调用（即 func(args)），按输入顺序返回结果列表。
+    如果进程池已损坏，丢弃它以便下次调用重建，并将异常抛给调用方。
+    """
+    loop = asyncio.get_running_loop()
+
+    pool, futures = await loop.run_in_executor(get_thread_pool(), _submit_calls, calls)
+    try:
+        return await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    except concurrent.futures.BrokenExecutor:
+        _discard_process_pool(pool)
+        raise
+
+
+async def iter_process_pool(calls):
+    """
+    在常驻进程池中并行执行一组 (func, args) 调用，按完成顺序逐个产出 (序号, 结果)。
+    调用方可以边执行边消费结果，而不必等待整个批次结束。
+    """
+    loop = asyncio.get_running_loop()
+
+    pool, futures = await loop.run_in_executor(get_thread_pool(), _submit_calls, calls)
+
+    async def _wait(idx, future):
+        return idx, await asyncio.wrap_future(future)
+
+    try:
+        for next_done in asyncio.as_completed([_wait(idx, f) for idx, f in enumerate(futures)]):
+            yield await next_done
+    except concurrent.futures.BrokenExecutor:
+        _discard_process_pool(pool)
+        raise
+    finally:
+        # 调用方提前退出时取消尚未开始的任务
+        for future in futures:
+            future.cancel()
+
+
+async def map_in_process_pool(func, args_list):
+    """在常驻进程池中并行执行 func(args)，按输入顺序返回结果列表"""
+    return await run_in_process_pool([(func, args) for args in args_list])
+
+
+def shutdown():
+    """关闭执行层（服务器退出时调用）"""
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+    _tool_semaphores.clear()
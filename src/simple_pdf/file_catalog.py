@@ -0,0 +1,308 @@
+import concurrent.futures
+import fnmatch
+import heapq
+import json
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+
+# PDF 文件名目录（search_pdf_files 使用）
+# 每个搜索根目录的扫描结果保存在内存中，并持久化到本地文件，服务器重启后无需重新全量扫描。
+# 刷新是增量的：目录的修改时间没有变化时直接沿用上次的文件列表，只需要 stat 而不需要重新列出目录。
+# 文件名按 trigram 建立倒排索引，查询时先用 trigram 缩小候选范围，再对候选计算模糊匹配分数。
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".cache", "simple_pdf", "file_catalog.json")
+CATALOG_VERSION = 1
+# 目录扫描结果的有效期（秒），过期后在后台重新扫描，查询继续使用旧结果
+DEFAULT_CATALOG_TTL = 60
+# 出现在超过该比例文件名中的 trigram（例如 ".pd"、"pdf"）没有区分度，不参与候选筛选
+STOP_GRAM_RATIO = 0.5
+# 进入模糊打分的最大候选数（按共享 trigram 数排序）
+MAX_FUZZY_CANDIDATES = 2000
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def score_filename(query_lower, filename_lower, threshold):
+    """
+    文件名匹配分数，与原先逐个文件比较的规则相同：
+    包含查询串时给 0.8 以上的高分（越短的完全匹配分数越高），否则使用 difflib 相似度。
+    Returns: 分数；低于阈值时返回 None
+    """
+    if query_lower in filename_lower:
+        return 0.8 + (len(query_lower) / len(filename_lower)) * 0.2
+    # 长度决定了 ratio 的上界 2 * min / (len_a + len_b)（即 real_quick_ratio），先排除不可能达到阈值的文件
+    total_length = len(query_lower) + len(filename_lower)
+    if 2 * min(len(query_lower), len(filename_lower)) < threshold * total_length:
+        return None
+    # difflib 只有文件名搜索使用，在这里才导入，缩短服务器启动时间
+    import difflib
+
+    matcher = difflib.SequenceMatcher(None, query_lower, filename_lower)
+    if matcher.quick_ratio() < threshold:
+        return None
+    ratio = matcher.ratio()
+    return ratio if ratio >= threshold else None
+
+
+class RootIndex:
+    """一个根目录下所有 PDF 文件名的 trigram 倒排索引"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.names = [os.path.basename(p).lower() for p in paths]
+        grams = {}
+        for file_id, name in enumerate(self.names):
+            for gram in _trigrams(name):
+                postings = grams.get(gram)
+                if postings is None:
+                    postings = grams[gram] = array("I")
+                postings.append(file_id)
+        self.grams = grams
+        self.by_length = {}
+        for file_id, name in enumerate(self.names):
+            self.by_length.setdefault(len(name), []).append(file_id)
+        self.stop_limit = max(1, int(len(paths) * STOP_GRAM_RATIO))
+
+    def candidates(self, query_lower):
+        """
+        根据共享的 trigram 数筛选候选文件 id（最多 MAX_FUZZY_CANDIDATES 个）。
+        查询太短或只包含高频 trigram 时返回 None，由调用方逐个比较所有文件名。
+        与查询没有任何共同 trigram 的文件名不会成为候选。
+        """
+        if len(query_lower) < 3:
+            return None
+        useful = []
+        has_stop_gram = False
+        for gram in _trigrams(query_lower):
+            postings = self.grams.get(gram)
+            if postings is None:
+                continue
+            if len(postings) > self.stop_limit:
+                has_stop_gram = True
+            else:
+                useful.append(postings)
+        if not useful:
+            return None if has_stop_gram else []
+        counts = Counter()
+        for postings in useful:
+            counts.update(postings)
+        if len(counts) <= MAX_FUZZY_CANDIDATES:
+            return list(counts)
+        # 按 trigram 的 Dice 系数排序（与 difflib 相似度一样对长文件名有惩罚），取前 MAX_FUZZY_CANDIDATES 个
+        names = self.names
+        query_grams = len(query_lower) - 2
+        return heapq.nlargest(
+            MAX_FUZZY_CANDIDATES, counts,
+            key=lambda file_id: counts[file_id] / (query_grams + len(names[file_id]))
+        )
+
+    def _ids_in_length_window(self, query_length, threshold):
+        """文件名长度使相似度上界 2 * min / (len_a + len_b) 不低于阈值的文件 id"""
+        for length, file_ids in self.by_length.items():
+            if 2 * min(query_length, length) >= threshold * (query_length + length):
+                yield from file_ids
+
+    def search(self, query_lower, threshold, limit):
+        """Returns: 分数最高的 limit 个 [(score, path)]"""
+        names = self.names
+        file_ids = self.candidates(query_lower)
+        if file_ids is None:
+            # 全量比较：包含查询串的文件分数只取决于文件名长度，只需要最短的 limit 个；
+            # 模糊匹配只考虑长度可能达到阈值的文件名
+            substring_ids = [i for i, name in enumerate(names) if query_lower in name]
+            shortest_ids = heapq.nsmallest(limit, substring_ids, key=lambda i: len(names[i]))
+            substring_ids = set(substring_ids)
+            file_ids = shortest_ids + [
+                i for i in self._ids_in_length_window(len(query_lower), threshold) if i not in substring_ids
+            ]
+        
+        # 最小堆保留当前分数最高的 limit 个 (score, -顺序, file_id)；
+        # 堆满后以堆顶分数作为阈值，quick_ratio 等上界可以排除更多候选
+        heap = []
+        for order, file_id in enumerate(file_ids):
+            bound = max(threshold, heap[0][0]) if len(heap) >= limit else threshold
+            score = score_filename(query_lower, names[file_id], bound)
+            if score is None:
+                continue
+            item = (score, -order, file_id)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        return [(score, self.paths[file_id]) for score, _, file_id in sorted(heap, reverse=True)]
+
+
+class FileCatalog:
+    """
+    多个搜索根目录的 PDF 文件目录。
+    roots: {根目录: {"dirs": {目录: [mtime_ns, [PDF 文件名], [子目录名]]}, "scanned_at": 时间戳}}
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.roots = {}
+        self._indexes = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                self.roots = data.get("roots", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        """原子写入目录文件；写入失败只影响下次启动的速度，直接忽略"""
+        with self._lock:
+            data = {"version": CATALOG_VERSION, "roots": dict(self.roots)}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _scan_root(root, old_dirs):
+        """
+        增量扫描一个根目录（与 glob 的 "**/*.pdf" 规则一致，跳过以 . 开头的文件和目录）。
+        目录修改时间未变化时沿用上次的列表，只有新增/删除/重命名过条目的目录才重新列出。
+        """
+        dirs = {}
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+            cached = old_dirs.get(dir_path)
+            if cached and cached[0] == mtime_ns:
+                pdf_names, sub_names = cached[1], cached[2]
+            else:
+                pdf_names, sub_names = [], []
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            if entry.name.startswith("."):
+                                continue
+                            try:
+                                if entry.is_dir():
+                                    sub_names.append(entry.name)
+                                elif fnmatch.fnmatch(entry.name, "*.pdf"):
+                                    pdf_names.append(entry.name)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+            dirs[dir_path] = [mtime_ns, pdf_names, sub_names]
+            stack.extend(os.path.join(dir_path, name) for name in sub_names)
+        return dirs
+
+    def refresh(self, roots):
+        """并行扫描多个根目录（每个根目录一个线程，网络共享上的扫描主要是 IO 等待）"""
+        roots = list(roots)
+        if not roots:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(roots), thread_name_prefix="simple-pdf-catalog") as pool:
+            futures = {
+                root: pool.submit(self._scan_root, root, self.roots.get(root, {}).get("dirs", {}))
+                for root in roots
+            }
+            for root, future in futures.items():
+                dirs = future.result()
+                old = self.roots.get(root)
+                # 目录有变化时在这里（通常是后台刷新线程）重建索引，查询时不需要等待
+                index = self._indexes.get(root)
+                if index is None or old is None or old["dirs"] != dirs:
+                    index = RootIndex(self._collect_paths(dirs))
+                with self._lock:
+                    self.roots[root] = {"dirs": dirs, "scanned_at": time.time()}
+                    self._indexes[root] = index
+        self.save()
+
+    def _refresh_in_background(self, roots):
+        with self._lock:
+            roots = [r for r in roots if r not in self._refreshing]
+            self._refreshing.update(roots)
+        if not roots:
+            return
+
+        def _run():
+            try:
+                self.refresh(roots)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(roots)
+
+        threading.Thread(target=_run, name="simple-pdf-catalog-refresh", daemon=True).start()
+
+    def ensure_fresh(self, roots):
+        """从未扫描过的根目录同步扫描；结果已过期的根目录在后台重新扫描"""
+        now = time.time()
+        missing = [r for r in roots if r not in self.roots]
+        stale = [r for r in roots if r in self.roots and now - self.roots[r]["scanned_at"] > self.ttl]
+        if missing:
+            self.refresh(missing)
+        if stale:
+            self._refresh_in_background(stale)
+
+    @staticmethod
+    def _collect_paths(dirs):
+        return [os.path.join(d, name) for d, (_, pdf_names, _) in dirs.items() for name in pdf_names]
+
+    def _get_index(self, root):
+        index = self._indexes.get(root)
+        if index is None:
+            # 从本地文件加载的目录，首次查询时建立索引
+            index = RootIndex(self._collect_paths(self.roots[root]["dirs"]))
+            with self._lock:
+                self._indexes[root] = index
+        return index
+
+    def search(self, query, roots, threshold, limit):
+        """
+        在多个根目录中搜索文件名，每个根目录返回分数最高的 limit 个结果。
+        Returns: (扫描文件数, [(score, path)])
+        """
+        query_lower = query.lower()
+        scanned_count = 0
+        matches = []
+        for root in roots:
+            if root not in self.roots:
+                continue
+            index = self._get_index(root)
+            scanned_count += len(index.paths)
+            matches.extend(index.search(query_lower, threshold, limit))
+        return scanned_count, matches
+
+
+def get_file_catalog():
+    """
+    获取（必要时创建）共享的文件目录。
+    目录文件路径由 PDF_CATALOG_PATH 配置，扫描结果有效期（秒）由 PDF_CATALOG_TTL 配置。
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            try:
+                ttl = float(os.environ.get("PDF_CATALOG_TTL") or DEFAULT_CATALOG_TTL)
+            except ValueError:
+                ttl = DEFAULT_CATALOG_TTL
+            _catalog = FileCatalog(os.environ.get("PDF_CATALOG_PATH") or DEFAULT_CATALOG_PATH, ttl)
+            _catalog.load()
+        return _catalog
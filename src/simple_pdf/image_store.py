@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+
+# 提取图片的去重存储
+# 同一文档中多次引用的图片（同一个 xref，例如每页重复的页眉 Logo）只保存一次，后续引用复用第一次出现时的文件名。
+# 批量处理时，内容相同的图片（跨文档）在共享目录中按 SHA-256 只保存一份，各 PDF 图片目录中的文件是指向它的硬链接；
+# 文件系统不支持硬链接时回退为普通写入。
+# 所有图片文件都以"临时文件 + 原子替换"的方式写入，覆盖已有文件时不会通过硬链接改动共享内容。
+
+SHARED_IMAGE_DIRNAME = ".shared_images"
+
+
+def first_image_names(doc, end):
+    """
+    前 end 页中每个图片 xref 第一次出现时的文件名（不含扩展名），例如 "page_3_img_1"。
+    图片名只取决于文档本身，与本次提取的页码范围无关，因此页面缓存和分片处理的输出保持一致。
+    Returns: {xref: 文件名}
+    """
+    names = {}
+    for p in range(min(end, doc.page_count)):
+        for j, img in enumerate(doc.get_page_images(p)):
+            names.setdefault(img[0], f"page_{p + 1}_img_{j + 1}")
+    return names
+
+
+def get_shared_image_dir(base_dir):
+    """批量处理的共享图片目录（base_dir 为空时不做跨文档去重）"""
+    return os.path.join(base_dir, SHARED_IMAGE_DIRNAME) if base_dir else None
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_image_file(img_path, image_bytes, ext, shared_image_dir=None):
+    """
+    写入图片文件。指定 shared_image_dir 时，内容保存到共享目录（已存在则直接复用），img_path 为指向它的硬链接。
+    """
+    if shared_image_dir:
+        shared_path = os.path.join(shared_image_dir, f"{hashlib.sha256(image_bytes).hexdigest()}.{ext}")
+        tmp_path = f"{img_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if not os.path.exists(shared_path):
+                os.makedirs(shared_image_dir, exist_ok=True)
+                _atomic_write(shared_path, image_bytes)
+            os.link(shared_path, tmp_path)
+            os.replace(tmp_path, img_path)
+            # img_path 已经是指向同一内容的硬链接时（多个分片写入同一图片），rename 不做任何操作，临时链接仍然存在
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            return
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    _atomic_write(img_path, image_bytes)
+
+
+def prune_shared_images(shared_image_dir):
+    """删除共享目录中已没有任何图片目录引用的内容（硬链接数为 1）"""
+    if not shared_image_dir or not os.path.isdir(shared_image_dir):
+        return 0
+    removed = 0
+    with os.scandir(shared_image_dir) as it:
+        for entry in it:
+            try:
+                # Windows 上 DirEntry.stat() 不填写 st_nlink（始终为 0），必须用 os.stat 读取硬链接数
+                if entry.is_file() and os.stat(entry.path).st_nlink <= 1:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,143 @@
+import math
+import re
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+# 文档级版面信息
+# 正文字号、标题字号阈值、正文右边界和重复出现的页眉/页脚，原来按页从该页的文本块估计：
+# 每页都要重新统计，字数少的页面（目录页、章节首页、表格页）估计值不可靠。
+# 这里对整份文档只计算一次：从均匀抽样的若干页统计，结果与文档一起缓存，逐页处理时直接使用。
+# 抽样只取决于页数，批量分片处理时每个分片得到的结果相同，各页的判断标准一致。
+
+# 最多抽样的页数
+DEFAULT_SAMPLE_PAGES = 16
+# 页眉/页脚区域占页面高度的比例
+BAND_RATIO = 0.1
+# 文本在至少这么多比例的抽样页面的页眉/页脚区域出现时，视为重复的页眉/页脚（奇偶页页眉不同时各占约一半）
+REPEAT_RATIO = 0.4
+# 识别页眉/页脚至少需要的抽样页数
+MIN_REPEAT_PAGES = 3
+# 正文字号异常大（页面文字很少）时使用的默认值
+FALLBACK_BODY_SIZE = 12.0
+
+_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def sample_pages(page_count, max_samples=DEFAULT_SAMPLE_PAGES):
+    """均匀抽样的页码（从 0 开始）。每次取相邻的两页，保证奇数页和偶数页都有样本"""
+    if page_count <= max_samples:
+        return list(range(page_count))
+    pairs = max(1, max_samples // 2)
+    step = (page_count - 1) / pairs
+    pages = set()
+    for k in range(pairs):
+        start = int(k * step + step / 2)
+        pages.update((start, start + 1))
+    return sorted(p for p in pages if p < page_count)
+
+
+def normalize_running_text(text):
+    """页眉/页脚的比较用文本：忽略空白、大小写和数字（页码）"""
+    return re.sub(r"\d+", "#", "".join(text.split()).lower())
+
+
+def _block_text(block):
+    return "".join(span["text"] for line in block["lines"] for span in line["spans"])
+
+
+def _right_margin(x1s):
+    """正文右边界：最靠右的 20% 文本块右边界的平均值"""
+    x1s = sorted(x1s, reverse=True)
+    top_n = max(1, len(x1s) // 5)
+    return sum(x1s[:top_n]) / top_n
+
+
+class LayoutProfile:
+    """
+    文档级版面信息。
+    body_size: 正文字号（字符数最多的字号）
+    heading_sizes: 标题阈值 (一级, 二级, 三级)，字号超过阈值即视为对应级别的标题
+    right_margins: {(页宽, 奇偶页): 正文右边界}
+    running_texts: 重复出现的页眉/页脚文本（normalize_running_text 之后）
+    """
+
+    def __init__(self, body_size=10.0, right_margins=None, running_texts=None, sampled_pages=0):
+        self.body_size = body_size
+        self.heading_sizes = (body_size + 6, body_size + 3, body_size + 1)
+        self.right_margins = right_margins or {}
+        self.running_texts = frozenset(running_texts or ())
+        self.sampled_pages = sampled_pages
+
+    def body_right_margin(self, page):
+        """该页的正文右边界；没有同样版式的抽样页时返回 None"""
+        return self.right_margins.get((round(page.rect.width), page.number % 2))
+
+    def is_running_text(self, text, bbox, page_height):
+        """位于页眉/页脚区域、且在文档中重复出现的文本块（或页码）"""
+        if not self.running_texts:
+            return False
+        in_band = bbox[3] <= page_height * BAND_RATIO or bbox[1] >= page_height * (1 - BAND_RATIO)
+        if not in_band:
+            return False
+        # 单独成块的页码（有些页面的页码与页眉文字分成两个块）
+        normalized = normalize_running_text(text)
+        return normalized == "#" or normalized in self.running_texts
+
+    def to_dict(self):
+        return {
+            "body_size": self.body_size,
+            "heading_sizes": list(self.heading_sizes),
+            "right_margins": [[width, parity, round(x1, 2)] for (width, parity), x1 in sorted(self.right_margins.items())],
+            "running_texts": sorted(self.running_texts),
+            "sampled_pages": self.sampled_pages,
+        }
+
+
+def build_layout_profile(doc, max_samples=DEFAULT_SAMPLE_PAGES):
+    """从抽样页面统计文档的版面信息"""
+    pages = sample_pages(doc.page_count, max_samples)
+    sizes = Counter()
+    x1s = {}
+    band_texts = Counter()
+
+    for p in pages:
+        page = doc[p]
+        height = page.rect.height
+        blocks = page.get_text("dict", flags=_TEXT_FLAGS)["blocks"]
+        seen = set()
+        for b in blocks:
+            if b["type"] != 0:
+                continue
+            for line in b["lines"]:
+                for span in line["spans"]:
+                    # 按字符数加权：表格单元格、页码等短文本的 span 很多，按 span 计数会压过正文
+                    chars = len(span["text"].strip())
+                    if chars:
+                        sizes[round(span["size"], 1)] += chars
+            text = _block_text(b)
+            # 忽略太短的块（可能是页码或标题）
+            if len(text) > 10:
+                x1s.setdefault((round(page.rect.width), p % 2), []).append(b["bbox"][2])
+            y0, y1 = b["bbox"][1], b["bbox"][3]
+            if text.strip() and (y1 <= height * BAND_RATIO or y0 >= height * (1 - BAND_RATIO)):
+                seen.add(normalize_running_text(text))
+        band_texts.update(seen)
+
+    body_size = sizes.most_common(1)[0][0] if sizes else 10.0
+    if body_size > 20:
+        body_size = FALLBACK_BODY_SIZE
+
+    right_margins = {key: _right_margin(values) for key, values in x1s.items()}
+    # 奇偶页右边界相近时合并统计（只有双面排版、奇偶页版心左右错开时才需要分开）
+    for width in {key[0] for key in x1s}:
+        odd, even = (width, 1), (width, 0)
+        if odd in x1s and even in x1s and abs(right_margins[odd] - right_margins[even]) <= 5:
+            right_margins[odd] = right_margins[even] = _right_margin(x1s[odd] + x1s[even])
+
+    running_texts = set()
+    if len(pages) >= MIN_REPEAT_PAGES:
+        threshold = max(MIN_REPEAT_PAGES, math.ceil(len(pages) * REPEAT_RATIO))
+        running_texts = {text for text, count in band_texts.items() if count >= threshold}
+
+    return LayoutProfile(body_size, right_margins, running_texts, len(pages))
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# 增量批量提取清单
+# 清单保存在模式输出目录下，记录每个源 PDF 的大小、修改时间、内容哈希、提取参数和输出路径。
+# 再次运行时只处理新增或修改过的文件，并删除已被移除的源文件对应的输出。
+
+MANIFEST_FILENAME = ".extract_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ExtractManifest:
+    """
+    批量提取清单。
+    sources: {源文件绝对路径: {size, mtime_ns, sha256, options, root, pattern, outputs, pages, updated}}
+    """
+
+    def __init__(self, path, sources=None):
+        self.path = path
+        self.sources = sources or {}
+
+    @classmethod
+    def load(cls, output_dir):
+        """读取输出目录下的清单；不存在或损坏时返回空清单"""
+        path = os.path.join(output_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                return cls(path, data.get("sources", {}))
+        except (OSError, ValueError):
+            pass
+        return cls(path)
+
+    def save(self):
+        """原子写入清单（先写临时文件再替换），避免中断时留下损坏的清单"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sources": self.sources}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def check(self, source_path, options):
+        """
+        判断源文件相对清单是否未变化。
+        先比较大小和修改时间；两者有变化时再比较内容哈希（例如文件被复制或 touch 过）。
+        Returns: (unchanged, stat_info)
+            stat_info: (size, mtime_ns, sha256)，sha256 仅在需要时计算，否则沿用清单中的值
+        """
+        st = os.stat(source_path)
+        entry = self.sources.get(os.path.abspath(source_path))
+        if not entry or entry.get("options") != options or not self._outputs_exist(entry):
+            return False, (st.st_size, st.st_mtime_ns, file_sha256(source_path))
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return True, (st.st_size, st.st_mtime_ns, entry["sha256"])
+        sha256 = file_sha256(source_path)
+        return sha256 == entry["sha256"], (st.st_size, st.st_mtime_ns, sha256)
+
+    @staticmethod
+    def _outputs_exist(entry):
+        outputs = entry.get("outputs", {})
+        text_output = outputs.get("text")
+        image_dir = outputs.get("images")
+        if text_output and not os.path.exists(text_output):
+            return False
+        if image_dir and not os.path.isdir(image_dir):
+            return False
+        return True
+
+    def record(self, source_path, stat_info, options, root, pattern, outputs, pages):
+        size, mtime_ns, sha256 = stat_info
+        self.sources[os.path.abspath(source_path)] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "options": options,
+            "root": os.path.abspath(root),
+            "pattern": pattern,
+            "outputs": outputs,
+            "pages": pages,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def touch(self, source_path, stat_info):
+        """内容未变但修改时间变化时，更新清单中的 stat 信息，下次无需再计算哈希"""
+        entry = self.sources.get(os.path.abspath(source_path))
+        if entry:
+            entry["size"], entry["mtime_ns"], entry["sha256"] = stat_info
+
+    def known_pages(self, source_path, sha256):
+        """清单中记录的页数；仅在内容哈希与记录一致时有效，否则返回 None"""
+        entry = self.sources.get(os.path.abspath(source_path))
+        if entry and sha256 and entry.get("sha256") == sha256 and entry.get("pages"):
+            return entry["pages"]
+        return None
+
+    def forget(self, source_path):
+        self.sources.pop(os.path.abspath(source_path), None)
+
+    def remove_stale(self, root, pattern, current_sources):
+        """
+        删除同一 (root, pattern) 范围内、已不存在于 current_sources 中的源文件的输出，并从清单移除。
+        如果某个输出仍被其他条目引用（例如扁平输出下的同名文件），则保留该输出。
+        Returns: 被移除的源文件路径列表
+        """
+        root = os.path.abspath(root)
+        current = {os.path.abspath(p) for p in current_sources}
+        stale = [
+            path for path, entry in self.sources.items()
+            if entry.get("root") == root and entry.get("pattern") == pattern and path not in current
+        ]
+        # 先移除所有过期条目，再统计剩余条目引用的输出（只统计一次，删除大量源文件时也不会逐个重建）
+        stale_entries = [self.sources.pop(path) for path in stale]
+        referenced = set()
+        for other in self.sources.values():
+            referenced.update(v for v in other.get("outputs", {}).values() if v)
+        for entry in stale_entries:
+            outputs = entry.get("outputs", {})
+            text_output = outputs.get("text")
+            image_dir = outputs.get("images")
+            if text_output and text_output not in referenced and os.path.isfile(text_output):
+                os.remove(text_output)
+                # create_folder 模式下的专属文件夹为空时一并删除
+                try:
+                    os.rmdir(os.path.dirname(text_output))
+                except OSError:
+                    pass
+            if image_dir and image_dir not in referenced and os.path.isdir(image_dir):
+                shutil.rmtree(image_dir, ignore_errors=True)
+        return stale
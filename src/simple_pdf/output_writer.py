@@ -0,0 +1,355 @@
+import os
+import threading
+import time
+from collections import deque
+
+# 异步输出写入
+# 图片、矢量图、Markdown 和表格文件的写入交给后台写入线程完成，MuPDF 解析与磁盘 IO 重叠进行，
+# 慢速磁盘或网络共享不会让解析停下来等待每一次写入。
+# 待写入数据的总大小有上限：队列满时提交方阻塞等待（背压），避免解析速度远超写入速度时内存无限增长。
+# 写入线程每次取出队列中所有已到达的任务连续处理；已创建的目录会被记录，每个目录只创建一次。
+# 每个进程（服务器主进程和每个批量工作进程）各有一个写入器。
+# 逐页生成的大文件（批量提取的输出文件）通过 TextStream 分块写入，内存中最多只保留一个块。
+
+DEFAULT_WRITER_THREADS = 2
+DEFAULT_QUEUE_MB = 64
+# TextStream 累积到这么多字符后交给写入线程
+STREAM_CHUNK_CHARS = 256 * 1024
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class WriteGroup:
+    """
+    一组相关的写入（例如一次提取调用）。退出 with 语句时等待本组所有写入完成，
+    写入失败时抛出本组的第一个错误，保证调用方返回前文件已全部落盘。
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = 0
+        self.errors = []
+        self._done = threading.Condition()
+
+    def write(self, path, data):
+        """写入二进制文件"""
+        self.writer.submit(self, _write_file, (path, data), len(data), path)
+
+    def write_text(self, path, text):
+        """写入 UTF-8 文本文件（与文本模式 open 一样，把换行符转换为系统换行符）"""
+        if os.linesep != "\n":
+            text = text.replace("\n", os.linesep)
+        self.write(path, text.encode("utf-8"))
+
+    def call(self, func, *args, nbytes=0, path=None):
+        """在写入线程中执行 func(*args)，用于需要特殊写入方式的文件（例如硬链接去重的图片）"""
+        self.writer.submit(self, func, args, nbytes, path)
+
+    def open_text(self, path):
+        """分块顺序写入的 UTF-8 文本文件，与 with 语句一起使用（见 TextStream）"""
+        return TextStream(self, path)
+
+    def wait(self):
+        with self._done:
+            while self.pending:
+                self._done.wait()
+        if self.errors:
+            raise self.errors[0]
+
+    def _finish(self, error=None):
+        with self._done:
+            if error is not None:
+                self.errors.append(error)
+            self.pending -= 1
+            if not self.pending:
+                self._done.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.wait()
+        else:
+            # 已经在抛出异常：仍然等待写入结束（避免文件写到一半），但不覆盖原异常
+            with self._done:
+                while self.pending:
+                    self._done.wait()
+        return False
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class TextStream:
+    """
+    分块顺序写入的 UTF-8 文本文件，用于逐页生成、总大小不确定的输出。
+    write() 的文本累积到 STREAM_CHUNK_CHARS 后作为一个块交给写入线程，写入线程按提交顺序追加到临时文件
+    （多个写入线程时，先拿到锁的线程把已提交的块按顺序全部写出）。
+    正常退出 with 语句时把临时文件替换为目标文件；出错时删除临时文件，目标文件不会只写了一半。
+    """
+
+    def __init__(self, group, path, chunk_chars=STREAM_CHUNK_CHARS):
+        self.group = group
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.chunk_chars = chunk_chars
+        self._buffer = []
+        self._buffered = 0
+        self._chunks = deque()
+        self._lock = threading.Lock()
+        self._file = None
+        self._closed = False
+        self._failed = False
+
+    def write(self, text):
+        if not text:
+            return
+        if os.linesep != "\n":
+            text = text.replace("\n", os.linesep)
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.chunk_chars:
+            self.flush()
+
+    def flush(self):
+        """把已累积的文本作为一个块提交（队列已满时阻塞）"""
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer = []
+        self._buffered = 0
+        self._chunks.append(data)
+        self.group.writer.submit(self.group, self._drain, (), len(data), self.tmp_path, files=0)
+
+    def _drain_locked(self):
+        if self._closed or not self._chunks:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.tmp_path, "wb")
+            while self._chunks:
+                self._file.write(self._chunks[0])
+                self._chunks.popleft()
+        except Exception:
+            self._failed = True
+            raise
+
+    def _drain(self):
+        with self._lock:
+            self._drain_locked()
+
+    def _commit(self):
+        with self._lock:
+            self._drain_locked()
+            self._closed = True
+            if self._file is None:
+                if self._failed:
+                    return
+                self._file = open(self.tmp_path, "wb")
+            self._file.close()
+            if self._failed:
+                os.remove(self.tmp_path)
+                return
+            os.replace(self.tmp_path, self.path)
+
+    def _discard(self):
+        with self._lock:
+            self._closed = True
+            self._chunks.clear()
+            if self._file is not None:
+                self._file.close()
+                try:
+                    os.remove(self.tmp_path)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+            self.group.writer.submit(self.group, self._commit, (), 0, self.path)
+        else:
+            self._buffer = []
+            self.group.writer.submit(self.group, self._discard, (), 0, files=0)
+        return False
+
+
+class OutputWriter:
+    """
+    带有界队列的后台写入器。
+    threads: 写入线程数
+    max_pending_bytes: 队列中待写入数据的总大小上限（单个超过上限的任务在队列为空时仍可提交）
+    """
+
+    def __init__(self, threads, max_pending_bytes):
+        self.threads = max(1, threads)
+        self.max_pending_bytes = max_pending_bytes
+        self.files_written = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.max_queue_bytes = 0
+        self.errors = 0
+        self._queue = deque()
+        self._pending_bytes = 0
+        self._known_dirs = set()
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def group(self):
+        return WriteGroup(self)
+
+    def submit(self, group, func, args, nbytes, path=None, files=1):
+        """
+        提交写入任务；队列已满时阻塞，直到写入线程腾出空间。
+        files: 任务成功时计入的文件数（TextStream 的中间块为 0，整个文件只在完成时计一次）
+        """
+        self._ensure_started()
+        with self._cond:
+            if self._pending_bytes and self._pending_bytes + nbytes > self.max_pending_bytes:
+                start = time.perf_counter()
+                while self._pending_bytes and self._pending_bytes + nbytes > self.max_pending_bytes:
+                    self._cond.wait()
+                self.queue_wait_seconds += time.perf_counter() - start
+            with group._done:
+                group.pending += 1
+            self._queue.append((group, func, args, nbytes, path, files))
+            self._pending_bytes += nbytes
+            self.max_queue_bytes = max(self.max_queue_bytes, self._pending_bytes)
+            self._cond.notify_all()
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        with self._cond:
+            if self._workers:
+                return
+            for n in range(self.threads):
+                worker = threading.Thread(target=self._run, name=f"simple-pdf-writer-{n}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _ensure_dir(self, path):
+        directory = os.path.dirname(path)
+        if directory and directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # 一次取出所有已到达的任务，减少锁竞争和线程唤醒次数
+                batch = list(self._queue)
+                self._queue.clear()
+                if self.threads > 1 and len(batch) > 1:
+                    # 多个写入线程时只取一半，其余留给其他线程并行处理
+                    keep = batch[len(batch) // 2:]
+                    batch = batch[:len(batch) // 2]
+                    self._queue.extend(keep)
+                    self._cond.notify_all()
+            for group, func, args, nbytes, path, files in batch:
+                start = time.perf_counter()
+                error = None
+                try:
+                    if path:
+                        self._ensure_dir(path)
+                    try:
+                        func(*args)
+                    except FileNotFoundError:
+                        if not path:
+                            raise
+                        # 目录在记录之后被删除（例如清理了过期输出），重新创建后重试一次
+                        self._known_dirs.discard(os.path.dirname(path))
+                        self._ensure_dir(path)
+                        func(*args)
+                except Exception as e:
+                    error = e
+                elapsed = time.perf_counter() - start
+                with self._cond:
+                    self._pending_bytes -= nbytes
+                    self.write_seconds += elapsed
+                    if error is None:
+                        self.files_written += files
+                        self.bytes_written += nbytes
+                    else:
+                        self.errors += 1
+                    self._cond.notify_all()
+                group._finish(error)
+
+    def totals(self):
+        """累计写入量（可跨进程传递；批量工作进程用前后两次的差值统计单个任务，见 diff_write_stats）"""
+        with self._cond:
+            return {
+                "files": self.files_written,
+                "bytes": self.bytes_written,
+                "write_seconds": self.write_seconds,
+                "queue_wait_seconds": self.queue_wait_seconds,
+            }
+
+    def stats(self):
+        """写入吞吐量和队列等待时间"""
+        with self._cond:
+            return {
+                "threads": self.threads,
+                "max_pending_bytes": self.max_pending_bytes,
+                "pending_bytes": self._pending_bytes,
+                "max_queue_bytes": self.max_queue_bytes,
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "errors": self.errors,
+                "write_seconds": round(self.write_seconds, 3),
+                "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+                "throughput_mb_per_s": round(self.bytes_written / self.write_seconds / (1024 * 1024), 2) if self.write_seconds else None,
+            }
+
+
+def diff_write_stats(after, before):
+    return {key: after[key] - before[key] for key in after}
+
+
+def merge_write_stats(total, stats):
+    """把一组写入统计累加到 total 中"""
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def format_write_stats(stats):
+    """批量处理报告中的写入统计行"""
+    write_seconds = stats.get("write_seconds", 0)
+    mb = stats.get("bytes", 0) / (1024 * 1024)
+    throughput = f"{mb / write_seconds:.1f} MB/s" if write_seconds else "-"
+    return (
+        f"Writes: {stats.get('files', 0)} files, {mb:.1f} MB, "
+        f"write time {write_seconds:.2f}s ({throughput}), queue wait {stats.get('queue_wait_seconds', 0):.2f}s"
+    )
+
+
+def _read_env(name, default):
+    try:
+        return max(0, int(os.environ.get(name) or default))
+    except ValueError:
+        return default
+
+
+def get_output_writer():
+    """
+    获取（必要时创建）本进程的写入器。
+    写入线程数由 PDF_WRITER_THREADS 配置，队列上限（MB）由 PDF_WRITER_QUEUE_MB 配置。
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = OutputWriter(
+                _read_env("PDF_WRITER_THREADS", DEFAULT_WRITER_THREADS),
+                _read_env("PDF_WRITER_QUEUE_MB", DEFAULT_QUEUE_MB) * 1024 * 1024
+            )
+        return _writer
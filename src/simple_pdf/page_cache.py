@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+
+try:
+    from .manifest import file_sha256
+except ImportError:
+    from manifest import file_sha256
+
+# 单页提取结果的磁盘缓存
+# 缓存键由文档内容哈希、页码和所有影响输出的提取参数组成，同一文件的重叠页码范围或重复请求
+# 直接读取缓存，不再重复 find_tables / get_text("dict") / 段落合并。
+# 缓存总大小超过上限时，按最近使用时间（条目文件的 mtime，命中时刷新）淘汰最旧的条目。
+
+# 提取逻辑变化导致输出不同时递增，使旧缓存全部失效
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "simple_pdf", "pages")
+DEFAULT_CACHE_MAX_MB = 512
+# 淘汰时清理到上限的该比例，避免每次写入都触发全目录扫描
+EVICT_TARGET_RATIO = 0.9
+
+_cache = None
+_cache_lock = threading.Lock()
+# 文档哈希按 (路径, 大小, 修改时间) 记忆，避免每次请求都重新读取整个大文件
+_doc_hashes = {}
+MAX_DOC_HASHES = 1024
+
+
+class PageCache:
+    """
+    按内容寻址的单页结果缓存。
+    每个条目是 directory/<键哈希前两位>/<键哈希>.json，内容由调用方决定（需可 JSON 序列化）。
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(doc_hash, page_index, options):
+        return json.dumps([CACHE_VERSION, doc_hash, page_index, options], sort_keys=True, ensure_ascii=False)
+
+    def _entry_path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, key):
+        """读取缓存条目并刷新其最近使用时间；不存在或损坏时返回 None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        """写入缓存条目（原子替换）。缓存写入失败（例如磁盘已满）不影响提取结果，直接忽略"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry_size for _, entry_size, _ in self._scan())
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self):
+        """缓存命中统计（bytes 为本进程写入后跟踪的总大小，尚未写入过时为 None）"""
+        return {
+            "directory": self.directory,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _scan(self):
+        """列出所有缓存条目: [(mtime, size, path)]"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        """按最近使用时间淘汰最旧的条目，直到总大小降到上限的 EVICT_TARGET_RATIO 以下"""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+
+def get_page_cache():
+    """
+    获取（必要时创建）共享的页面缓存。
+    目录由 PDF_PAGE_CACHE_DIR 配置，大小上限由 PDF_PAGE_CACHE_MAX_MB 配置，设为 0 时禁用缓存并返回 None。
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                max_mb = int(os.environ.get("PDF_PAGE_CACHE_MAX_MB") or DEFAULT_CACHE_MAX_MB)
+            except ValueError:
+                max_mb = DEFAULT_CACHE_MAX_MB
+            if max_mb <= 0:
+                return None
+            directory = os.environ.get("PDF_PAGE_CACHE_DIR") or DEFAULT_CACHE_DIR
+            _cache = PageCache(directory, max_mb * 1024 * 1024)
+        return _cache
+
+
+def document_hash(path):
+    """文档内容的 SHA-256，按 (绝对路径, 大小, 修改时间) 记忆"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    doc_hash = _doc_hashes.get(memo_key)
+    if doc_hash is None:
+        doc_hash = file_sha256(path)
+        if len(_doc_hashes) >= MAX_DOC_HASHES:
+            _doc_hashes.clear()
+        _doc_hashes[memo_key] = doc_hash
+    return doc_hash
@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+import os
+
+# extract_pdf_content 的分页
+# 对几百上千页的文档，一次返回全部内容会撑满客户端上下文，服务器也要在内存中保留整个结果。
+# 设置 max_chars / max_pages 后，一次响应只包含预算内的页面（至少一页，页面不会被截断），
+# 还有剩余页面时返回续读游标。游标是 URL 安全 Base64 编码的 JSON：文档内容哈希、剩余页码和提取参数；
+# 续读时直接从下一页开始，不重新做关键词搜索，也不重新处理已返回的页面。文档内容变化后游标失效。
+
+CURSOR_VERSION = 1
+
+# 游标中记录（续读时沿用）的提取参数
+CURSOR_OPTIONS = (
+    "format", "include_text", "include_images", "use_local_images_only",
+    "image_output_dir", "image_link_base", "skip_table_detection", "max_chars", "max_pages",
+)
+
+
+def default_max_chars():
+    """工具调用未指定 max_chars 时的默认值（环境变量 PDF_MAX_RESPONSE_CHARS，未设置或为 0 时不分页）"""
+    try:
+        return max(0, int(os.environ.get("PDF_MAX_RESPONSE_CHARS") or 0))
+    except ValueError:
+        return 0
+
+
+def compress_pages(pages):
+    """0-based 页码列表转换为页码范围字符串（parse_page_range 的逆操作），例如 [0, 1, 2, 5] -> "1-3,6" """
+    parts = []
+    start = prev = None
+    for p in pages:
+        if start is None:
+            start = prev = p
+        elif p == prev + 1:
+            prev = p
+        else:
+            parts.append(f"{start + 1}-{prev + 1}" if prev > start else str(start + 1))
+            start = prev = p
+    if start is not None:
+        parts.append(f"{start + 1}-{prev + 1}" if prev > start else str(start + 1))
+    return ",".join(parts)
+
+
+def encode_cursor(doc_hash, pages, options):
+    """
+    生成续读游标。
+    pages: 剩余的 0-based 页码列表；options: 提取参数（只保留 CURSOR_OPTIONS 中的键）
+    """
+    data = {
+        "v": CURSOR_VERSION,
+        "doc": doc_hash,
+        "pages": compress_pages(pages),
+        "opts": {key: options.get(key) for key in CURSOR_OPTIONS},
+    }
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    解析续读游标。
+    Returns: (doc_hash, page_range, options)；游标无法解析时抛出 ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("cursor 无法解析")
+    if not isinstance(data, dict) or data.get("v") != CURSOR_VERSION or not data.get("pages"):
+        raise ValueError("cursor 无法解析")
+    options = {key: value for key, value in (data.get("opts") or {}).items() if key in CURSOR_OPTIONS}
+    return data.get("doc"), data["pages"], options
@@ -0,0 +1,241 @@
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# 按需性能分析（工具参数 profile）
+# 处理某个 PDF 特别慢时，不必再把文件复制出来另写脚本：在工具调用（或批量处理的每个任务）期间
+# 开启 cProfile，结果保存为 .pstats（可用 python -m pstats / snakeviz 查看），并在响应中列出累计耗时最多的函数。
+# profile="collapsed" 时另外启动采样线程，定期记录被分析线程的调用栈，保存为火焰图工具
+# （flamegraph.pl、speedscope 等）可以直接读取的 collapsed stack 格式：每行 "帧1;帧2;...;帧N 采样数"。
+# 采样按墙钟时间进行，MuPDF（C 代码）中的耗时计入调用它的 Python 函数；cProfile 只统计 Python 层的调用。
+
+PROFILE_MODES = ("pstats", "collapsed")
+# 采样间隔（秒）
+SAMPLE_INTERVAL = 0.005
+# 响应中列出的函数数
+TOP_FUNCTIONS = 15
+
+# Python 3.12 起 cProfile 基于 sys.monitoring，同一进程中同时只能有一个 cProfile 在运行
+_profile_lock = threading.Lock()
+
+
+def resolve_profile_mode(value=False):
+    """把工具参数 profile 统一为 None（不分析）、"pstats" 或 "collapsed"。true 等同于 "pstats" """
+    if value is True:
+        return "pstats"
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in PROFILE_MODES:
+            return value
+        if value in ("true", "1", "yes"):
+            return "pstats"
+    return None
+
+
+def profile_base_name(name):
+    """性能分析文件名（不含扩展名）：去掉 .pdf 扩展名，路径分隔符替换为 "__" """
+    name = os.path.splitext(name)[0] if name.lower().endswith(".pdf") else name
+    return name.replace(os.sep, "__").replace("/", "__")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """后台线程定期采样指定线程的调用栈；skip 为栈底要省略的帧数（开始分析之前的调用者，例如进程池的调度代码）"""
+
+    def __init__(self, thread_id, skip=0, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.skip = skip
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = stack[::-1][self.skip:]
+            if stack:
+                self.stacks[";".join(stack)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        write_collapsed(path, self.stacks)
+
+
+def write_collapsed(path, stacks):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def read_collapsed(path):
+    stacks = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+class ProfileCapture:
+    """一次性能分析的结果：生成的文件路径；未能分析时 error 为原因"""
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.pstats_path = None
+        self.collapsed_path = None
+        self.seconds = 0.0
+        self.error = None
+
+
+@contextlib.contextmanager
+def capture_profile(mode, base_path):
+    """
+    在 with 块执行期间分析当前线程，结束后写出 <base_path>.pstats（mode 为 "collapsed" 时还有 <base_path>.collapsed）。
+    mode 为 None 时不做任何事，产出 None。
+    """
+    if not mode:
+        yield None
+        return
+    capture = ProfileCapture(base_path)
+    if not _profile_lock.acquire(blocking=False):
+        capture.error = "另一个性能分析正在进行，本次未分析"
+        yield capture
+        return
+    try:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        sampler = None
+        if mode == "collapsed":
+            # 火焰图以 with 语句所在的函数为根：0 为本函数，1 为 contextlib 的 __enter__，2 为调用者
+            depth = 0
+            frame = sys._getframe(2)
+            while frame is not None:
+                depth += 1
+                frame = frame.f_back
+            sampler = StackSampler(threading.get_ident(), skip=depth - 1)
+        start = time.perf_counter()
+        if sampler is not None:
+            sampler.start()
+        profiler.enable()
+        try:
+            yield capture
+        finally:
+            profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            capture.seconds = time.perf_counter() - start
+            os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+            capture.pstats_path = base_path + ".pstats"
+            profiler.dump_stats(capture.pstats_path)
+            if sampler is not None:
+                capture.collapsed_path = base_path + ".collapsed"
+                sampler.write(capture.collapsed_path)
+    finally:
+        _profile_lock.release()
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == "~":
+        # 内置函数，例如 <method 'get_text' of ...>
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    """pstats.Stats 中累计耗时最多的函数：[{"function", "ncalls", "tottime", "cumtime"}]"""
+    rows = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({"function": _function_label(func), "ncalls": nc, "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:limit]
+
+
+def load_stats(paths):
+    """合并多个 .pstats 文件；没有可读的文件时返回 None"""
+    import pstats
+
+    stats = None
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        if stats is None:
+            stats = pstats.Stats(path, stream=io.StringIO())
+        else:
+            stats.add(path)
+    return stats
+
+
+def format_top_functions(rows):
+    lines = [f"  {'cumtime':>9} {'tottime':>9} {'ncalls':>9}  function"]
+    for row in rows:
+        lines.append(f"  {row['cumtime']:>8.3f}s {row['tottime']:>8.3f}s {row['ncalls']:>9}  {row['function']}")
+    return lines
+
+
+def capture_to_dict(capture, limit=TOP_FUNCTIONS):
+    """单次调用的性能分析结果（JSON 输出中的 meta.profile）"""
+    if capture.error:
+        return {"error": capture.error}
+    stats = load_stats([capture.pstats_path])
+    return {
+        "pstats": capture.pstats_path,
+        "collapsed": capture.collapsed_path,
+        "seconds": round(capture.seconds, 4),
+        "top_functions": top_functions(stats, limit) if stats else [],
+    }
+
+
+def format_capture(capture, limit=TOP_FUNCTIONS):
+    """单次调用的性能分析结果（文本输出）"""
+    if capture.error:
+        return [f"Profile: {capture.error}"]
+    data = capture_to_dict(capture, limit)
+    lines = [f"Profile: {data['pstats']}" + (f", {data['collapsed']}" if data["collapsed"] else "")]
+    lines.append("Top functions by cumulative time:")
+    lines.extend(format_top_functions(data["top_functions"]))
+    return lines
+
+
+def merge_batch_profiles(base_paths, merged_base, mode, limit=TOP_FUNCTIONS):
+    """
+    合并批量处理中各任务的性能分析文件，写出 <merged_base>.pstats（和 .collapsed），
+    Returns: 报告中的统计行
+    """
+    pstats_paths = [base + ".pstats" for base in base_paths if os.path.exists(base + ".pstats")]
+    stats = load_stats(pstats_paths)
+    if stats is None:
+        return ["Profile: 没有生成性能分析文件"]
+    stats.dump_stats(merged_base + ".pstats")
+    files = [merged_base + ".pstats"]
+    if mode == "collapsed":
+        stacks = Counter()
+        for base in base_paths:
+            if os.path.exists(base + ".collapsed"):
+                stacks.update(read_collapsed(base + ".collapsed"))
+        write_collapsed(merged_base + ".collapsed", stacks)
+        files.append(merged_base + ".collapsed")
+    lines = [f"Profile: {len(pstats_paths)} captures in {os.path.dirname(merged_base)}, merged: {', '.join(files)}"]
+    lines.append("Top functions by cumulative time (all workers):")
+    lines.extend(format_top_functions(top_functions(stats, limit)))
+    return lines
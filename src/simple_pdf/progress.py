@@ -0,0 +1,77 @@
+import time
+
+# 批量任务的进度跟踪
+# 结果按完成顺序逐个汇报，通过 MCP progress 通知实时推送给客户端（文件数 / 页数 / 吞吐量 / 预计剩余时间）。
+
+
+class BatchProgress:
+    """
+    批量任务进度跟踪器。
+    send: 可选的异步回调 send(progress, total, message)，为 None 时只做统计不推送。
+    通知按 min_interval 秒节流，最后一个文件完成时总会推送一次。
+    """
+
+    def __init__(self, total_files, total_pages=0, send=None, min_interval=0.5):
+        self.total_files = total_files
+        self.total_pages = total_pages
+        self.files_done = 0
+        self.pages_done = 0
+        self.send = send
+        self.min_interval = min_interval
+        self.start_time = time.monotonic()
+        self._last_sent = 0.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    @property
+    def pages_per_second(self):
+        elapsed = self.elapsed
+        return self.pages_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def files_per_second(self):
+        elapsed = self.elapsed
+        return self.files_done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """预计剩余秒数（优先按页数估算，没有页数信息时按文件数估算）"""
+        if self.total_pages and self.pages_done:
+            return (self.total_pages - self.pages_done) / self.pages_per_second
+        if self.files_done:
+            return (self.total_files - self.files_done) / self.files_per_second
+        return None
+
+    def message(self):
+        parts = [f"{self.files_done}/{self.total_files} files"]
+        if self.total_pages:
+            parts.append(f"{self.pages_done}/{self.total_pages} pages")
+            parts.append(f"{self.pages_per_second:.1f} pages/s")
+        else:
+            parts.append(f"{self.files_per_second:.2f} files/s")
+        eta = self.eta()
+        if eta is not None:
+            parts.append(f"ETA {eta:.0f}s")
+        return ", ".join(parts)
+
+    async def advance(self, files=0, pages=0):
+        """记录完成的文件数/页数，并在需要时推送进度通知"""
+        self.files_done += files
+        self.pages_done += pages
+        if self.send is None:
+            return
+        now = time.monotonic()
+        finished = self.files_done >= self.total_files
+        if not finished and now - self._last_sent < self.min_interval:
+            return
+        self._last_sent = now
+        if self.total_pages:
+            progress, total = self.pages_done, self.total_pages
+        else:
+            progress, total = self.files_done, self.total_files
+        try:
+            await self.send(progress, total, self.message())
+        except Exception:
+            # 进度通知失败（例如客户端已断开）不应影响批量任务本身
+            self.send = None
@@ -0,0 +1,166 @@
+import math
+from array import array
+
+import fitz  # PyMuPDF
+
+# 矢量图形区域合并
+# 把 page.get_drawings() 得到的大量矩形合并成若干个区域（与扩展 threshold 后的区域相交即合并）。
+# 原实现逐个比较、每次合并后重新扫描，复杂度为 O(n^2) 以上，CAD 类页面（上万条路径）需要数秒。
+# 这里用均匀网格索引只比较相邻的矩形，结果与原实现（_merge_rects_reference）完全相同：
+# * 一个区域 = 从种子矩形出发，反复吸收与 "当前外接矩形扩展 threshold" 相交的矩形，直到不再变化。
+#   外接矩形只会变大，所以吸收顺序不影响最终集合，可以每轮批量吸收。
+# * 种子按输入顺序选取（第一个尚未被吸收的矩形），输出顺序与原实现一致。
+# * fitz.Rect 的相交判断和并集在 MuPDF 中以 float32 计算，这里同样按 float32 比较和取整。
+# * 空矩形（例如水平线的外接矩形，高度为 0）不会与任何矩形相交，只能作为种子；
+#   空种子吸收第一个矩形（输入顺序最靠前的相交矩形）后，外接矩形被该矩形替换。
+
+# 单个矩形最多登记的网格数，更大的矩形放入每次查询都检查的列表
+MAX_RECT_CELLS = 64
+# 超过该范围的坐标（以及无穷大矩形）交给原实现处理
+MAX_COORD = 1e30
+INFINITE_RECT = (fitz.FZ_MIN_INF_RECT, fitz.FZ_MIN_INF_RECT, fitz.FZ_MAX_INF_RECT, fitz.FZ_MAX_INF_RECT)
+
+
+def _merge_rects_reference(rects, threshold=10):
+    """合并重叠或相近的矩形（原实现，保留用于无穷大坐标等特殊输入和基准测试对比）"""
+    if not rects:
+        return []
+    processed_rects = [fitz.Rect(r) for r in rects]
+    merged = []
+
+    while processed_rects:
+        current = processed_rects.pop(0)
+        has_overlap = True
+        while has_overlap:
+            has_overlap = False
+            i = 0
+            while i < len(processed_rects):
+                other = processed_rects[i]
+                expanded = fitz.Rect(current)
+                expanded.x0 -= threshold
+                expanded.y0 -= threshold
+                expanded.x1 += threshold
+                expanded.y1 += threshold
+
+                if expanded.intersects(other):
+                    current = current | other
+                    processed_rects.pop(i)
+                    has_overlap = True
+                else:
+                    i += 1
+        merged.append(current)
+    return merged
+
+
+def _f32(values):
+    """按 float32 取整（与 MuPDF 的 fz_rect 相同）"""
+    return tuple(array("f", values))
+
+
+def merge_rects(rects, threshold=10):
+    """合并重叠或相近的矩形"""
+    if not rects:
+        return []
+    # 只在输出时创建 fitz.Rect（逐个构造 fitz.Rect 的开销与合并本身相当）
+    coords = [(r.x0, r.y0, r.x1, r.y1) if type(r) is fitz.Rect else tuple(fitz.Rect(r)) for r in rects]
+    if threshold < 0 or INFINITE_RECT in coords or not all(-MAX_COORD < v < MAX_COORD for c in coords for v in c):
+        return _merge_rects_reference(rects, threshold)
+
+    n = len(coords)
+    empty = [c[0] >= c[2] or c[1] >= c[3] for c in coords]
+    # 相交判断使用的 float32 坐标
+    coords32 = [_f32(c) for c in coords]
+
+    solid = [k for k in range(n) if not empty[k]]
+    if not solid:
+        return [fitz.Rect(c) for c in coords]
+
+    # 网格大小：让每个格子平均约有一个矩形，且不小于 threshold
+    min_x = min(coords32[k][0] for k in solid)
+    min_y = min(coords32[k][1] for k in solid)
+    max_x = max(coords32[k][2] for k in solid)
+    max_y = max(coords32[k][3] for k in solid)
+    cell = max(math.sqrt((max_x - min_x) * (max_y - min_y) / len(solid)), threshold, 1e-3)
+
+    grid = {}
+    large = []
+    for k in solid:
+        x0, y0, x1, y1 = coords32[k]
+        cx0, cx1 = math.floor(x0 / cell), math.floor(x1 / cell)
+        cy0, cy1 = math.floor(y0 / cell), math.floor(y1 / cell)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > MAX_RECT_CELLS:
+            large.append(k)
+            continue
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                grid.setdefault((cx, cy), []).append(k)
+
+    absorbed = bytearray(n)
+
+    def hits(bounds):
+        """与扩展后的外接矩形 bounds 相交的、尚未被吸收的矩形"""
+        if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+            return []
+        ex0, ey0, ex1, ey1 = _f32(bounds)
+        # float32 取整可能越过格子边界，多查一圈
+        cx0, cx1 = math.floor(ex0 / cell) - 1, math.floor(ex1 / cell) + 1
+        cy0, cy1 = math.floor(ey0 / cell) - 1, math.floor(ey1 / cell) + 1
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(grid):
+            keys = [key for key in grid if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]
+        else:
+            keys = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+        found = set()
+        for key in keys:
+            cell_ids = grid.get(key)
+            if cell_ids is None:
+                continue
+            # 顺便清理已被吸收的矩形，区域内部的格子很快变空并被删除
+            live = [k for k in cell_ids if not absorbed[k]]
+            if not live:
+                del grid[key]
+                continue
+            if len(live) != len(cell_ids):
+                grid[key] = live
+            found.update(live)
+        if large:
+            large[:] = [k for k in large if not absorbed[k]]
+            found.update(large)
+        result = []
+        for k in found:
+            x0, y0, x1, y1 = coords32[k]
+            if max(ex0, x0) < min(ex1, x1) and max(ey0, y0) < min(ey1, y1):
+                result.append(k)
+        return result
+
+    def expand(b):
+        return (b[0] - threshold, b[1] - threshold, b[2] + threshold, b[3] + threshold)
+
+    merged = []
+    for seed in range(n):
+        if absorbed[seed]:
+            continue
+        absorbed[seed] = 1
+        bbox = coords[seed]
+        if empty[seed]:
+            first = hits(expand(bbox))
+            if not first:
+                merged.append(fitz.Rect(bbox))
+                continue
+            # 空矩形与第一个相交矩形（输入顺序最靠前）的并集就是该矩形本身
+            first = min(first)
+            absorbed[first] = 1
+            bbox = coords[first]
+        while True:
+            new = hits(expand(bbox))
+            if not new:
+                break
+            for k in new:
+                absorbed[k] = 1
+            bbox = _f32((
+                min(bbox[0], min(coords[k][0] for k in new)),
+                min(bbox[1], min(coords[k][1] for k in new)),
+                max(bbox[2], max(coords[k][2] for k in new)),
+                max(bbox[3], max(coords[k][3] for k in new)),
+            ))
+        merged.append(fitz.Rect(bbox))
+    return merged
@@ -1,26 +1,61 @@
 
 import asyncio
+import contextlib
+import io
+import itertools
 import os
+import shutil
 import base64
 import re
-import difflib
 import fitz  # PyMuPDF
 import mcp.types as types
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
+# 转换后端（pypandoc / docx2pdf / win32com）在 convert 模块中按需导入，缺少这些依赖时服务器仍可启动，
+# 只有调用转换工具时才会报错
 try:
     from .convert import markdown_to_docx, docx_to_pdf
-except ImportError as e:
-    # 如果是依赖缺失（如 pypandoc），直接抛出异常，不要尝试 fallback
-    if "pypandoc" in str(e) or "docx2pdf" in str(e):
-        raise e
-    # 仅在找不到 convert 模块本身时尝试 fallback（兼容直接运行脚本的情况）
-    try:
-        from convert import markdown_to_docx, docx_to_pdf
-    except ImportError:
-        # 如果 fallback 也失败，抛出原始异常以便调试
-        raise e
+except ImportError:
+    from convert import markdown_to_docx, docx_to_pdf
+
+try:
+    from .executor import run_blocking, iter_process_pool, map_in_process_pool, get_process_pool_size, warm_up_process_pool, get_executor_stats, shutdown as shutdown_executor
+except ImportError:
+    from executor import run_blocking, iter_process_pool, map_in_process_pool, get_process_pool_size, warm_up_process_pool, get_executor_stats, shutdown as shutdown_executor
+
+try:
+    from .progress import BatchProgress
+    from .manifest import ExtractManifest
+    from .page_cache import get_page_cache, document_hash
+    from .doc_cache import get_document_cache
+    from . import content_index
+    from .file_catalog import get_file_catalog
+    from .image_store import first_image_names, get_shared_image_dir, write_image_file, prune_shared_images
+    from .output_writer import get_output_writer, diff_write_stats, merge_write_stats, format_write_stats
+    from .rect_merge import merge_rects
+    from .table_gate import resolve_table_detection, plan_table_detection
+    from .layout_profile import build_layout_profile
+    from .pagination import encode_cursor, decode_cursor, compress_pages, default_max_chars
+    from .stage_timing import DocumentTimings, NULL_TIMER, NULL_TIMINGS, TimedStream, merge_timings, format_timings
+    from .profiling import resolve_profile_mode, profile_base_name, capture_profile, capture_to_dict, format_capture, merge_batch_profiles
+    from .server_stats import get_request_stats, hit_ratio, append_stats_line, get_dump_settings
+except ImportError:
+    from progress import BatchProgress
+    from manifest import ExtractManifest
+    from page_cache import get_page_cache, document_hash
+    from doc_cache import get_document_cache
+    import content_index
+    from file_catalog import get_file_catalog
+    from image_store import first_image_names, get_shared_image_dir, write_image_file, prune_shared_images
+    from output_writer import get_output_writer, diff_write_stats, merge_write_stats, format_write_stats
+    from rect_merge import merge_rects
+    from table_gate import resolve_table_detection, plan_table_detection
+    from layout_profile import build_layout_profile
+    from pagination import encode_cursor, decode_cursor, compress_pages, default_max_chars
+    from stage_timing import DocumentTimings, NULL_TIMER, NULL_TIMINGS, TimedStream, merge_timings, format_timings
+    from profiling import resolve_profile_mode, profile_base_name, capture_profile, capture_to_dict, format_capture, merge_batch_profiles
+    from server_stats import get_request_stats, hit_ratio, append_stats_line, get_dump_settings
 
 from collections import Counter
 
@@ -76,249 +111,51 @@ def is_list_item_start(text):
         
     return False
 
-def table_to_markdown(table):
-    """
-    将 PyMuPDF Table 对象转换为 Markdown 字符串。
-    """
-    try:
-        rows = table.extract()
-        if not rows: return ""
-        
-        # 清理单元格内容
-        clean_rows = []
-        for row in rows:
-            # 过滤全空行 (策略：如果整行都是 None 或空字符串，则丢弃)
-            is_empty_row = True
-            clean_row = []
-            for cell in row:
-                if cell is None:
-                    clean_row.append("")
-                else:
-                    raw_text = str(cell)
-                    # 1. Check if it's a list (preserve newlines as <br>)
-                    lines = [l.strip() for l in raw_text.split('\n') if l.strip()]
-                    
-                    if not lines:
-                        clean_row.append("")
-                        continue
-                        
-                    is_empty_row = False
-                    
-                    # Heuristic: If multiple lines and looks like a list, use <br>
-                    # otherwise use smart_merge_text to reflow text
-                    is_list = False
-                    if len(lines) > 1:
-                        list_item_count = sum(1 for l in lines if is_list_item_start(l))
-                        if list_item_count > 0 and (list_item_count / len(lines)) > 0.3:
-                            is_list = True
-                            
-                    if is_list:
-                        clean_row.append("<br>".join(lines))
-                    else:
-                        clean_row.append(smart_merge_text(raw_text))
-            
-            if not is_empty_row:
-                clean_rows.append(clean_row)
-        
-        if not clean_rows: return ""
-
-        # 0.5. 尝试合并互斥列 (针对错位问题)
-        # 逻辑：如果相邻两列的内容在行上是互斥的（即从未在同一行同时出现），则合并它们。
-        # 这通常发生在表格线识别错误，导致一列被拆分为两列的情况。
-        if clean_rows:
-            max_cols = max(len(r) for r in clean_rows)
-            # 补齐行长度
-            for r in clean_rows:
-                while len(r) < max_cols:
-                    r.append("")
-            
-            j = 0
-            while j < max_cols - 1:
-                is_exclusive = True
-                has_content_j = False
-                has_content_next = False
-                
-                for r_idx in range(len(clean_rows)):
-                    v1 = clean_rows[r_idx][j]
-                    v2 = clean_rows[r_idx][j+1]
-                    if v1: has_content_j = True
-                    if v2: has_content_next = True
-                    
-                    if v1 and v2: # 冲突：同一行两列都有值
-                        is_exclusive = False
-                        break
-                
-                # 只有当两列都有内容（不是全空列），且互斥时，才合并
-                # 如果某一列全空，会在后续步骤被删除，不需要在此合并
-                if is_exclusive and has_content_j and has_content_next:
-                    # 合并到 j
-                    for r_idx in range(len(clean_rows)):
-                        if clean_rows[r_idx][j+1]:
-                            clean_rows[r_idx][j] = clean_rows[r_idx][j+1]
-                    
-                    # 删除 j+1
-                    for r in clean_rows:
-                        r.pop(j+1)
-                    max_cols -= 1
-                    # 不增加 j，继续检查新的 j (即合并后的列) 和新的 j+1
-                else:
-                    j += 1
-
-        # 0. 尝试智能合并表头 (针对 "基本\n工资" 被拆分为两行的情况)
-        # 移到 clean_rows 和 合并互斥列 之后，以避免误判
-        if len(clean_rows) > 1:
-            header1 = clean_rows[0]
-            header2 = clean_rows[1]
-            
-            should_merge = False
-            has_content_h2 = False
-            
-            for cell in header2:
-                if cell:
-                    has_content_h2 = True
-                    break
-            
-            if has_content_h2:
-                conflict_count = 0
-                merge_candidates = 0
-                
-                for i in range(min(len(header1), len(header2))):
-                    c1 = header1[i]
-                    c2 = header2[i]
-                    
-                    if c1 and c2:
-                        # 同一列都有内容
-                        if len(c1) > 4 and len(c2) > 4:
-                            conflict_count += 1
-                        else:
-                            merge_candidates += 1
-                    elif c2:
-                        merge_candidates += 1
-                
-                is_data_row_2 = False
-                if len(clean_rows) > 2:
-                     row3 = clean_rows[2]
-                     match_type_count = 0
-                     check_count = 0
-                     for i in range(min(len(header2), len(row3))):
-                         v2 = header2[i]
-                         v3 = row3[i]
-                         if v2 and v3:
-                             check_count += 1
-                             if (v2.isdigit() and v3.isdigit()) or (v2 in ['true', 'false'] and v3 in ['true', 'false']):
-                                 match_type_count += 1
-                     
-                     if check_count > 0 and (match_type_count / check_count) > 0.5:
-                         is_data_row_2 = True
- 
-                if not is_data_row_2 and conflict_count == 0:
-                    should_merge = True
-
-            if should_merge:
-                merged_header = []
-                max_len = max(len(header1), len(header2))
-                for i in range(max_len):
-                    c1 = header1[i] if i < len(header1) else ""
-                    c2 = header2[i] if i < len(header2) else ""
-                    merged_header.append(c1 + c2)
-                
-                clean_rows[0] = merged_header
-                clean_rows.pop(1)
-
-        # 1. Identify empty columns
-        num_cols = len(clean_rows[0])
-        is_col_empty = [True] * num_cols
-        
-        for row in clean_rows:
-            for c_idx, cell in enumerate(row):
-                if c_idx < num_cols and cell and cell.strip():
-                    is_col_empty[c_idx] = False
-        
-        # 2. Filter columns
-        final_rows = []
-        for row in clean_rows:
-            new_row = []
-            for c_idx, cell in enumerate(row):
-                if c_idx < num_cols and not is_col_empty[c_idx]:
-                    new_row.append(cell)
-            final_rows.append(new_row)
-            
-        if not final_rows or not final_rows[0]: return ""
-
-        # 3. 决定是否使用空表头 (针对 KV 表格或类型一致的表格)
-        # 如果第一行看起来像数据（与第二行类型一致），则生成空表头，将第一行作为数据展示
-        use_empty_header = False
-        if len(final_rows) > 1:
-            header_row = final_rows[0]
-            first_body = final_rows[1]
-            
-            match_type_count = 0
-            check_count = 0
-            
-            for i in range(min(len(header_row), len(first_body))):
-                v1 = header_row[i].strip()
-                v2 = first_body[i].strip()
-                
-                if v1 and v2:
-                    check_count += 1
-                    # 检查是否都是布尔值
-                    if v1 in ['true', 'false'] and v2 in ['true', 'false']:
-                        match_type_count += 1
-                    # 检查是否都是数字
-                    elif v1.replace('.','',1).isdigit() and v2.replace('.','',1).isdigit():
-                        match_type_count += 1
-                    # 检查是否都是中文开头 (移除，避免误判)
-                    # elif v1 and v2 and is_cjk(v1[0]) and is_cjk(v2[0]):
-                    #    match_type_count += 1
-            
-            # 如果超过 50% 的非空列类型一致，或者完全是 KV 结构（通常 2-3 列，且包含 param/value）
-            if check_count > 0 and (match_type_count / check_count) > 0.5:
-                use_empty_header = True
-            
-            # 特殊检查：如果 Header 包含 "true/false" 这种值，绝对不是 Header
-            for cell in header_row:
-                if cell.strip() in ['true', 'false']:
-                    use_empty_header = True
-                    break
+# 代码块特征（策略4/6）：包含 HTML/XML 标签
+CODE_CHARS = ('{', '}', ';', '(', ')', '[', ']', '->', '//', '/*', '<', '>', '/>', 'class=', 'type=', '</')
+CODE_KEYWORDS = {
+    'public', 'class', 'void', 'int', 'String', 'return', 'import', 'package',
+    'if', 'else', 'for', 'while', 'try', 'catch', 'synchronized', 'extends', 'implements',
+    'div', 'span', 'li', 'input', 'html', 'body', 'dependency', 'groupId', 'artifactId', 'version'
+}
 
-        md = "\n"
-        num_cols = len(final_rows[0])
-        
-        if use_empty_header:
-            # 生成空表头
-            md += "| " + " | ".join([" "] * num_cols) + " |\n"
-            md += "| " + " | ".join(["---"] * num_cols) + " |\n"
-            # 所有行都作为 Body
-            rows_to_process = final_rows
-        else:
-            # 标准表头
-            md += "| " + " | ".join(final_rows[0]) + " |\n"
-            md += "| " + " | ".join(["---"] * num_cols) + " |\n"
-            rows_to_process = final_rows[1:]
-        
-        # 表体
-        for row in rows_to_process:
-            # 如果需要，填充行
-            if len(row) < num_cols:
-                row += [""] * (num_cols - len(row))
-            md += "| " + " | ".join(row[:num_cols]) + " |\n"
-        md += "\n"
-        return md
-    except Exception:
-        return ""
 
-def is_valid_table(table):
+class TableAnalysis:
     """
-    判断表格是否有效。
-    用于过滤误判的文本块（例如只有一列有内容，或空列占比极高的伪表格）。
+    表格分析：对 page.find_tables() 找到的候选表格只调用一次 table.extract()，
+    有效性判断 (is_valid) 和 Markdown 转换 (to_markdown) 共用同一份单元格数据。
+    cells 是去除首尾空白后的单元格文本（None 视为空字符串），各项统计在一次遍历中得到。
     """
-    try:
-        data = table.extract()
+
+    def __init__(self, table):
+        self.table = table
+        self.bbox = table.bbox
+        try:
+            self.rows = table.extract()
+        except Exception:
+            self.rows = None
+        self.cells = [[str(cell).strip() if cell else "" for cell in row] for row in self.rows or []]
+        self._valid = None
+
+    def is_valid(self):
+        """
+        判断表格是否有效。
+        用于过滤误判的文本块（例如只有一列有内容，或空列占比极高的伪表格）。
+        """
+        if self._valid is None:
+            try:
+                self._valid = self._check()
+            except Exception:
+                self._valid = False
+        return self._valid
+
+    def _check(self):
+        data = self.cells
         if not data:
             return False
-        
+
         num_rows = len(data)
-        
+
         # 策略5: 丢弃单行表格
         # 单行表格在 Markdown 中会被渲染为仅有表头的表格，通常不适合展示数据
         # 且常用于误判的 Key-Value 布局或标题栏
@@ -326,18 +163,67 @@ def is_valid_table(table):
             return False
 
         num_cols = len(data[0])
-        
-        # 统计每一列的字符总量
-        col_char_counts = [0] * num_cols
+        # 行长不一致时：较短的行或多出的非空单元格视为无效，多出的空单元格只计入空单元格数
+        empty_cells = 0
+        for row, raw_row in zip(data, self.rows):
+            if len(row) != num_cols:
+                if len(row) < num_cols or any(raw_row[num_cols:]):
+                    return False
+                empty_cells += len(row) - num_cols
+
+        # 一次遍历统计所有策略用到的数据
+        col_char_counts = [0] * num_cols      # 每一列的字符总量
+        col_digit_tokens = [[] for _ in range(num_cols)]  # 每一列中的纯数字片段（行号检测）
+        col_list_markers = [0] * num_cols     # 以列表标记开头的单元格数
+        col_short = [0] * num_cols            # 内容很短 (< 5) 的单元格数
+        col_long = [0] * num_cols             # 内容较长 (> 15) 的单元格数
+        col_alone = [0] * num_cols            # 该行其他列都为空的行数
         total_chars = 0
-        
+        text_cells = 0
+        code_cells = 0
+        long_cells = 0
+        long_split_rows = 0
+        row_active_cols = []
+
         for row in data:
-            for c_idx, cell in enumerate(row):
-                if cell:
-                    text_len = len(str(cell).strip())
-                    col_char_counts[c_idx] += text_len
-                    total_chars += text_len
-                    
+            active_cols = set()
+            for c_idx, text in enumerate(row[:num_cols]):
+                if is_list_item_start(text):
+                    col_list_markers[c_idx] += 1
+                text_len = len(text)
+                if text_len < 5:
+                    col_short[c_idx] += 1
+                if not text:
+                    empty_cells += 1
+                    continue
+                if text_len > 15:
+                    col_long[c_idx] += 1
+                active_cols.add(c_idx)
+                col_char_counts[c_idx] += text_len
+                total_chars += text_len
+                text_cells += 1
+                if text_len > 30:
+                    long_cells += 1
+
+                # 处理可能存在的换行符，处理 "1\n2" 这种粘连情况
+                parts = text.split()
+                col_digit_tokens[c_idx].extend(p for p in parts if p.isdigit())
+
+                # 检查代码关键字和符号
+                words = set(text.replace('(', ' ').replace(')', ' ').replace('{', ' ').replace('<', ' ').replace('>', ' ').split())
+                if words & CODE_KEYWORDS or any(char in text for char in CODE_CHARS):
+                    code_cells += 1
+
+            if active_cols:
+                row_active_cols.append(active_cols)
+            if len(active_cols) == 1:
+                col_alone[next(iter(active_cols))] += 1
+            elif not active_cols:
+                for c_idx in range(num_cols):
+                    col_alone[c_idx] += 1
+            if num_cols == 2 and len(row[0]) > 30 and len(row[1]) > 30:
+                long_split_rows += 1
+
         # 策略1: 丢弃单列表格 (通常是普通文本)
         # 只要字符占比 > 10% 就算有效列
         valid_cols = 0
@@ -346,29 +232,18 @@ def is_valid_table(table):
                 valid_cols += 1
             elif total_chars == 0 and count > 0:
                  valid_cols += 1
-                 
+
         if valid_cols < 2:
             return False
 
         # 策略2: 丢弃空列占比过高的表格
         # 如果某一列几乎没有字符 (< 5)，视为无效空列
-        empty_cols = 0
-        for count in col_char_counts:
-            if count < 5:
-                empty_cols += 1
-        
+        empty_cols = sum(1 for count in col_char_counts if count < 5)
         if num_cols > 0 and (empty_cols / num_cols) >= 0.5:
             return False
-            
+
         # 策略3: 对于少行数的表格 (rows < 3)，如果有极高稀疏度，通常是误判的文本行
-        # 计算稀疏度
         total_cells = num_rows * num_cols
-        empty_cells = 0
-        for row in data:
-            for cell in row:
-                 if not cell or not str(cell).strip():
-                     empty_cells += 1
-        
         if num_rows < 3 and total_cells > 0 and (empty_cells / total_cells) > 0.6:
             return False
 
@@ -377,7 +252,7 @@ def is_valid_table(table):
         # 这种情况通常是 PyMuPDF 将对齐的文本误判为多列表格，导致大量空列和碎片
         non_empty_cells = total_cells - empty_cells
         saturation = non_empty_cells / total_cells if total_cells > 0 else 0
-        
+
         if num_cols > 8 and saturation < 0.3:
             # 计算每行平均有效单元格数
             avg_cells_per_row = non_empty_cells / num_rows if num_rows > 0 else 0
@@ -388,208 +263,359 @@ def is_valid_table(table):
         # 特征: 包含一列连续的数字(行号)，且内容包含代码关键字或符号
         has_line_numbers = False
         has_code_indicators = False
-        
+
         # 检查是否存在行号列
-        for c_idx in range(num_cols):
-            col_values = []
-            for row in data:
-                cell_text = str(row[c_idx]).strip() if row[c_idx] else ""
-                if cell_text:
-                    # 处理可能存在的换行符，只取第一部分，处理 "1\n2" 这种粘连情况
-                    parts = cell_text.replace('\n', ' ').split()
-                    for p in parts:
-                        if p.isdigit():
-                            col_values.append(int(p))
-            
+        for tokens in col_digit_tokens:
+            col_values = [int(p) for p in tokens]
             # 如果这一列包含了至少3个数字
             if len(col_values) >= 3:
                 # 检查是否大致连续
-                sorted_vals = sorted(list(set(col_values)))
+                sorted_vals = sorted(set(col_values))
                 if len(sorted_vals) > 1:
                     consecutive_count = 0
                     for i in range(len(sorted_vals)-1):
                         if sorted_vals[i+1] == sorted_vals[i] + 1:
                             consecutive_count += 1
-                    
+
                     # 如果70%以上是连续的，视为行号列
-                    if len(sorted_vals) > 0 and (consecutive_count / len(sorted_vals)) > 0.7:
+                    if (consecutive_count / len(sorted_vals)) > 0.7:
                         has_line_numbers = True
                         break
-        
-        # 检查是否存在代码特征
-        # 增强代码特征库，包含 HTML/XML 标签
-        code_chars = {'{', '}', ';', '(', ')', '[', ']', '->', '//', '/*', '<', '>', '/>', 'class=', 'type=', '</'}
-        code_keywords = {
-            'public', 'class', 'void', 'int', 'String', 'return', 'import', 'package', 
-            'if', 'else', 'for', 'while', 'try', 'catch', 'synchronized', 'extends', 'implements',
-            'div', 'span', 'li', 'input', 'html', 'body', 'dependency', 'groupId', 'artifactId', 'version'
-        }
-        
-        found_code_indicators = 0
-        total_text_cells = 0
-        
-        for row in data:
-            for cell in row:
-                if cell:
-                    text = str(cell).strip()
-                    if not text: continue
-                    total_text_cells += 1
-                    
-                    # 检查关键字
-                    words = set(text.replace('(', ' ').replace(')', ' ').replace('{', ' ').replace('<', ' ').replace('>', ' ').split())
-                    if words & code_keywords:
-                        found_code_indicators += 1
-                        continue
-                        
-                    # 检查符号
-                    for char in code_chars:
-                        if char in text:
-                            found_code_indicators += 1
-                            break
-        
-        indicator_ratio = (found_code_indicators / total_text_cells) if total_text_cells > 0 else 0
+
+        indicator_ratio = (code_cells / text_cells) if text_cells > 0 else 0
 
         # 如果包含代码特征的单元格占比超过 20%
-        if total_text_cells > 0 and indicator_ratio > 0.2:
+        if text_cells > 0 and indicator_ratio > 0.2:
             has_code_indicators = True
-        
+
         # 情况A: 有行号且有代码特征 -> 肯定是代码块
         if has_line_numbers and has_code_indicators:
             return False
 
         # 策略6: 纯代码块/HTML 误判 (无行号但特征极高)
         # 如果超过 50% 的单元格包含代码特征，视为无效表格
-        if total_text_cells > 0 and indicator_ratio > 0.5:
+        if text_cells > 0 and indicator_ratio > 0.5:
             return False
 
         # 策略7: 长文本/段落误判
-        # 如果表格行数较少，且单元格内容多为长文本（>50字符），通常是文本段落
-        long_cell_count = 0
-        total_cells_check = 0
-        for row in data:
-            for cell in row:
-                if cell and str(cell).strip():
-                    total_cells_check += 1
-                    if len(str(cell).strip()) > 30:
-                        long_cell_count += 1
-        
-        if total_cells_check > 0 and (long_cell_count / total_cells_check) > 0.5:
+        # 如果表格行数较少，且单元格内容多为长文本（>30字符），通常是文本段落
+        if text_cells > 0 and (long_cells / text_cells) > 0.5:
             if num_rows < 10 and num_cols < 4:
                  return False
 
         # 策略8: 错位布局误判 (文本换行被解析为多列)
         # 检查连续行的有效列是否"互斥"（即上一行在A列，下一行在B列，且无重叠）
         # 这种情况常见于普通文本被误判为多列表格
-        if num_rows > 1 and num_cols > 1:
-            row_active_cols = []
-            for row in data:
-                active_cols = {i for i, cell in enumerate(row) if cell and str(cell).strip()}
-                if active_cols:
-                    row_active_cols.append(active_cols)
-            
-            if len(row_active_cols) > 1:
-                disjoint_count = 0
-                for i in range(len(row_active_cols) - 1):
-                    if row_active_cols[i].isdisjoint(row_active_cols[i+1]):
-                        disjoint_count += 1
-                
-                # 如果超过 50% 的行转换是互斥的，且表格行数不多
-                if (disjoint_count / (len(row_active_cols) - 1)) >= 0.5 and num_rows < 10:
-                     return False
+        if num_cols > 1 and len(row_active_cols) > 1:
+            disjoint_count = 0
+            for i in range(len(row_active_cols) - 1):
+                if row_active_cols[i].isdisjoint(row_active_cols[i+1]):
+                    disjoint_count += 1
+
+            # 如果超过 50% 的行转换是互斥的，且表格行数不多
+            if (disjoint_count / (len(row_active_cols) - 1)) >= 0.5 and num_rows < 10:
+                 return False
 
         # 策略9: 过滤文本列表误判为表格的情况 (针对冒泡排序案例)
-        # 特征: 
+        # 特征:
         # 1. 某一列(通常是第一列)包含高比例的列表项标记 (1., 2., •)
         # 2. 且该列内容极短(通常只有序号)
-        # 3. 且表格行数较多时，其他列的文本长度分布极不均匀
-        
-        list_marker_col_idx = -1
-        for c_idx in range(num_cols):
-            list_markers = 0
-            short_content_count = 0
-            
-            for row in data:
-                cell_text = str(row[c_idx]).strip() if row[c_idx] else ""
-                if is_list_item_start(cell_text):
-                    list_markers += 1
-                if len(cell_text) < 5: # 序号通常很短
-                    short_content_count += 1
-            
-            # 如果这一列超过 60% 是列表标记，且 80% 内容很短
-            if num_rows > 0 and (list_markers / num_rows) > 0.6 and (short_content_count / num_rows) > 0.8:
-                list_marker_col_idx = c_idx
-                break
-        
         # 如果找到了明确的列表标记列，且表格列数很少 (<= 3)，通常是文本列表
-        if list_marker_col_idx != -1 and num_cols <= 3:
-             # 进一步确认：如果是列表，通常其右侧内容会很长
-             return False
+        if num_cols <= 3:
+            for c_idx in range(num_cols):
+                # 如果这一列超过 60% 是列表标记，且 80% 内容很短
+                if (col_list_markers[c_idx] / num_rows) > 0.6 and (col_short[c_idx] / num_rows) > 0.8:
+                    return False
 
         # 策略10: 过滤长文本段落误判
-        # 特征: 只有2列，且某一行包含极长的文本(>100 chars)，且看起来是被拆分的
-        if num_cols == 2:
-            long_split_row_count = 0
-            for row in data:
-                c1 = str(row[0]).strip() if row[0] else ""
-                c2 = str(row[1]).strip() if row[1] else ""
-                
-                # 如果两列都有内容，且加起来很长，且看起来像一句话被切断（难以程序化判断切断，主要靠长度）
-                if len(c1) > 30 and len(c2) > 30:
-                    long_split_row_count += 1
-            
-            # 如果存在这种行，且表格总行数很少
-            if long_split_row_count > 0 and num_rows < 5:
-                return False
+        # 特征: 只有2列，两列都有超过 30 字符的内容（一句话被切断），且表格总行数很少
+        if num_cols == 2 and long_split_rows > 0 and num_rows < 5:
+            return False
 
         # 策略11: 过滤长文本列表误判 (针对冒泡排序案例 - 变种)
-        # 特征: 
+        # 特征:
         # 1. 有一列主要是列表项 (1. xxx, 2. xxx)
         # 2. 该列文本较长 (不是短序号)
         # 3. 其他列大部分为空
-        
-        list_content_col_idx = -1
+        # 判定条件:
+        # 1. 至少 40% 的行以列表标记开头 (宽松一点，因为可能有换行被切断)
+        # 2. 至少 40% 的行内容较长 (排除纯序号列)
+        # 3. 至少 60% 的行其他列为空 (说明主要是这一列在承载内容)
         for c_idx in range(num_cols):
-            list_markers_count = 0
-            long_content_count = 0
-            empty_other_cols_count = 0
+            ratio_list = col_list_markers[c_idx] / num_rows
+            ratio_long = col_long[c_idx] / num_rows
+            ratio_empty_others = col_alone[c_idx] / num_rows
+
+            if ratio_list > 0.4 and ratio_long > 0.4 and ratio_empty_others > 0.6:
+                return False
+
+        return True
+
+    def to_markdown(self):
+        """
+        将表格转换为 Markdown 字符串。
+        """
+        try:
+            rows = self.rows
+            if not rows: return ""
+        
+            # 清理单元格内容
+            clean_rows = []
+            for row, cells in zip(rows, self.cells):
+                # 过滤全空行 (策略：如果整行都是 None 或空字符串，则丢弃)
+                is_empty_row = True
+                clean_row = []
+                for cell, text in zip(row, cells):
+                    if not text:
+                        clean_row.append("")
+                    else:
+                        raw_text = str(cell)
+                        # 1. Check if it's a list (preserve newlines as <br>)
+                        lines = [l.strip() for l in raw_text.split('\n') if l.strip()]
+                    
+                        is_empty_row = False
+                    
+                        # Heuristic: If multiple lines and looks like a list, use <br>
+                        # otherwise use smart_merge_text to reflow text
+                        is_list = False
+                        if len(lines) > 1:
+                            list_item_count = sum(1 for l in lines if is_list_item_start(l))
+                            if list_item_count > 0 and (list_item_count / len(lines)) > 0.3:
+                                is_list = True
+                            
+                        if is_list:
+                            clean_row.append("<br>".join(lines))
+                        else:
+                            clean_row.append(smart_merge_text(raw_text))
+            
+                if not is_empty_row:
+                    clean_rows.append(clean_row)
+        
+            if not clean_rows: return ""
+
+            # 0.5. 尝试合并互斥列 (针对错位问题)
+            # 逻辑：如果相邻两列的内容在行上是互斥的（即从未在同一行同时出现），则合并它们。
+            # 这通常发生在表格线识别错误，导致一列被拆分为两列的情况。
+            if clean_rows:
+                max_cols = max(len(r) for r in clean_rows)
+                # 补齐行长度
+                for r in clean_rows:
+                    while len(r) < max_cols:
+                        r.append("")
             
-            for r_idx, row in enumerate(data):
-                cell_text = str(row[c_idx]).strip() if row[c_idx] else ""
+                j = 0
+                while j < max_cols - 1:
+                    is_exclusive = True
+                    has_content_j = False
+                    has_content_next = False
                 
-                # 检查是否以列表标记开头 (1., 2., (1), etc.)
-                if is_list_item_start(cell_text):
-                    list_markers_count += 1
+                    for r_idx in range(len(clean_rows)):
+                        v1 = clean_rows[r_idx][j]
+                        v2 = clean_rows[r_idx][j+1]
+                        if v1: has_content_j = True
+                        if v2: has_content_next = True
+                    
+                        if v1 and v2: # 冲突：同一行两列都有值
+                            is_exclusive = False
+                            break
                 
-                # 检查内容长度 (长文本)
-                if len(cell_text) > 15:
-                    long_content_count += 1
+                    # 只有当两列都有内容（不是全空列），且互斥时，才合并
+                    # 如果某一列全空，会在后续步骤被删除，不需要在此合并
+                    if is_exclusive and has_content_j and has_content_next:
+                        # 合并到 j
+                        for r_idx in range(len(clean_rows)):
+                            if clean_rows[r_idx][j+1]:
+                                clean_rows[r_idx][j] = clean_rows[r_idx][j+1]
+                    
+                        # 删除 j+1
+                        for r in clean_rows:
+                            r.pop(j+1)
+                        max_cols -= 1
+                        # 不增加 j，继续检查新的 j (即合并后的列) 和新的 j+1
+                    else:
+                        j += 1
+
+            # 0. 尝试智能合并表头 (针对 "基本\n工资" 被拆分为两行的情况)
+            # 移到 clean_rows 和 合并互斥列 之后，以避免误判
+            if len(clean_rows) > 1:
+                header1 = clean_rows[0]
+                header2 = clean_rows[1]
+            
+                should_merge = False
+                has_content_h2 = False
+            
+                for cell in header2:
+                    if cell:
+                        has_content_h2 = True
+                        break
+            
+                if has_content_h2:
+                    conflict_count = 0
+                    merge_candidates = 0
                 
-                # 检查该行其他列是否为空
-                is_other_empty = True
-                for other_c_idx in range(num_cols):
-                    if other_c_idx != c_idx:
-                        other_text = str(row[other_c_idx]).strip() if row[other_c_idx] else ""
-                        if other_text:
-                            is_other_empty = False
-                            break
-                if is_other_empty:
-                    empty_other_cols_count += 1
+                    for i in range(min(len(header1), len(header2))):
+                        c1 = header1[i]
+                        c2 = header2[i]
+                    
+                        if c1 and c2:
+                            # 同一列都有内容
+                            if len(c1) > 4 and len(c2) > 4:
+                                conflict_count += 1
+                            else:
+                                merge_candidates += 1
+                        elif c2:
+                            merge_candidates += 1
+                
+                    is_data_row_2 = False
+                    if len(clean_rows) > 2:
+                         row3 = clean_rows[2]
+                         match_type_count = 0
+                         check_count = 0
+                         for i in range(min(len(header2), len(row3))):
+                             v2 = header2[i]
+                             v3 = row3[i]
+                             if v2 and v3:
+                                 check_count += 1
+                                 if (v2.isdigit() and v3.isdigit()) or (v2 in ['true', 'false'] and v3 in ['true', 'false']):
+                                     match_type_count += 1
+                     
+                         if check_count > 0 and (match_type_count / check_count) > 0.5:
+                             is_data_row_2 = True
+ 
+                    if not is_data_row_2 and conflict_count == 0:
+                        should_merge = True
+
+                if should_merge:
+                    merged_header = []
+                    max_len = max(len(header1), len(header2))
+                    for i in range(max_len):
+                        c1 = header1[i] if i < len(header1) else ""
+                        c2 = header2[i] if i < len(header2) else ""
+                        merged_header.append(c1 + c2)
+                
+                    clean_rows[0] = merged_header
+                    clean_rows.pop(1)
+
+            # 1. Identify empty columns
+            num_cols = len(clean_rows[0])
+            is_col_empty = [True] * num_cols
+        
+            for row in clean_rows:
+                for c_idx, cell in enumerate(row):
+                    if c_idx < num_cols and cell and cell.strip():
+                        is_col_empty[c_idx] = False
+        
+            # 2. Filter columns
+            final_rows = []
+            for row in clean_rows:
+                new_row = []
+                for c_idx, cell in enumerate(row):
+                    if c_idx < num_cols and not is_col_empty[c_idx]:
+                        new_row.append(cell)
+                final_rows.append(new_row)
             
-            # 判定条件:
-            # 1. 至少 40% 的行以列表标记开头 (宽松一点，因为可能有换行被切断)
-            # 2. 至少 40% 的行内容较长 (排除纯序号列)
-            # 3. 至少 60% 的行其他列为空 (说明主要是这一列在承载内容)
-            if num_rows > 0:
-                ratio_list = list_markers_count / num_rows
-                ratio_long = long_content_count / num_rows
-                ratio_empty_others = empty_other_cols_count / num_rows
+            if not final_rows or not final_rows[0]: return ""
+
+            # 3. 决定是否使用空表头 (针对 KV 表格或类型一致的表格)
+            # 如果第一行看起来像数据（与第二行类型一致），则生成空表头，将第一行作为数据展示
+            use_empty_header = False
+            if len(final_rows) > 1:
+                header_row = final_rows[0]
+                first_body = final_rows[1]
+            
+                match_type_count = 0
+                check_count = 0
+            
+                for i in range(min(len(header_row), len(first_body))):
+                    v1 = header_row[i].strip()
+                    v2 = first_body[i].strip()
                 
-                if ratio_list > 0.4 and ratio_long > 0.4 and ratio_empty_others > 0.6:
-                    return False
+                    if v1 and v2:
+                        check_count += 1
+                        # 检查是否都是布尔值
+                        if v1 in ['true', 'false'] and v2 in ['true', 'false']:
+                            match_type_count += 1
+                        # 检查是否都是数字
+                        elif v1.replace('.','',1).isdigit() and v2.replace('.','',1).isdigit():
+                            match_type_count += 1
+                        # 检查是否都是中文开头 (移除，避免误判)
+                        # elif v1 and v2 and is_cjk(v1[0]) and is_cjk(v2[0]):
+                        #    match_type_count += 1
+            
+                # 如果超过 50% 的非空列类型一致，或者完全是 KV 结构（通常 2-3 列，且包含 param/value）
+                if check_count > 0 and (match_type_count / check_count) > 0.5:
+                    use_empty_header = True
+            
+                # 特殊检查：如果 Header 包含 "true/false" 这种值，绝对不是 Header
+                for cell in header_row:
+                    if cell.strip() in ['true', 'false']:
+                        use_empty_header = True
+                        break
+
+            md = "\n"
+            num_cols = len(final_rows[0])
+        
+            if use_empty_header:
+                # 生成空表头
+                md += "| " + " | ".join([" "] * num_cols) + " |\n"
+                md += "| " + " | ".join(["---"] * num_cols) + " |\n"
+                # 所有行都作为 Body
+                rows_to_process = final_rows
+            else:
+                # 标准表头
+                md += "| " + " | ".join(final_rows[0]) + " |\n"
+                md += "| " + " | ".join(["---"] * num_cols) + " |\n"
+                rows_to_process = final_rows[1:]
+        
+            # 表体
+            for row in rows_to_process:
+                # 如果需要，填充行
+                if len(row) < num_cols:
+                    row += [""] * (num_cols - len(row))
+                md += "| " + " | ".join(row[:num_cols]) + " |\n"
+            md += "\n"
+            return md
+        except Exception:
+            return ""
 
-        return True
-    except Exception:
-        return False
+
+def table_to_markdown(table):
+    """
+    将 PyMuPDF Table 对象（或已分析的 TableAnalysis）转换为 Markdown 字符串。
+    """
+    analysis = table if isinstance(table, TableAnalysis) else TableAnalysis(table)
+    return analysis.to_markdown()
+
+def is_valid_table(table):
+    """
+    判断表格是否有效（参数可以是 PyMuPDF Table 对象或 TableAnalysis）。
+    """
+    analysis = table if isinstance(table, TableAnalysis) else TableAnalysis(table)
+    return analysis.is_valid()
+
+def detect_tables(page, mode="always", timer=NULL_TIMER, drawings=None):
+    """
+    检测页面中的有效表格。
+    mode: 表格检测模式 ("auto" / "always" / "never"，见 table_gate.py)
+    timer: (可选) 分阶段统计 (stage_timing.StageTimer)
+    drawings: (可选) 本页已经取得的 page.get_drawings() 结果，auto 模式的预筛选直接复用
+    Returns: [TableAnalysis]
+    """
+    with timer.stage("table_detection"):
+        run, clip = plan_table_detection(page, mode, drawings)
+        if not run:
+            return []
+        candidates = list(page.find_tables(clip=clip))
+    tables = []
+    with timer.stage("table_filter"):
+        for t in candidates:
+            # 每个候选表格只提取一次单元格，有效性判断和 Markdown 转换共用
+            analysis = TableAnalysis(t)
+            if analysis.is_valid():
+                tables.append(analysis)
+    timer.count("tables_found", len(tables))
+    timer.count("tables_rejected", len(candidates) - len(tables))
+    return tables
 
 def is_block_in_table(block_bbox, tables):
     """
@@ -630,22 +656,11 @@ def smart_merge_text(text):
             result += " " + curr_line
     return result
 
-def estimate_body_size(blocks):
-    """估计正文即最常见的字体大小"""
-    sizes = []
-    for b in blocks:
-        if b["type"] == 0: # text block
-            for line in b["lines"]:
-                for span in line["spans"]:
-                    if span["text"].strip():
-                        sizes.append(round(span["size"], 1))
-    if not sizes: return 10.0
-    return Counter(sizes).most_common(1)[0][0]
-
 def estimate_body_right_margin(blocks, page_width):
     """
     估计正文的右边界 (x1)。
     通过统计所有文本块的 x1 坐标，找到最靠右的密集区域。
+    文档级版面信息 (LayoutProfile) 中没有同样版式的抽样页时，用本页的文本块估计。
     """
     x1s = []
     for b in blocks:
@@ -687,23 +702,30 @@ def extract_block_text(block):
 async def get_pdf_metadata(file_path: str):
     """
     提取PDF元数据和目录结构(TOC)。
+    实际解析在执行层线程池中进行，不阻塞事件循环。
     """
+    return await run_blocking("get_pdf_metadata", _get_pdf_metadata, file_path)
+
+def _get_pdf_metadata(file_path: str):
+    """get_pdf_metadata 的同步实现"""
     if not os.path.exists(file_path):
         return [types.TextContent(type="text", text=f"Error: 文件不存在 - {file_path}")]
     
     try:
-        doc = fitz.open(file_path)
+        # 元数据和目录在文档打开时已读取并缓存，无需持有文档锁
+        with get_document_cache().open(file_path, exclusive=False) as cached_doc:
+            meta = cached_doc.metadata
+            page_count = cached_doc.page_count
+            toc = cached_doc.toc
         
         # 1. 基础元数据
         metadata_text = "=== PDF 元数据 ===\n"
-        meta = doc.metadata
         for key, value in meta.items():
             if value:
                 metadata_text += f"{key}: {value}\n"
-        metadata_text += f"Total Pages: {doc.page_count}\n"
+        metadata_text += f"Total Pages: {page_count}\n"
         
         # 2. 目录结构 (TOC)
-        toc = doc.get_toc()
         if toc:
             metadata_text += "\n=== 目录结构 ===\n"
             for item in toc:
@@ -713,491 +735,862 @@ async def get_pdf_metadata(file_path: str):
         else:
             metadata_text += "\n(未找到目录结构)\n"
             
-        doc.close()
         return [types.TextContent(type="text", text=metadata_text)]
         
     except Exception as e:
         return [types.TextContent(type="text", text=f"Error processing PDF metadata: {str(e)}")]
 
 import json
-import glob
+import time
 
-def merge_rects(rects, threshold=10):
-    """合并重叠或相近的矩形"""
-    if not rects:
-        return []
-    processed_rects = [fitz.Rect(r) for r in rects]
-    merged = []
-    
-    while processed_rects:
-        current = processed_rects.pop(0)
-        has_overlap = True
-        while has_overlap:
-            has_overlap = False
-            i = 0
-            while i < len(processed_rects):
-                other = processed_rects[i]
-                expanded = fitz.Rect(current)
-                expanded.x0 -= threshold
-                expanded.y0 -= threshold
-                expanded.x1 += threshold
-                expanded.y1 += threshold
-                
-                if expanded.intersects(other):
-                    current = current | other
-                    processed_rects.pop(i)
-                    has_overlap = True
-                else:
-                    i += 1
-        merged.append(current)
-    return merged
-
-async def extract_content(file_path: str, page_range: str = "1", keyword: str = None, format: str = "text", include_text: bool = True, include_images: bool = False, use_local_images_only: bool = True, image_output_dir: str = None, image_link_base: str = None, skip_table_detection: bool = False):
+async def extract_content(file_path: str, page_range: str = "1", keyword: str = None, format: str = "text", include_text: bool = True, include_images: bool = False, use_local_images_only: bool = True, image_output_dir: str = None, image_link_base: str = None, skip_table_detection: bool | str = False, max_chars: int = 0, max_pages: int = 0, cursor: str = None, timings: bool = False, profile: bool | str = False):
     """
     提取PDF指定页面的文本和图片。
+    PyMuPDF 解析是 CPU 密集型操作，这里分派到执行层线程池中执行，参数含义见 _extract_content。
+    """
+    return await run_blocking(
+        "extract_pdf_content", _extract_content,
+        file_path, page_range, keyword, format, include_text, include_images,
+        use_local_images_only, image_output_dir, image_link_base, skip_table_detection,
+        max_chars=max_chars, max_pages=max_pages, cursor=cursor, timings=timings, profile=profile
+    )
+
+def _extract_content(file_path: str, page_range: str = "1", keyword: str = None, format: str = "text", include_text: bool = True, include_images: bool = False, use_local_images_only: bool = True, image_output_dir: str = None, image_link_base: str = None, skip_table_detection: bool | str = False, use_cache: bool = True, shared_image_dir: str = None, max_chars: int = 0, max_pages: int = 0, cursor: str = None, timings: bool = False, profile: bool | str = False):
+    """
+    提取PDF指定页面的文本和图片（同步实现）。
     :param file_path: PDF文件路径
     :param page_range: 页码范围，例如 "1-5", "1,3,5" (从1开始)，或 "all" 提取所有页面
     :param keyword: 关键词，如果提供，则仅提取包含该关键词的页面（忽略 page_range）
-    :param format: 输出格式，'text' (默认), 'markdown' 或 'json'
+    :param format: 输出格式，'text' (默认), 'markdown', 'json', 'json_compact' 或 'ndjson'（见 JSON_FORMATS）
     :param use_local_images_only: 如果为True，图片仅保存到本地并在文本中引用路径，不返回Base64数据（避免上下文溢出）
     :param image_output_dir: (可选) 图片保存的根目录，默认为当前目录下的 extracted_images
     :param image_link_base: (可选) Markdown中引用图片的基础路径，默认为 extracted_images
-    :param skip_table_detection: (可选) 是否跳过表格检测（纯文本极速模式）
+    :param skip_table_detection: (可选) 表格检测模式：true 跳过表格检测（纯文本极速模式），或 "auto" / "always" / "never"
+    :param use_cache: (可选) 是否使用文档缓存和页面缓存（批量工作进程中每个文件只处理一次，不使用缓存）
+    :param shared_image_dir: (可选) 批量处理的共享图片目录，跨文档内容相同的图片只保存一份
+    :param max_chars: (可选) 分页：本次响应的字符数上限（页面不截断，至少返回一页），0 表示不限制
+    :param max_pages: (可选) 分页：本次响应的页数上限，0 表示不限制
+    :param cursor: (可选) 上一次分页响应返回的续读游标；提供时从游标记录的下一页继续，
+        page_range / keyword 被忽略，其余提取参数以游标中记录的为准（见 pagination）
+    :param timings: (可选) 是否统计各处理阶段的耗时和计数（见 stage_timing）：JSON 格式写入 meta.timings 和每页的 timings，
+        其他格式在末尾附加统计文本
+    :param profile: (可选) 性能分析：true / "pstats" 用 cProfile 分析本次调用，"collapsed" 另外生成火焰图用的 collapsed stack 文件（见 profiling）。
+        文件保存在图片目录同级的 profiles 目录下，累计耗时最多的函数写入 meta.profile（JSON 格式）或附加在末尾
     :return: 包含文本和图片的列表
     """
-    if not os.path.exists(file_path):
-        return [types.TextContent(type="text", text=f"Error: 文件不存在 - {file_path}")]
+    if cursor:
+        try:
+            cursor_hash, page_range, options = decode_cursor(cursor)
+            if os.path.exists(file_path) and cursor_hash != document_hash(file_path):
+                raise ValueError("cursor 已失效（文档内容已变化），请重新从头读取")
+        except ValueError as e:
+            return [types.TextContent(type="text", text=f"Error: {e}")]
+        keyword = None
+        format = options.get("format", format)
+        include_text = options.get("include_text", include_text)
+        include_images = options.get("include_images", include_images)
+        use_local_images_only = options.get("use_local_images_only", use_local_images_only)
+        image_output_dir = options.get("image_output_dir", image_output_dir)
+        image_link_base = options.get("image_link_base", image_link_base)
+        skip_table_detection = options.get("skip_table_detection", skip_table_detection)
+        max_chars = options.get("max_chars") or 0
+        max_pages = options.get("max_pages") or 0
+    paginated = bool(max_chars or max_pages)
 
     result_content = []
+    # JSON 格式：文档头和各页的 page_data
+    json_items = []
+    stats = {}
+    doc_timings = DocumentTimings() if timings else None
+    profile_mode = resolve_profile_mode(profile)
+    profile_base = _get_profile_base(file_path, image_output_dir) if profile_mode else None
+    with capture_profile(profile_mode, profile_base) as capture:
+        try:
+            for item in _iter_extract_content(
+                file_path, page_range, keyword, format, include_text, include_images, use_local_images_only,
+                image_output_dir, image_link_base, skip_table_detection, use_cache, shared_image_dir,
+                max_chars=max_chars, max_pages=max_pages, stats=stats, timings=doc_timings
+            ):
+                if isinstance(item, dict):
+                    json_items.append(item)
+                else:
+                    result_content.append(item)
+        except Exception as e:
+            if format in JSON_FORMATS:
+                # JSON 格式出错时只返回错误信息
+                result_content = []
+            result_content.append(types.TextContent(type="text", text=f"Error processing PDF: {str(e)}"))
+            return result_content
+    get_request_stats().record_pages(stats.get("pages", 0))
+
+    # 分页：还有剩余页面时生成续读游标
+    pagination = None
+    if paginated and "pages" in stats:
+        remaining = stats["remaining_pages"]
+        next_cursor = None
+        if remaining:
+            next_cursor = encode_cursor(document_hash(file_path), remaining, {
+                "format": format, "include_text": include_text, "include_images": include_images,
+                "use_local_images_only": use_local_images_only, "image_output_dir": image_output_dir,
+                "image_link_base": image_link_base, "skip_table_detection": resolve_table_detection(skip_table_detection),
+                "max_chars": max_chars, "max_pages": max_pages,
+            })
+        pagination = {
+            "returned_pages": stats["pages"],
+            "remaining_pages": len(remaining),
+            "next_page_range": compress_pages(remaining) or None,
+            "next_cursor": next_cursor,
+        }
+
+    # 如果是 JSON 格式，返回整个 JSON 字符串
+    if json_items:
+        meta = json_items[0]["meta"]
+        meta["cache"]["hits"] = stats["cache_hits"]
+        meta["cache"]["misses"] = stats["pages"] - stats["cache_hits"]
+        if pagination is not None:
+            meta["pagination"] = pagination
+        if doc_timings is not None:
+            meta["timings"] = doc_timings.to_dict()
+        if capture is not None:
+            meta["profile"] = capture_to_dict(capture)
+        buffer = io.StringIO()
+        _write_json_stream(buffer, json_items, format)
+        return [types.TextContent(type="text", text=buffer.getvalue())]
+    if doc_timings is not None and doc_timings.pages:
+        lines = format_timings(merge_timings({}, os.path.basename(file_path), doc_timings.to_dict()))
+        result_content.append(types.TextContent(type="text", text="\n[耗时统计]\n" + "\n".join(lines) + "\n"))
+    if capture is not None:
+        result_content.append(types.TextContent(type="text", text="\n[性能分析]\n" + "\n".join(format_capture(capture)) + "\n"))
+    if pagination is not None and pagination["next_cursor"]:
+        result_content.append(types.TextContent(type="text", text=(
+            f"\n[分页] 本次返回 {pagination['returned_pages']} 页，剩余 {pagination['remaining_pages']} 页 "
+            f"(页码 {pagination['next_page_range']})。继续读取请使用相同的 file_path 并传入 cursor:\n{pagination['next_cursor']}\n"
+        )))
+    return result_content
+
+def _get_profile_base(file_path, image_output_dir=None):
+    """单次调用的性能分析文件路径（不含扩展名）：图片目录同级的 profiles/<文件名>_<时间戳>"""
+    mode_dir = os.path.dirname(os.path.abspath(image_output_dir or "extracted_images"))
+    timestamp = time.strftime("%Y%m%d_%H%M%S") + f"_{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(mode_dir, "profiles", f"{profile_base_name(os.path.basename(file_path))}_{timestamp}")
+
+def _iter_extract_content(file_path, page_range="1", keyword=None, format="text", include_text=True, include_images=False, use_local_images_only=True, image_output_dir=None, image_link_base=None, skip_table_detection=False, use_cache=True, shared_image_dir=None, max_chars=0, max_pages=0, stats=None, timings=None):
+    """
+    逐页生成提取结果，参数含义见 _extract_content。调用方每次只需持有一页的结果，内存占用与文档页数无关。
+    非 JSON 格式依次生成 TextContent / ImageContent（拼接即为完整输出）。
+    JSON 格式（JSON_FORMATS，序列化方式见 _write_json_stream）先生成文档头（_build_json_document 的结果，pages 为空列表，meta.cache 中的命中数按全部未命中预填），
+    再逐页生成 page_data；文件不存在等提示信息仍以 TextContent 生成。
+    max_chars / max_pages: 预算（0 表示不限制）。加入下一页会超出预算时停止生成（至少生成一页），
+        超出预算的那一页已经提取（并写入页面缓存），续读时直接读取缓存
+    stats: (可选) dict，生成结束时写入 {"pages": 生成的页数, "cache_hits": 其中页面缓存命中数, "remaining_pages": 因预算未生成的页码}
+    timings: (可选) stage_timing.DocumentTimings，记录文档级和逐页的分阶段耗时；JSON 格式的每页数据中附加该页的 timings
+    处理过程中的异常直接抛出，由调用方决定如何报告。
+    """
+    if not os.path.exists(file_path):
+        yield types.TextContent(type="text", text=f"Error: 文件不存在 - {file_path}")
+        return
+
+    # 统一为表格检测模式（同时作为页面缓存键的一部分）
+    skip_table_detection = resolve_table_detection(skip_table_detection)
+    # 各种 JSON 格式的页面数据相同，只是序列化方式不同（页面缓存也共用）
+    page_format = "json" if format in JSON_FORMATS else format
+    page_timings = timings if timings is not None else NULL_TIMINGS
     
-    # 存储 JSON 格式的结构化数据
-    json_data = {
-        "file_path": file_path,
-        "meta": {
-            "page_range": page_range,
-            "format": format,
-            "include_text": include_text,
-            "include_images": include_images,
-            "use_local_images_only": use_local_images_only,
-            "note": "To get Base64 image data, set 'use_local_images_only' to false." if use_local_images_only and include_images else "Base64 image data included."
-        },
-        "pages": []
-    }
+    open_start = time.perf_counter()
+    with get_document_cache(use_cache).open(file_path) as cached_doc:
+        page_timings.document.add("open", time.perf_counter() - open_start)
+        doc = cached_doc.doc
+        total_pages = cached_doc.page_count
     
-    try:
-        doc = fitz.open(file_path)
-        total_pages = len(doc)
-        
         pages_to_extract = []
-        
+        # {页码: (page, textpage)}，关键词扫描时建立的 TextPage
+        reused_textpages = {}
+    
         # 1. 如果指定了关键词，优先按关键词搜索
         if keyword and keyword.strip():
-            if format != 'json':
-                result_content.append(types.TextContent(type="text", text=f"正在搜索关键词: '{keyword}'...\n"))
             found_pages = []
+            keyword_lower = keyword.lower()
+            scan_start = time.perf_counter()
             for i in range(total_pages):
                 page = doc[i]
-                text = page.get_text()
-                if keyword.lower() in text.lower():
+                # 扫描时建立的 TextPage 保留给命中的页面，正文提取时直接复用，不再重新解析页面文本
+                textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+                text = page.get_text(textpage=textpage)
+                if keyword_lower in text.lower():
                     found_pages.append(i)
-            
+                    if len(reused_textpages) < MAX_REUSED_TEXTPAGES:
+                        reused_textpages[i] = (page, textpage)
+            page_timings.document.add("keyword_scan", time.perf_counter() - scan_start)
+        
             if not found_pages:
-                doc.close()
-                return [types.TextContent(type="text", text=f"未找到包含关键词 '{keyword}' 的页面")]
-            
+                yield types.TextContent(type="text", text=f"未找到包含关键词 '{keyword}' 的页面")
+                return
+            if page_format != 'json':
+                yield types.TextContent(type="text", text=f"正在搜索关键词: '{keyword}'...\n")
+        
             pages_to_extract = found_pages
             page_range = f"keyword_search({len(found_pages)} pages)"
-            
+        
         # 2. 否则按页码范围处理
         else:
-            if str(page_range).lower() == "all":
-                pages_to_extract = list(range(total_pages))
-            else:
-                try:
-                    # 解析页码
-                    parts = str(page_range).split(',')
-                    for part in parts:
-                        if '-' in part:
-                            start, end = map(int, part.split('-'))
-                            # 转换为0-based索引
-                            pages_to_extract.extend(range(start - 1, end))
-                        else:
-                            pages_to_extract.append(int(part) - 1)
-                    
-                    # 过滤有效页码并去重排序
-                    pages_to_extract = sorted(list(set([p for p in pages_to_extract if 0 <= p < total_pages])))
-                except Exception:
-                    # 解析失败默认提取第一页
-                    pages_to_extract = [0]
-
-        if format != 'json':
-            # 根据模式显示不同的元数据信息
-            mode_text = "极速纯文本 (Fast Mode)" if skip_table_detection else "标准模式 (Normal Mode)"
-            summary_text = f"正在处理文件: {file_path}\n页码范围: {page_range} (共 {len(pages_to_extract)} 页)\n处理模式: {mode_text}\n内容类型: {'文本' if include_text else ''}{'/' if include_text and include_images else ''}{'图片' if include_images else ''}\n"
-            result_content.append(types.TextContent(type="text", text=summary_text))
+            pages_to_extract = parse_page_range(page_range, total_pages)
+
+        # 单页结果缓存（重叠页码范围/重复请求直接读取缓存）
+        page_cache = get_page_cache() if use_cache else None
+        doc_hash = document_hash(file_path) if page_cache else None
+        cache_hits = 0
+
+        if page_format == 'json':
+            json_data = _build_json_document(file_path, page_range, format, include_text, include_images, use_local_images_only)
+            json_data["meta"]["cache"] = {
+                "enabled": page_cache is not None,
+                "hits": 0,
+                "misses": len(pages_to_extract)
+            }
+            yield json_data
+        else:
+            yield types.TextContent(type="text", text=_build_summary_text(file_path, page_range, len(pages_to_extract), include_text, include_images, skip_table_detection))
 
         # 准备图片输出目录
-        pdf_filename = os.path.basename(file_path)
-        pdf_name_no_ext = os.path.splitext(pdf_filename)[0]
-        
-        if image_output_dir:
-            output_dir = os.path.join(image_output_dir, pdf_name_no_ext)
-        else:
-            cwd = os.getcwd()
-            output_dir = os.path.join(cwd, "extracted_images", pdf_name_no_ext)
-        
+        output_dir, pdf_name_no_ext = _get_image_output_dir(file_path, image_output_dir)
+    
         # 如果需要提取图片，先创建目录
         has_images = False
+        image_names = None
+        saved_images = {}
         if include_images:
             os.makedirs(output_dir, exist_ok=True)
+            # 重复引用的图片使用其在文档中第一次出现时的文件名，只保存一次
+            if pages_to_extract:
+                with page_timings.document.stage("image_index"):
+                    image_names = first_image_names(doc, max(pages_to_extract) + 1)
+    
+        # 文档级版面信息，与已打开的文档一起缓存
+        layout = None
+        if include_text:
+            if cached_doc.layout is None:
+                with page_timings.document.stage("layout"):
+                    cached_doc.layout = build_layout_profile(doc)
+            layout = cached_doc.layout
+
+        emitted = 0
+        used_chars = 0
+        remaining_pages = []
+        # 图片文件由后台写入线程写入，生成结束前等待本次调用的所有写入完成
+        with get_output_writer().group() as out:
+            for n, i in enumerate(pages_to_extract):
+                if max_pages and emitted >= max_pages:
+                    remaining_pages = pages_to_extract[n:]
+                    break
+                page, textpage = reused_textpages.pop(i, (None, None))
+                with page_timings.page(i + 1) as timer:
+                    page_data, page_content, page_has_images, cache_hit = _extract_page_cached(
+                        page_cache, doc_hash, doc, i, page=page, textpage=textpage,
+                        image_names=image_names, saved_images=saved_images, shared_image_dir=shared_image_dir, out=out,
+                        layout=layout, timer=timer, format=page_format, include_text=include_text, include_images=include_images,
+                        use_local_images_only=use_local_images_only, output_dir=output_dir,
+                        pdf_name_no_ext=pdf_name_no_ext, image_link_base=image_link_base,
+                        skip_table_detection=skip_table_detection
+                    )
+                if max_chars:
+                    page_chars = _page_output_chars(page_data, page_content, format)
+                    if emitted and used_chars + page_chars > max_chars:
+                        remaining_pages = pages_to_extract[n:]
+                        break
+                    used_chars += page_chars
+                emitted += 1
+                cache_hits += cache_hit
+        
+                if page_format == 'json':
+                    if timings is not None:
+                        # 缓存中的 page_data 不能修改，附加统计时复制一份
+                        page_data = {**page_data, "timings": timings.page_dict()}
+                    yield page_data
+                    continue
 
-        for i in pages_to_extract:
-            page_num = i + 1
-            page = doc[i]
-            
-            page_data = {
-                "page": page_num,
-                "text": "",
-                "images": []
-            }
-            
-            # 存储当前页的图片路径，用于插入到 Markdown
-            page_image_paths = []
-            page_image_items = [] # 存储图片及其位置信息
-            image_content_objects = []
-
-            # 1. 先处理图片（保存并获取路径）
-            if include_images:
-                image_list = page.get_images()
-                if image_list:
-                    if not has_images:
-                        has_images = True
-                        if format != 'json':
-                            result_content.append(types.TextContent(type="text", text=f"\n[图片保存目录: {output_dir}]\n"))
-                    
-                    for j, img in enumerate(image_list):
-                        try:
-                            xref = img[0]
-                            base_image = doc.extract_image(xref)
-                            image_bytes = base_image["image"]
-                            ext = base_image["ext"]
-                            img_filename = f"page_{page_num}_img_{j+1}.{ext}"
-                            img_path = os.path.join(output_dir, img_filename)
-                            
-                            with open(img_path, "wb") as f:
-                                f.write(image_bytes)
-                            
-                            # 记录路径
-                            page_image_paths.append(img_filename)
-                            
-                            # 计算相对引用路径
-                            if image_link_base:
-                                rel_path = f"{image_link_base}/{pdf_name_no_ext}/{img_filename}"
-                            else:
-                                rel_path = f"extracted_images/{pdf_name_no_ext}/{img_filename}"
-                            
-                            # 转义空格
-                            rel_path = rel_path.replace(" ", "%20")
-                            md_link = f"![Image]({rel_path})"
-
-                            # 获取图片位置并记录
-                            if format == 'markdown':
-                                rects = page.get_image_rects(xref)
-                                if rects:
-                                    for rect in rects:
-                                        page_image_items.append({
-                                            "y0": rect.y0,
-                                            "type": "image",
-                                            "content": md_link
-                                        })
-                            
-                            # 记录 JSON 数据
-                            img_info = {
-                                "filename": img_filename,
-                                "local_path": img_path,
-                                "rel_path": rel_path
-                            }
-                            
-                            # 如果需要返回 Base64
-                            if not use_local_images_only:
-                                img_b64 = base64.b64encode(image_bytes).decode('utf-8')
-                                img_info["base64"] = img_b64
-                                img_info["mime_type"] = f"image/{ext}"
-                                
-                                if format != 'json':
-                                    image_content_objects.append(types.ImageContent(
-                                        type="image",
-                                        data=img_b64,
-                                        mimeType=f"image/{ext}"
-                                    ))
-                                    result_content.append(types.TextContent(type="text", text=f"  - Saved: {img_filename}\n"))
-                            
-                            page_data["images"].append(img_info)
-                            
-                        except Exception as img_err:
-                            if format != 'json':
-                                result_content.append(types.TextContent(type="text", text=f"  Warning: Failed to extract image {j+1}: {img_err}\n"))
+                if page_has_images and not has_images:
+                    has_images = True
+                    yield types.TextContent(type="text", text=_image_dir_notice(output_dir))
+                yield from page_content
 
-            # 1.5 提取矢量图形（Vector Graphics）
-            if include_images:
-                try:
-                    drawings = page.get_drawings()
-                    if drawings:
-                        # 收集所有绘图的矩形
-                        drawing_rects = []
-                        page_rect = page.rect
-                        for draw in drawings:
-                            r = draw["rect"]
-                            # 过滤掉全页背景或极小的噪点
-                            if r.width > page_rect.width * 0.95 and r.height > page_rect.height * 0.95:
-                                continue
-                            if r.width < 5 and r.height < 5:
-                                continue
-                            drawing_rects.append(r)
-                        
-                        # 合并矩形
-                        merged_drawings = merge_rects(drawing_rects, threshold=15)
-                        
-                        # 处理合并后的矢量区域
-                        for k, rect in enumerate(merged_drawings):
-                            # 渲染为图片 (使用 alpha=True 保留透明度)
-                            pix = page.get_pixmap(clip=rect, alpha=True)
-                            
-                            # 过滤无效图片
-                            if pix.width < 10 and pix.height < 10:
-                                continue
+    if stats is not None:
+        stats["pages"] = emitted
+        stats["cache_hits"] = cache_hits
+        stats["remaining_pages"] = remaining_pages
 
-                            vec_filename = f"page_{page_num}_vec_{k+1}.png"
-                            vec_path = os.path.join(output_dir, vec_filename)
-                            
-                            pix.save(vec_path)
-                            
-                            # 记录路径
-                            page_image_paths.append(vec_filename)
-                            
-                            # 相对路径
-                            if image_link_base:
-                                rel_path = f"{image_link_base}/{pdf_name_no_ext}/{vec_filename}"
-                            else:
-                                rel_path = f"extracted_images/{pdf_name_no_ext}/{vec_filename}"
-                            rel_path = rel_path.replace(" ", "%20")
-                            md_link = f"![Vector]({rel_path})"
-                            
-                            page_image_items.append({
-                                "y0": rect.y0,
-                                "type": "image",
-                                "content": md_link
-                            })
-                            
-                            # JSON 记录
-                            if format == 'json':
-                                page_data["images"].append({
-                                    "filename": vec_filename,
-                                    "local_path": vec_path,
-                                    "rel_path": rel_path,
-                                    "type": "vector_graphic"
-                                })
+def _page_output_chars(page_data, page_content, format):
+    """一页在响应中占用的字符数（分页预算）：Base64 图片数据也计算在内"""
+    if format in JSON_FORMATS:
+        return len(_json_dumps(page_data, format))
+    return sum(len(item.text) if item.type == "text" else len(item.data) for item in page_content)
+
+def parse_page_range(page_range, total_pages):
+    """
+    解析页码范围字符串，返回 0-based 页码列表（去重排序）。
+    支持 "all", "1-5", "1,3,5"；解析失败时默认返回第一页。
+    """
+    if str(page_range).lower() == "all":
+        return list(range(total_pages))
+    
+    pages_to_extract = []
+    try:
+        # 解析页码
+        parts = str(page_range).split(',')
+        for part in parts:
+            if '-' in part:
+                start, end = map(int, part.split('-'))
+                # 转换为0-based索引
+                pages_to_extract.extend(range(start - 1, end))
+            else:
+                pages_to_extract.append(int(part) - 1)
+        
+        # 过滤有效页码并去重排序
+        return sorted(list(set([p for p in pages_to_extract if 0 <= p < total_pages])))
+    except Exception:
+        # 解析失败默认提取第一页
+        return [0]
+
+def _build_json_document(file_path, page_range, format, include_text, include_images, use_local_images_only):
+    """构建 JSON 输出的顶层结构（pages 为空列表，由调用方逐页填充）"""
+    return {
+        "file_path": file_path,
+        "meta": {
+            "page_range": page_range,
+            "format": format,
+            "include_text": include_text,
+            "include_images": include_images,
+            "use_local_images_only": use_local_images_only,
+            "note": "To get Base64 image data, set 'use_local_images_only' to false." if use_local_images_only and include_images else "Base64 image data included."
+        },
+        "pages": []
+    }
 
-                except Exception as vec_err:
-                     if format != 'json':
-                        # 忽略矢量提取错误
-                        pass
+# JSON 输出格式：
+#   json          缩进两格的完整文档（默认）
+#   json_compact  不缩进、不加空格的完整文档，体积更小、序列化更快
+#   ndjson        每行一条记录：第一行是文档头 {"file_path", "meta"}，之后每页一行 {"page", "text", "images"}，
+#                 可以逐行读取、边生成边处理
+JSON_FORMATS = ("json", "json_compact", "ndjson")
 
-            # 2. 提取文本
-            if include_text:
-                # 2.1 检测表格
-                tables = []
+def _json_dumps(data, format="json"):
+    if format == "json":
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def _write_json_stream(stream, items, format="json"):
+    """
+    把 JSON 文档头和逐页 page_data（_iter_extract_content 的生成结果）按 format 逐页写入 stream。
+    json / json_compact 写出的内容与 _json_dumps(完整文档, format) 完全相同；ndjson 每条记录一行。
+    其中的 TextContent（文件不存在等提示信息）按原文写入。
+    """
+    header_written = False
+    tail = ""
+    page_count = 0
+    for item in items:
+        if not isinstance(item, dict):
+            stream.write(item.text)
+        elif format == "ndjson":
+            if not header_written:
+                item = {key: value for key, value in item.items() if key != "pages"}
+                header_written = True
+            stream.write(_json_dumps(item, format) + "\n")
+        elif not header_written:
+            # 文档头的最后一个键是空的 pages 列表，页面逐个写在它的位置上
+            empty_pages = '"pages": []' if format == "json" else '"pages":[]'
+            head, tail = _json_dumps(item, format).rsplit(empty_pages, 1)
+            stream.write(head + empty_pages[:-1])
+            header_written = True
+        elif format == "json":
+            # 页面位于第二层缩进
+            page_text = _json_dumps(item, format).replace("\n", "\n    ")
+            stream.write((",\n    " if page_count else "\n    ") + page_text)
+            page_count += 1
+        else:
+            stream.write(("," if page_count else "") + _json_dumps(item, format))
+            page_count += 1
+    if header_written and format != "ndjson":
+        stream.write(("\n  ]" if page_count and format == "json" else "]") + tail)
+
+def _build_summary_text(file_path, page_range, page_count, include_text, include_images, skip_table_detection):
+    """非 JSON 输出开头的处理摘要"""
+    # 根据模式显示不同的元数据信息
+    mode_text = "极速纯文本 (Fast Mode)" if resolve_table_detection(skip_table_detection) == "never" else "标准模式 (Normal Mode)"
+    return f"正在处理文件: {file_path}\n页码范围: {page_range} (共 {page_count} 页)\n处理模式: {mode_text}\n内容类型: {'文本' if include_text else ''}{'/' if include_text and include_images else ''}{'图片' if include_images else ''}\n"
+
+def _image_dir_notice(output_dir):
+    return f"\n[图片保存目录: {output_dir}]\n"
+
+def _get_image_output_dir(file_path, image_output_dir=None):
+    """
+    计算某个 PDF 的图片输出目录。
+    Returns: (output_dir, pdf_name_no_ext)
+    """
+    pdf_filename = os.path.basename(file_path)
+    pdf_name_no_ext = os.path.splitext(pdf_filename)[0]
+    
+    if image_output_dir:
+        output_dir = os.path.join(image_output_dir, pdf_name_no_ext)
+    else:
+        cwd = os.getcwd()
+        output_dir = os.path.join(cwd, "extracted_images", pdf_name_no_ext)
+    return output_dir, pdf_name_no_ext
+
+# 关键词搜索时最多保留多少个命中页面的 TextPage（限制内存占用）
+MAX_REUSED_TEXTPAGES = 100
+
+def _content_to_dict(item):
+    if item.type == "image":
+        return {"type": "image", "data": item.data, "mimeType": item.mimeType}
+    return {"type": "text", "text": item.text}
+
+def _content_from_dict(data):
+    if data["type"] == "image":
+        return types.ImageContent(type="image", data=data["data"], mimeType=data["mimeType"])
+    return types.TextContent(type="text", text=data["text"])
+
+def _write_output(out, path, data):
+    """通过写入组 out 异步写入文件；out 为 None 时直接写入"""
+    if out is not None:
+        out.write(path, data)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+
+def _save_page_image(doc, xref, page_num, j, output_dir, use_local_images_only, image_names=None, saved_images=None, shared_image_dir=None, out=None):
+    """
+    保存页面中的一张图片。
+    image_names: first_image_names 的结果；同一 xref 在文档中多次出现时都使用第一次出现的文件名
+    saved_images: 本次提取中已保存的图片 {xref: (文件名, 路径, 扩展名)}，重复引用时不再解码和写入
+    shared_image_dir: 批量处理的共享图片目录，内容相同的图片只保存一份（见 image_store）
+    out: (可选) 写入组，图片文件交给后台写入线程写入
+    Returns: (img_filename, img_path, ext, image_bytes)；复用已保存的图片且不需要 Base64 时 image_bytes 为 None
+    """
+    saved = saved_images.get(xref) if saved_images is not None else None
+    if saved is not None:
+        img_filename, img_path, ext = saved
+        image_bytes = None if use_local_images_only else doc.extract_image(xref)["image"]
+        return img_filename, img_path, ext, image_bytes
+    
+    base_image = doc.extract_image(xref)
+    image_bytes = base_image["image"]
+    ext = base_image["ext"]
+    name = (image_names or {}).get(xref) or f"page_{page_num}_img_{j+1}"
+    img_filename = f"{name}.{ext}"
+    img_path = os.path.join(output_dir, img_filename)
+    if out is not None:
+        out.call(write_image_file, img_path, image_bytes, ext, shared_image_dir, nbytes=len(image_bytes), path=img_path)
+    else:
+        write_image_file(img_path, image_bytes, ext, shared_image_dir)
+    if saved_images is not None:
+        saved_images[xref] = (img_filename, img_path, ext)
+    return img_filename, img_path, ext, image_bytes
+
+def _extract_page_cached(page_cache, doc_hash, doc, i, page=None, textpage=None, image_names=None, saved_images=None, shared_image_dir=None, out=None, layout=None, timer=NULL_TIMER, **options):
+    """
+    带缓存的 _extract_page，参数含义同 _extract_page。
+    page/textpage、图片去重状态、写入组、版面信息和分阶段统计不影响输出（图片名和版面信息只取决于文档本身），不属于缓存键。
+    缓存键包含文档内容哈希、页码和全部提取参数（含图片目录，因为输出中引用了图片路径）；
+    命中时还要求该页写出的图片文件仍然存在，否则重新提取。
+    Returns: (page_data, page_content, has_images, cache_hit)
+    """
+    reuse = {
+        "page": page, "textpage": textpage,
+        "image_names": image_names, "saved_images": saved_images, "shared_image_dir": shared_image_dir, "out": out,
+        "layout": layout, "timer": timer
+    }
+    if page_cache is None:
+        return (*_extract_page(doc, i, **reuse, **options), False)
+    
+    key = page_cache.make_key(doc_hash, i, options)
+    entry = page_cache.get(key)
+    if entry is not None and all(os.path.exists(path) for path in entry["files"]):
+        page_cache.hits += 1
+        timer.count("cache_hits")
+        page_content = [_content_from_dict(item) for item in entry["content"]]
+        return entry["page_data"], page_content, entry["has_images"], True
+    
+    page_cache.misses += 1
+    written_files = []
+    page_data, page_content, has_images = _extract_page(doc, i, written_files=written_files, **reuse, **options)
+    page_cache.put(key, {
+        "page_data": page_data,
+        "content": [_content_to_dict(item) for item in page_content],
+        "has_images": has_images,
+        "files": written_files
+    })
+    return page_data, page_content, has_images, False
+
+def _extract_page(doc, i, format="text", include_text=True, include_images=False, use_local_images_only=True, output_dir=None, pdf_name_no_ext="", image_link_base=None, skip_table_detection=False, written_files=None, page=None, textpage=None, image_names=None, saved_images=None, shared_image_dir=None, out=None, layout=None, timer=NULL_TIMER):
+    """
+    提取单页的文本和图片。
+    页面之间互不依赖，因此批量处理时可以把同一文档的不同页交给不同的工作进程。
+    written_files: (可选) 列表，写出的图片文件路径会追加到其中（供页面缓存校验）
+    page, textpage: (可选) 已加载的页面及其 TextPage（flags=TEXTFLAGS_DICT），复用它们提取文本结构
+    image_names, saved_images, shared_image_dir: (可选) 图片去重状态，见 _save_page_image
+    out: (可选) 写入组（output_writer.WriteGroup），图片文件异步写入；调用方负责等待写入完成
+    layout: (可选) 文档级版面信息 (layout_profile.LayoutProfile)，未提供时按文档计算
+    timer: (可选) 该页的分阶段统计 (stage_timing.StageTimer)
+    Returns: (page_data, page_content, has_images)
+        page_data: 该页的 JSON 结构化数据
+        page_content: 该页在非 JSON 模式下输出的内容列表 (TextContent / ImageContent)
+        has_images: 该页是否包含位图（用于决定何时输出图片保存目录提示）
+    """
+    table_detection = resolve_table_detection(skip_table_detection)
+    page_num = i + 1
+    if page is None:
+        page = doc[i]
+    
+    page_data = {
+        "page": page_num,
+        "text": "",
+        "images": []
+    }
+    page_content = []
+    has_images = False
+    
+    # 存储当前页的图片路径，用于插入到 Markdown
+    page_image_paths = []
+    page_image_items = [] # 存储图片及其位置信息
+    image_content_objects = []
+
+    # 1. 先处理图片（保存并获取路径）
+    if include_images:
+        image_list = page.get_images()
+        if image_list:
+            has_images = True
+            
+            timer.count("images", len(image_list))
+            for j, img in enumerate(image_list):
                 try:
-                    if not skip_table_detection:
-                        raw_tables = page.find_tables()
-                        for t in raw_tables:
-                            if is_valid_table(t):
-                                tables.append(t)
-                except Exception:
-                    pass
-
-                blocks = page.get_text("dict", sort=True)["blocks"]
-                body_size = estimate_body_size(blocks)
-                
-                # 计算正文右边界
-                body_right_margin = estimate_body_right_margin(blocks, page.rect.width)
+                    xref = img[0]
+                    with timer.stage("images"):
+                        img_filename, img_path, ext, image_bytes = _save_page_image(
+                            doc, xref, page_num, j, output_dir, use_local_images_only,
+                            image_names, saved_images, shared_image_dir, out
+                        )
+                    if written_files is not None:
+                        written_files.append(img_path)
+                    
+                    # 记录路径
+                    page_image_paths.append(img_filename)
+                    
+                    # 计算相对引用路径
+                    if image_link_base:
+                        rel_path = f"{image_link_base}/{pdf_name_no_ext}/{img_filename}"
+                    else:
+                        rel_path = f"extracted_images/{pdf_name_no_ext}/{img_filename}"
+                    
+                    # 转义空格
+                    rel_path = rel_path.replace(" ", "%20")
+                    md_link = f"![Image]({rel_path})"
+
+                    # 获取图片位置并记录
+                    if format == 'markdown':
+                        rects = page.get_image_rects(xref)
+                        if rects:
+                            for rect in rects:
+                                page_image_items.append({
+                                    "y0": rect.y0,
+                                    "type": "image",
+                                    "content": md_link
+                                })
+                    
+                    # 记录 JSON 数据
+                    img_info = {
+                        "filename": img_filename,
+                        "local_path": img_path,
+                        "rel_path": rel_path
+                    }
+                    
+                    # 如果需要返回 Base64
+                    if not use_local_images_only:
+                        img_b64 = base64.b64encode(image_bytes).decode('utf-8')
+                        img_info["base64"] = img_b64
+                        img_info["mime_type"] = f"image/{ext}"
+                        
+                        if format != 'json':
+                            image_content_objects.append(types.ImageContent(
+                                type="image",
+                                data=img_b64,
+                                mimeType=f"image/{ext}"
+                            ))
+                            page_content.append(types.TextContent(type="text", text=f"  - Saved: {img_filename}\n"))
+                    
+                    page_data["images"].append(img_info)
+                    
+                except Exception as img_err:
+                    if format != 'json':
+                        page_content.append(types.TextContent(type="text", text=f"  Warning: Failed to extract image {j+1}: {img_err}\n"))
+
+    # 1.5 提取矢量图形（Vector Graphics）
+    # 本页的 get_drawings() 结果同时用于表格检测的预筛选，每页只调用一次
+    drawings = None
+    if include_images:
+        try:
+            with timer.stage("drawings"):
+                drawings = page.get_drawings()
+            timer.count("drawings", len(drawings))
+            if drawings:
+                # 收集所有绘图的矩形
+                drawing_rects = []
+                page_rect = page.rect
+                for draw in drawings:
+                    r = draw["rect"]
+                    # 过滤掉全页背景或极小的噪点
+                    if r.width > page_rect.width * 0.95 and r.height > page_rect.height * 0.95:
+                        continue
+                    if r.width < 5 and r.height < 5:
+                        continue
+                    drawing_rects.append(r)
                 
-                # 2.2 处理文本块（过滤和预处理）
-                processed_paragraphs = [] # 列表元素：{y0, text}
-                current_para_text = ""
-                current_para_y0 = 0
-                last_bbox = None
+                # 合并矩形
+                with timer.stage("merge_rects"):
+                    merged_drawings = merge_rects(drawing_rects, threshold=15)
+                timer.count("merged_regions", len(merged_drawings))
                 
-                # 刷新当前段落的辅助函数
-                def flush_para():
-                    nonlocal current_para_text, current_para_y0
-                    if current_para_text:
-                        processed_paragraphs.append({"y0": current_para_y0, "type": "text", "content": current_para_text})
-                        current_para_text = ""
-
-                for b in blocks:
-                    if b["type"] != 0:
-                        continue
+                # 处理合并后的矢量区域
+                for k, rect in enumerate(merged_drawings):
+                    # 渲染为图片 (使用 alpha=True 保留透明度)
+                    with timer.stage("vector_render"):
+                        pix = page.get_pixmap(clip=rect, alpha=True)
                     
-                    # 如果在表格中则跳过
-                    if is_block_in_table(b["bbox"], tables):
+                    # 过滤无效图片
+                    if pix.width < 10 and pix.height < 10:
                         continue
 
-                    block_text, size = extract_block_text(b)
-                    if not block_text:
-                        continue
-                    if block_text.isdigit() and (abs(size - body_size) > 1 or size < body_size):
-                        continue
+                    vec_filename = f"page_{page_num}_vec_{k+1}.png"
+                    vec_path = os.path.join(output_dir, vec_filename)
                     
-                    # 修正: 如果正文大小异常大（可能因为页面字数少），强制设为默认值
-                    if body_size > 20:
-                        body_size = 12.0
-                        
-                    prefix = ""
-                    is_header = False
-                    if format == 'markdown':
-                        if size > body_size + 6:
-                            prefix = "# "
-                            is_header = True
-                        elif size > body_size + 3:
-                            prefix = "## "
-                            is_header = True
-                        elif size > body_size + 1:
-                            if len(block_text) < 50:
-                                prefix = "### "
-                                is_header = True
-                            else:
-                                block_text = f"**{block_text}**"
-                    curr_bbox = b["bbox"]
-                    curr_x0 = curr_bbox[0]
+                    # 在当前线程编码（MuPDF 对象不跨线程使用），写入交给写入线程
+                    with timer.stage("vector_render"):
+                        png_bytes = pix.tobytes("png")
+                    timer.count("vector_images")
+                    _write_output(out, vec_path, png_bytes)
+                    if written_files is not None:
+                        written_files.append(vec_path)
+                    
+                    # 记录路径
+                    page_image_paths.append(vec_filename)
+                    
+                    # 相对路径
+                    if image_link_base:
+                        rel_path = f"{image_link_base}/{pdf_name_no_ext}/{vec_filename}"
+                    else:
+                        rel_path = f"extracted_images/{pdf_name_no_ext}/{vec_filename}"
+                    rel_path = rel_path.replace(" ", "%20")
+                    md_link = f"![Vector]({rel_path})"
+                    
+                    page_image_items.append({
+                        "y0": rect.y0,
+                        "type": "image",
+                        "content": md_link
+                    })
                     
-                    if is_header:
-                        flush_para()
-                        processed_paragraphs.append({
-                            "y0": curr_bbox[1], 
-                            "type": "text", 
-                            "content": f"\n\n{prefix}{block_text}\n\n"
+                    # JSON 记录
+                    if format == 'json':
+                        page_data["images"].append({
+                            "filename": vec_filename,
+                            "local_path": vec_path,
+                            "rel_path": rel_path,
+                            "type": "vector_graphic"
                         })
-                        last_bbox = curr_bbox
-                        continue
 
-                    should_merge = False
-                    if current_para_text:
-                        if last_bbox:
-                            v_dist = curr_bbox[1] - last_bbox[3]
-                            if v_dist < 15.0:
-                                if not is_sentence_end(current_para_text.strip()[-1]):
-                                    should_merge = True
-                                last_x0 = last_bbox[0]
-                                if abs(curr_x0 - last_x0) > 5.0:
-                                    should_merge = False
-                                last_x1 = last_bbox[2]
-                                # 使用计算出的正文右边界，允许一定的误差 (e.g. 5 points)
-                                if last_x1 < (body_right_margin - 5):
-                                    should_merge = False
-                                if is_list_item_start(block_text):
-                                    should_merge = False
-                                # 如果是大字体（标题类），不合并
-                                if size > body_size + 2:
-                                    should_merge = False
-                        if should_merge:
-                            if is_cjk(current_para_text[-1]) and is_cjk(block_text[0]):
-                                current_para_text += block_text
-                            else:
-                                current_para_text += " " + block_text
-                            last_bbox = curr_bbox
-                        else:
-                            flush_para()
-                            current_para_text = block_text
-                            current_para_y0 = curr_bbox[1]
-                            last_bbox = curr_bbox
-                    else:
-                        current_para_text = block_text
-                        current_para_y0 = curr_bbox[1]
-                        last_bbox = curr_bbox
-                
-                flush_para()
+        except Exception as vec_err:
+             if format != 'json':
+                # 忽略矢量提取错误
+                pass
 
-                # 2.3 集成表格和图片
-                final_items = processed_paragraphs
-                for table in tables:
-                    md_table = table_to_markdown(table)
-                    if md_table:
-                        final_items.append({
-                            "y0": table.bbox[1],
-                            "type": "table",
-                            "content": md_table
-                        })
-                
-                # 集成图片 (Markdown 模式)
-                if format == 'markdown' and page_image_items:
-                    final_items.extend(page_image_items)
-                
-                # 2.4 排序和拼接
-                final_items.sort(key=lambda x: x["y0"])
-                
-                full_page_text = ""
-                for item in final_items:
-                    content = item["content"]
-                    if item["type"] == "text":
-                        if full_page_text and not full_page_text.endswith("\n\n") and not content.startswith("\n\n"):
-                             full_page_text += "\n\n"
-                        full_page_text += content
-                    else:
-                        # 表格或图片
-                        full_page_text += "\n\n" + content + "\n\n"
+    # 2. 提取文本
+    if include_text:
+        # 2.1 检测表格
+        tables = []
+        try:
+            tables = detect_tables(page, table_detection, timer, drawings)
+        except Exception:
+            pass
+
+        with timer.stage("get_text"):
+            blocks = page.get_text("dict", sort=True, textpage=textpage)["blocks"]
+        timer.count("blocks", len(blocks))
+        paragraphs_start = time.perf_counter()
+        # 正文字号、标题阈值和正文右边界使用文档级的统计结果
+        if layout is None:
+            layout = build_layout_profile(doc)
+        body_size = layout.body_size
+        h1_size, h2_size, h3_size = layout.heading_sizes
+        
+        # 计算正文右边界
+        body_right_margin = layout.body_right_margin(page)
+        if body_right_margin is None:
+            body_right_margin = estimate_body_right_margin(blocks, page.rect.width)
+        
+        # 2.2 处理文本块（过滤和预处理）
+        processed_paragraphs = [] # 列表元素：{y0, text}
+        current_para_text = ""
+        current_para_y0 = 0
+        last_bbox = None
+        
+        # 刷新当前段落的辅助函数
+        def flush_para():
+            nonlocal current_para_text, current_para_y0
+            if current_para_text:
+                processed_paragraphs.append({"y0": current_para_y0, "type": "text", "content": current_para_text})
+                current_para_text = ""
 
-                safe_text = full_page_text.encode('utf-8', errors='replace').decode('utf-8')
-                
-                # 记录纯文本到 JSON
-                page_data["text"] = safe_text
-                
-                # (已移除旧的图片追加逻辑)
+        for b in blocks:
+            if b["type"] != 0:
+                continue
+            
+            # 如果在表格中则跳过
+            if is_block_in_table(b["bbox"], tables):
+                continue
 
-                if format == 'markdown':
-                    if skip_table_detection:
-                        page_header = f"## 第 {page_num} 页\n\n"
+            block_text, size = extract_block_text(b)
+            if not block_text:
+                continue
+            if block_text.isdigit() and (abs(size - body_size) > 1 or size < body_size):
+                continue
+            # 跳过文档中重复出现的页眉/页脚
+            if layout.is_running_text(block_text, b["bbox"], page.rect.height):
+                continue
+                
+            prefix = ""
+            is_header = False
+            if format == 'markdown':
+                if size > h1_size:
+                    prefix = "# "
+                    is_header = True
+                elif size > h2_size:
+                    prefix = "## "
+                    is_header = True
+                elif size > h3_size:
+                    if len(block_text) < 50:
+                        prefix = "### "
+                        is_header = True
                     else:
-                        page_header = f"## Page {page_num}\n\n"
-                elif format == 'text':
-                    if skip_table_detection:
-                        page_header = f"\n--- 第 {page_num} 页 ---\n"
+                        block_text = f"**{block_text}**"
+            curr_bbox = b["bbox"]
+            curr_x0 = curr_bbox[0]
+            
+            if is_header:
+                flush_para()
+                processed_paragraphs.append({
+                    "y0": curr_bbox[1], 
+                    "type": "text", 
+                    "content": f"\n\n{prefix}{block_text}\n\n"
+                })
+                last_bbox = curr_bbox
+                continue
+
+            should_merge = False
+            if current_para_text:
+                if last_bbox:
+                    v_dist = curr_bbox[1] - last_bbox[3]
+                    if v_dist < 15.0:
+                        if not is_sentence_end(current_para_text.strip()[-1]):
+                            should_merge = True
+                        last_x0 = last_bbox[0]
+                        if abs(curr_x0 - last_x0) > 5.0:
+                            should_merge = False
+                        last_x1 = last_bbox[2]
+                        # 使用计算出的正文右边界，允许一定的误差 (e.g. 5 points)
+                        if last_x1 < (body_right_margin - 5):
+                            should_merge = False
+                        if is_list_item_start(block_text):
+                            should_merge = False
+                        # 如果是大字体（标题类），不合并
+                        if size > body_size + 2:
+                            should_merge = False
+                if should_merge:
+                    if is_cjk(current_para_text[-1]) and is_cjk(block_text[0]):
+                        current_para_text += block_text
                     else:
-                        page_header = f"\n{'='*20} Page {page_num} {'='*20}\n"
+                        current_para_text += " " + block_text
+                    last_bbox = curr_bbox
                 else:
-                    page_header = ""
-                
-                if format != 'json':
-                    page_content = page_header + (safe_text if safe_text.strip() else "(No text content)") + "\n"
-                    result_content.append(types.TextContent(type="text", text=page_content))
-            
-            # 添加到 JSON 结果列表
-            json_data["pages"].append(page_data)
-            
-            # 3. 添加图片对象 (如果启用 Base64 返回 且非 JSON 模式)
-            if format != 'json' and not use_local_images_only and image_content_objects:
-                result_content.extend(image_content_objects)
+                    flush_para()
+                    current_para_text = block_text
+                    current_para_y0 = curr_bbox[1]
+                    last_bbox = curr_bbox
+            else:
+                current_para_text = block_text
+                current_para_y0 = curr_bbox[1]
+                last_bbox = curr_bbox
+        
+        flush_para()
+        timer.add("paragraphs", time.perf_counter() - paragraphs_start)
+
+        # 2.3 集成表格和图片
+        final_items = processed_paragraphs
+        with timer.stage("table_markdown"):
+            for table in tables:
+                md_table = table.to_markdown()
+                if md_table:
+                    final_items.append({
+                        "y0": table.bbox[1],
+                        "type": "table",
+                        "content": md_table
+                    })
+        
+        # 集成图片 (Markdown 模式)
+        if format == 'markdown' and page_image_items:
+            final_items.extend(page_image_items)
+        
+        # 2.4 排序和拼接
+        final_items.sort(key=lambda x: x["y0"])
+        
+        full_page_text = ""
+        for item in final_items:
+            content = item["content"]
+            if item["type"] == "text":
+                if full_page_text and not full_page_text.endswith("\n\n") and not content.startswith("\n\n"):
+                     full_page_text += "\n\n"
+                full_page_text += content
+            else:
+                # 表格或图片
+                full_page_text += "\n\n" + content + "\n\n"
 
-        doc.close()
+        safe_text = full_page_text.encode('utf-8', errors='replace').decode('utf-8')
         
-        # 如果是 JSON 格式，返回整个 JSON 字符串
-        if format == 'json':
-            return [types.TextContent(type="text", text=json.dumps(json_data, ensure_ascii=False, indent=2))]
+        # 记录纯文本到 JSON
+        page_data["text"] = safe_text
+        
+        # (已移除旧的图片追加逻辑)
+
+        if format == 'markdown':
+            if table_detection == "never":
+                page_header = f"## 第 {page_num} 页\n\n"
+            else:
+                page_header = f"## Page {page_num}\n\n"
+        elif format == 'text':
+            if table_detection == "never":
+                page_header = f"\n--- 第 {page_num} 页 ---\n"
+            else:
+                page_header = f"\n{'='*20} Page {page_num} {'='*20}\n"
+        else:
+            page_header = ""
         
-    except Exception as e:
-        result_content.append(types.TextContent(type="text", text=f"Error processing PDF: {str(e)}"))
-
-    return result_content
+        if format != 'json':
+            page_text = page_header + (safe_text if safe_text.strip() else "(No text content)") + "\n"
+            page_content.append(types.TextContent(type="text", text=page_text))
+    
+    # 3. 添加图片对象 (如果启用 Base64 返回 且非 JSON 模式)
+    if format != 'json' and not use_local_images_only and image_content_objects:
+        page_content.extend(image_content_objects)
+    
+    return page_data, page_content, has_images
 
-import concurrent.futures
-import functools
 
 def _process_single_pdf_tables(args):
     """
     批量提取表格的工作函数。
-    args: (pdf_path, output_dir)
+    args: (pdf_path, output_dir, timings)
+    Returns: (success, pdf_name, output_file_path, 表格数或错误信息, 分阶段统计（未开启时为 None）, 写入统计)
     """
-    pdf_path, output_dir = args
+    pdf_path, output_dir, timings = args
+    doc_timings = DocumentTimings() if timings else NULL_TIMINGS
+    writer = get_output_writer()
+    write_before = writer.totals()
     try:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
@@ -1206,7 +1599,10 @@ def _process_single_pdf_tables(args):
         pdf_name_no_ext = os.path.splitext(pdf_name)[0]
         output_file_path = os.path.join(output_dir, f"{pdf_name_no_ext}_tables.md")
         
-        doc = fitz.open(pdf_path)
+        with doc_timings.document.stage("open"):
+            doc = fitz.open(pdf_path)
+        # 表格检测模式取默认值（环境变量 PDF_TABLE_DETECTION）
+        table_detection = resolve_table_detection()
         tables_found_count = 0
         md_content = f"# Tables Extracted from: {pdf_name}\n\n"
         has_content = False
@@ -1214,40 +1610,39 @@ def _process_single_pdf_tables(args):
         for i in range(len(doc)):
             page = doc[i]
             try:
-                raw_tables = page.find_tables()
-                valid_tables = []
-                for t in raw_tables:
-                    if is_valid_table(t):
-                        valid_tables.append(t)
-                
-                if valid_tables:
-                    page_has_table = False
-                    page_content = ""
-                    for idx, tab in enumerate(valid_tables):
-                        md = table_to_markdown(tab)
-                        if md:
-                            page_has_table = True
-                            tables_found_count += 1
-                            page_content += f"## Page {i+1} - Table {idx+1}\n\n"
-                            page_content += md + "\n\n"
+                with doc_timings.page(i + 1) as timer:
+                    valid_tables = detect_tables(page, table_detection, timer)
                     
-                    if page_has_table:
-                        has_content = True
-                        md_content += page_content
+                    if valid_tables:
+                        page_has_table = False
+                        page_content = ""
+                        with timer.stage("table_markdown"):
+                            for idx, tab in enumerate(valid_tables):
+                                md = tab.to_markdown()
+                                if md:
+                                    page_has_table = True
+                                    tables_found_count += 1
+                                    page_content += f"## Page {i+1} - Table {idx+1}\n\n"
+                                    page_content += md + "\n\n"
+                        
+                        if page_has_table:
+                            has_content = True
+                            md_content += page_content
             except Exception:
                 continue
                 
         doc.close()
         
+        stage_stats = doc_timings.to_dict() if timings else None
         if has_content:
-            with open(output_file_path, "w", encoding="utf-8") as f:
-                f.write(md_content)
-            return (True, pdf_name, output_file_path, tables_found_count)
+            with writer.group() as out:
+                out.write_text(output_file_path, md_content)
+            return (True, pdf_name, output_file_path, tables_found_count, stage_stats, diff_write_stats(writer.totals(), write_before))
         else:
-            return (True, pdf_name, None, 0)
+            return (True, pdf_name, None, 0, stage_stats, diff_write_stats(writer.totals(), write_before))
             
     except Exception as e:
-        return (False, os.path.basename(pdf_path), None, str(e))
+        return (False, os.path.basename(pdf_path), None, str(e), None, diff_write_stats(writer.totals(), write_before))
 
 def get_output_paths_for_mode(root_dir, include_images, include_text, skip_table_detection):
     """
@@ -1255,15 +1650,16 @@ def get_output_paths_for_mode(root_dir, include_images, include_text, skip_table
     Returns: (mode_dir, image_output_dir)
     """
     base_output = os.path.join(root_dir, "output")
+    fast_mode = resolve_table_detection(skip_table_detection) == "never"
     
     if include_images and not include_text:
         mode_dir_name = "output_only_image"
     elif include_images:
-        if skip_table_detection:
+        if fast_mode:
             mode_dir_name = "output_fast_with_image_no_table"
         else:
             mode_dir_name = "output_standard_with_image"
-    elif skip_table_detection:
+    elif fast_mode:
         mode_dir_name = "output_fast_no_image_and_table"
     else:
         mode_dir_name = "output_standard_no_image"
@@ -1273,78 +1669,115 @@ def get_output_paths_for_mode(root_dir, include_images, include_text, skip_table
     
     return mode_dir, image_output_dir
 
-def _process_single_pdf_worker(args):
+def _resolve_batch_output_paths(pdf_path, format, custom_output_dir, custom_image_output_dir, create_folder, root_output_dir, create_dirs=True):
     """
-    用于批量处理的工作函数。
-    必须是顶层函数以便于 pickling。
+    计算批量处理时单个 PDF 的输出文件路径和图片输出目录（create_dirs 为 True 时创建目录）。
+    Returns: (output_file_path, image_output_dir, image_link_base)
     """
-    pdf_path, format, include_text, include_images, use_local_images_only, custom_output_dir, custom_image_output_dir, skip_table_detection, create_folder, root_output_dir = args
+    pdf_name = os.path.basename(pdf_path)
+    # 确定源信息
+    pdf_dir = os.path.dirname(pdf_path)
+    pdf_name_no_ext = os.path.splitext(pdf_name)[0]
     
-    try:
-        pdf_name = os.path.basename(pdf_path)
-        # 确定源信息
-        pdf_dir = os.path.dirname(pdf_path)
-        pdf_name_no_ext = os.path.splitext(pdf_name)[0]
-        
-        output_ext = "json" if format == "json" else "md" if format == "markdown" else "txt"
-        
-        # 1. 确定输出路径
-        if custom_output_dir:
+    output_ext = "ndjson" if format == "ndjson" else "json" if format in JSON_FORMATS else "md" if format == "markdown" else "txt"
+    
+    # 1. 确定输出路径
+    if custom_output_dir:
+        if create_dirs:
             os.makedirs(custom_output_dir, exist_ok=True)
-            final_output_dir = custom_output_dir
-        else:
-            final_output_dir = pdf_dir
-        
-        # 如果需要为每个 PDF 创建专属文件夹
-        if create_folder:
-            final_output_dir = os.path.join(final_output_dir, pdf_name_no_ext)
+        final_output_dir = custom_output_dir
+    else:
+        final_output_dir = pdf_dir
+    
+    # 如果需要为每个 PDF 创建专属文件夹
+    if create_folder:
+        final_output_dir = os.path.join(final_output_dir, pdf_name_no_ext)
+        if create_dirs:
             os.makedirs(final_output_dir, exist_ok=True)
-            
-        output_file_path = os.path.join(final_output_dir, f"{pdf_name_no_ext}.{output_ext}")
         
-        # 2. 确定图片输出路径
-        image_link_base = "extracted_images"
-        image_output_dir = None
-        
-        if custom_image_output_dir:
-            try:
+    output_file_path = os.path.join(final_output_dir, f"{pdf_name_no_ext}.{output_ext}")
+    
+    # 2. 确定图片输出路径
+    image_link_base = "extracted_images"
+    image_output_dir = None
+    
+    if custom_image_output_dir:
+        try:
+            if create_dirs:
                 os.makedirs(custom_image_output_dir, exist_ok=True)
-                # 使用子目录避免冲突
-                image_output_dir = os.path.join(custom_image_output_dir, pdf_name_no_ext)
-                
-                # 计算相对路径
-                rel_path = os.path.relpath(image_output_dir, final_output_dir)
-                image_link_base = rel_path.replace("\\", "/")
-            except Exception:
-                # 如果 relpath 失败（例如跨驱动器），则回退到绝对路径或默认行为
-                pass
+            # 使用子目录避免冲突
+            image_output_dir = os.path.join(custom_image_output_dir, pdf_name_no_ext)
+            
+            # 计算相对路径
+            rel_path = os.path.relpath(image_output_dir, final_output_dir)
+            image_link_base = rel_path.replace("\\", "/")
+        except Exception:
+            # 如果 relpath 失败（例如跨驱动器），则回退到绝对路径或默认行为
+            pass
+    else:
+        # 如果创建了专属文件夹，图片最好也放在里面
+        if create_folder:
+            image_output_dir = os.path.join(final_output_dir, "images")
+            image_link_base = "images"
         else:
-            # 如果创建了专属文件夹，图片最好也放在里面
-            if create_folder:
-                image_output_dir = os.path.join(final_output_dir, "images")
-                image_link_base = "images"
-            else:
-                 # 默认行为: 将图片放在输出根目录下的 extracted_images 文件夹中
-                 # 这样可以保持 output 目录的整洁，并且支持 relative path
-                 if root_output_dir:
-                     try:
-                         image_output_dir = os.path.join(root_output_dir, "extracted_images")
-                         # 注意: extract_content 会自动在 image_output_dir 后追加 pdf_name_no_ext
-                         # 所以这里我们只需要指向 extracted_images 根
-                         
-                         # 计算 image_link_base (相对路径)
-                         # image_link_base 应该是从 markdown 文件所在目录 (final_output_dir) 到 extracted_images 根目录的相对路径
-                         rel_path = os.path.relpath(image_output_dir, final_output_dir)
-                         image_link_base = rel_path.replace("\\", "/")
-                     except Exception:
-                         pass
+             # 默认行为: 将图片放在输出根目录下的 extracted_images 文件夹中
+             # 这样可以保持 output 目录的整洁，并且支持 relative path
+             if root_output_dir:
+                 try:
+                     image_output_dir = os.path.join(root_output_dir, "extracted_images")
+                     # 注意: extract_content 会自动在 image_output_dir 后追加 pdf_name_no_ext
+                     # 所以这里我们只需要指向 extracted_images 根
+                     
+                     # 计算 image_link_base (相对路径)
+                     # image_link_base 应该是从 markdown 文件所在目录 (final_output_dir) 到 extracted_images 根目录的相对路径
+                     rel_path = os.path.relpath(image_output_dir, final_output_dir)
+                     image_link_base = rel_path.replace("\\", "/")
+                 except Exception:
+                     pass
+    
+    return output_file_path, image_output_dir, image_link_base
+
+def _run_profiled(args):
+    """
+    开启性能分析时批量任务的工作函数：在工作进程中分析一个任务，结果写入 <profile_base>.pstats（见 profiling）。
+    args: (func, func_args, profile_mode, profile_base)
+    Returns: func 的返回值
+    """
+    func, func_args, profile_mode, profile_base = args
+    with capture_profile(profile_mode, profile_base):
+        return func(func_args)
+
+def _get_batch_profile_dir(output_dir):
+    """批量处理本次运行的性能分析目录：<输出目录>/profiles/<时间戳>"""
+    return os.path.join(output_dir, "profiles", time.strftime("%Y%m%d_%H%M%S"))
+
+def _profiled_jobs(jobs, profile_mode, profile_bases):
+    """把 [(func, args)] 包装为提交给进程池的任务；开启性能分析时每个任务改由 _run_profiled 执行"""
+    if not profile_mode:
+        return jobs
+    return [(_run_profiled, (func, args, profile_mode, base)) for (func, args), base in zip(jobs, profile_bases)]
+
+def _process_single_pdf_worker(args):
+    """
+    用于批量处理的工作函数。
+    必须是顶层函数以便于 pickling。
+    Returns: (success, pdf_name, output_file_path, error, 分阶段统计（未开启时为 None）, 写入统计)
+    """
+    pdf_path, format, include_text, include_images, use_local_images_only, custom_output_dir, custom_image_output_dir, skip_table_detection, create_folder, root_output_dir, timings = args
+    doc_timings = DocumentTimings() if timings else None
+    writer = get_output_writer()
+    write_before = writer.totals()
+    
+    try:
+        pdf_name = os.path.basename(pdf_path)
+        output_file_path, image_output_dir, image_link_base = _resolve_batch_output_paths(
+            pdf_path, format, custom_output_dir, custom_image_output_dir, create_folder, root_output_dir
+        )
             
-        # 运行提取（异步函数的同步包装）
-        # 为此进程创建一个新的事件循环
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        content_list = loop.run_until_complete(extract_content(
+        # 逐页提取（工作进程中直接调用同步实现），每页的结果生成后立即写入输出文件，
+        # 工作进程内存中只保留当前页的结果，与文档页数无关
+        shared_image_dir = get_shared_image_dir(custom_image_output_dir or root_output_dir) if include_images else None
+        items = _iter_extract_content(
             file_path=pdf_path,
             page_range="all",
             format=format,
@@ -1353,25 +1786,222 @@ def _process_single_pdf_worker(args):
             use_local_images_only=use_local_images_only,
             image_output_dir=image_output_dir,
             image_link_base=image_link_base,
-            skip_table_detection=skip_table_detection
-        ))
-        loop.close()
+            skip_table_detection=skip_table_detection,
+            use_cache=False,
+            shared_image_dir=shared_image_dir,
+            timings=doc_timings
+        )
         
-        # 将结果写入文件
         # 如果是"仅提取图片"模式 (include_text=False, include_images=True)，则不写入 Markdown 文件
         if include_text or (not include_images):
-            full_text = ""
-            for item in content_list:
-                if item.type == "text":
-                    full_text += item.text
-                    
-            with open(output_file_path, "w", encoding="utf-8") as f:
-                f.write(full_text)
+            # 出错时不保留写了一半的输出文件
+            with writer.group() as out, out.open_text(output_file_path) as stream:
+                if doc_timings is not None:
+                    stream = TimedStream(stream, doc_timings.document)
+                if format in JSON_FORMATS:
+                    _write_json_stream(stream, items, format)
+                else:
+                    for item in items:
+                        if item.type == "text":
+                            stream.write(item.text)
+        else:
+            for _ in items:
+                pass
             
-        return (True, pdf_name, output_file_path, None)
+        stage_stats = doc_timings.to_dict() if doc_timings is not None else None
+        return (True, pdf_name, output_file_path, None, stage_stats, diff_write_stats(writer.totals(), write_before))
+        
+    except Exception as e:
+        return (False, os.path.basename(pdf_path), None, str(e), None, diff_write_stats(writer.totals(), write_before))
+
+def _process_pdf_shard_worker(args):
+    """
+    批量处理的分片工作函数：只处理大文件中的一段连续页码 [start, end)。
+    分片结果写入临时文件 (<输出文件>.part<序号>)，由主进程在该文件的所有分片完成后
+    按页码顺序拼接（见 _assemble_sharded_output）。图片按第一次出现的页码命名，
+    多个分片引用同一图片时写入的是相同内容（原子替换），不会冲突。
+    Returns: (success, pdf_name, shard_index, (output_file_path, part_path, image_dir, image_notice_offset), error, 分阶段统计（未开启时为 None）, 写入统计)
+    """
+    pdf_path, format, include_text, include_images, use_local_images_only, custom_output_dir, custom_image_output_dir, skip_table_detection, create_folder, root_output_dir, timings, shard_index, start, end = args
+    pdf_name = os.path.basename(pdf_path)
+    doc_timings = DocumentTimings() if timings else NULL_TIMINGS
+    writer = get_output_writer()
+    write_before = writer.totals()
+    part_path = None
+    
+    try:
+        output_file_path, image_output_dir, image_link_base = _resolve_batch_output_paths(
+            pdf_path, format, custom_output_dir, custom_image_output_dir, create_folder, root_output_dir
+        )
+        output_dir, pdf_name_no_ext = _get_image_output_dir(pdf_path, image_output_dir)
+        if include_images:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        part_path = f"{output_file_path}.part{shard_index}"
+        page_format = "json" if format in JSON_FORMATS else format
+        # "仅提取图片"模式不生成文本输出
+        write_part = include_text or (not include_images)
+        # 本分片中第一个包含位图的页面在分片文本中的偏移量（用于插入图片保存目录提示）
+        image_notice_offset = None
+        
+        with writer.group() as out:
+            with doc_timings.document.stage("open"):
+                doc = fitz.open(pdf_path)
+            try:
+                # 图片去重状态：图片名按文档中第一次出现的位置确定，与整文件处理时一致；图片由写入线程写入
+                dedup = {"image_names": None, "saved_images": {}, "shared_image_dir": None, "out": out}
+                if include_images:
+                    with doc_timings.document.stage("image_index"):
+                        dedup["image_names"] = first_image_names(doc, end)
+                    dedup["shared_image_dir"] = get_shared_image_dir(custom_image_output_dir or root_output_dir)
+                # 版面信息按整个文档抽样统计，各分片结果相同
+                layout = None
+                if include_text:
+                    with doc_timings.document.stage("layout"):
+                        layout = build_layout_profile(doc)
+                # 分片结果逐页写入临时文件；JSON 格式每行一个页面
+                with (out.open_text(part_path) if write_part else contextlib.nullcontext()) as stream:
+                    if stream is not None and timings:
+                        stream = TimedStream(stream, doc_timings.document)
+                    offset = 0
+                    for i in range(start, end):
+                        with doc_timings.page(i + 1) as timer:
+                            page_data, page_content, has_images = _extract_page(
+                                doc, i, format=page_format, include_text=include_text, include_images=include_images,
+                                use_local_images_only=use_local_images_only, output_dir=output_dir,
+                                pdf_name_no_ext=pdf_name_no_ext, image_link_base=image_link_base,
+                                skip_table_detection=skip_table_detection, layout=layout, timer=timer, **dedup
+                            )
+                        if stream is None:
+                            continue
+                        if page_format == 'json':
+                            if timings:
+                                page_data["timings"] = doc_timings.page_dict()
+                            stream.write(json.dumps(page_data, ensure_ascii=False) + "\n")
+                            continue
+                        if has_images and image_notice_offset is None:
+                            image_notice_offset = offset
+                        for item in page_content:
+                            if item.type == "text":
+                                stream.write(item.text)
+                                offset += len(item.text)
+            finally:
+                doc.close()
+        
+        if not write_part:
+            part_path = None
+        
+        stage_stats = doc_timings.to_dict() if timings else None
+        return (True, pdf_name, shard_index, (output_file_path, part_path, output_dir, image_notice_offset), None, stage_stats, diff_write_stats(writer.totals(), write_before))
         
     except Exception as e:
-        return (False, os.path.basename(pdf_path), None, str(e))
+        # 失败的分片不会被拼接，已写出的分片临时文件在这里删除
+        _remove_part_files([part_path])
+        return (False, pdf_name, shard_index, None, str(e), None, diff_write_stats(writer.totals(), write_before))
+
+def _remove_part_files(part_paths):
+    """删除分片临时文件（尽力而为，忽略不存在或无法删除的文件）"""
+    for part_path in part_paths:
+        if not part_path:
+            continue
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+
+def _assemble_sharded_output(pdf_path, total_pages, shard_infos, format, include_text, include_images, use_local_images_only, skip_table_detection):
+    """
+    按页码顺序拼接大文件的分片结果，生成与整文件处理一致的输出文件，并删除分片临时文件。
+    shard_infos: 按分片序号排序的 (output_file_path, part_path, image_dir, image_notice_offset) 列表
+    Returns: 输出文件路径（仅提取图片模式下为 None）
+    """
+    part_paths = [info[1] for info in shard_infos if info[1]]
+    if not part_paths:
+        return None
+    output_file_path = shard_infos[0][0]
+    
+    try:
+        if format in JSON_FORMATS:
+            json_data = _build_json_document(pdf_path, "all", format, include_text, include_images, use_local_images_only)
+            json_data["meta"]["cache"] = {"enabled": False, "hits": 0, "misses": total_pages}
+            with open(output_file_path, "w", encoding="utf-8") as out:
+                _write_json_stream(out, itertools.chain([json_data], _iter_json_lines(part_paths)), format)
+        else:
+            with open(output_file_path, "w", encoding="utf-8") as out:
+                out.write(_build_summary_text(pdf_path, "all", total_pages, include_text, include_images, skip_table_detection))
+                notice_written = False
+                for _, part_path, image_dir, image_notice_offset in shard_infos:
+                    with open(part_path, "r", encoding="utf-8") as f:
+                        if not notice_written and image_notice_offset is not None:
+                            out.write(f.read(image_notice_offset))
+                            out.write(_image_dir_notice(image_dir))
+                            notice_written = True
+                        shutil.copyfileobj(f, out)
+    finally:
+        _remove_part_files(part_paths)
+    
+    return output_file_path
+
+def _iter_json_lines(paths):
+    """依次读取每行一个 JSON 对象的文件"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# 分片的最小页数：过小的分片会因为重复打开文档、重复初始化而得不偿失
+MIN_SHARD_PAGES = 32
+
+def _get_shard_pages(total_pages, max_workers):
+    """
+    计算批量处理时的分片页数。页数超过该值的文件会被拆分成多个分片并行处理。
+    默认让总页数大致分成 (工作进程数 × 4) 份，可通过环境变量 PDF_SHARD_PAGES 固定。
+    返回 0 表示不分片。
+    """
+    env_value = os.environ.get("PDF_SHARD_PAGES")
+    if env_value:
+        try:
+            return max(0, int(env_value))
+        except ValueError:
+            pass
+    if max_workers <= 1:
+        return 0
+    return max(MIN_SHARD_PAGES, -(-total_pages // (max_workers * 4)))
+
+def _scan_page_counts(pdf_paths):
+    """读取每个 PDF 的页数（无法打开的文件记为 0，由工作进程报告具体错误）"""
+    page_counts = []
+    for pdf_path in pdf_paths:
+        try:
+            doc = fitz.open(pdf_path)
+            page_counts.append(doc.page_count)
+            doc.close()
+        except Exception:
+            page_counts.append(0)
+    return page_counts
+
+async def _get_page_counts(pdf_paths, manifest, source_stats):
+    """
+    批量处理前获取每个待处理文件的页数。
+    内容哈希与清单记录一致的文件（例如关闭增量处理或切换了提取参数时）直接使用清单中的页数；
+    其余文件分组后在进程池中并行打开，不让工作进程在逐个打开文件的预扫描期间空等。
+    """
+    page_counts = [None] * len(pdf_paths)
+    unknown = []
+    for idx, pdf_path in enumerate(pdf_paths):
+        stat_info = source_stats.get(pdf_path)
+        page_counts[idx] = manifest.known_pages(pdf_path, stat_info[2]) if stat_info else None
+        if page_counts[idx] is None:
+            unknown.append(idx)
+    if unknown:
+        # 每个工作进程大约分到 4 组，各组耗时不均时空闲的进程可以接着处理剩下的组
+        chunk_size = -(-len(unknown) // (get_process_pool_size() * 4))
+        chunks = [[pdf_paths[idx] for idx in unknown[i:i + chunk_size]] for i in range(0, len(unknown), chunk_size)]
+        counts = itertools.chain.from_iterable(await map_in_process_pool(_scan_page_counts, chunks))
+        for idx, page_count in zip(unknown, counts):
+            page_counts[idx] = page_count
+    return page_counts
 
 async def batch_extract_pdf_content(
     directory: str,
@@ -1381,19 +2011,33 @@ async def batch_extract_pdf_content(
     include_images: bool = False,
     use_local_images_only: bool = True,
     custom_output_dir: str = None,
-    skip_table_detection: bool = False,
+    custom_image_output_dir: str = None,
+    skip_table_detection: bool | str = False,
     create_folder: bool = False,
-    preserve_structure: bool = True
+    preserve_structure: bool = True,
+    incremental: bool = True,
+    timings: bool = False,
+    profile: bool | str = False
 ):
     """
     批量处理指定目录下的PDF文件 (并行加速版)。
+    任务在服务器常驻的进程池中执行，多次调用之间复用已启动的工作进程。
     如果 custom_output_dir 为 None，默认输出到当前工作目录下的 'output' 文件夹。
+    custom_image_output_dir: 如果指定，所有图片保存到该目录下（按 PDF 文件名分子目录）。
     create_folder: 如果为 True，将为每个 PDF 文件创建一个同名的子文件夹。
     preserve_structure: 如果为 True (默认)，保持源文件的目录层级结构。如果为 False，所有文件将平铺到输出目录（可能存在同名覆盖风险）。
+    incremental: 如果为 True (默认)，根据模式目录下的清单跳过未变化的文件；为 False 时全部重新提取。
+        两种模式下都会删除已被移除的源文件对应的输出，并更新清单。
+    skip_table_detection: 表格检测模式，见 _extract_content
+    timings: 如果为 True，统计各处理阶段的耗时和计数，在报告中汇总并列出最慢的文件和页面（见 stage_timing）
+    profile: 性能分析：true / "pstats" 在工作进程中用 cProfile 分析每个任务，"collapsed" 另外生成火焰图用的 collapsed stack 文件。
+        文件保存在模式目录下的 profiles/<时间戳> 中（每个文件或分片一份，另有合并结果），报告中列出累计耗时最多的函数
     """
     if not os.path.isdir(directory):
         return [types.TextContent(type="text", text=f"Error: 目录不存在 - {directory}")]
     
+    # 统一为表格检测模式（清单中记录的选项也使用该值，切换模式后增量处理会重新提取）
+    skip_table_detection = resolve_table_detection(skip_table_detection)
     # 确定输出根目录和模式目录
     root_output_base = custom_output_dir if custom_output_dir else os.getcwd()
     target_mode_dir, _ = get_output_paths_for_mode(root_output_base, include_images, include_text, skip_table_detection)
@@ -1406,7 +2050,8 @@ async def batch_extract_pdf_content(
          os.makedirs(custom_output_dir, exist_ok=True)
  
      
-    # 支持递归搜索
+    # 支持递归搜索（glob 只有批量工具使用，在这里才导入，缩短服务器启动时间）
+    import glob
     search_path = os.path.join(directory, pattern)
     files = glob.glob(search_path, recursive=True)
     
@@ -1416,8 +2061,7 @@ async def batch_extract_pdf_content(
     file_count = len(files)
     summary = [f"=== 批量处理报告 (并行) ===\n"]
     
-    # 使用 CPU 计数，但限制在合理范围内以避免如果有很多文件导致 IO 抖动
-    max_workers = min(32, os.cpu_count() or 4)
+    max_workers = get_process_pool_size()
     summary.append(f"找到 {file_count} 个文件。正在使用 {max_workers} 个工作进程处理...\n")
     
     # 为每个任务准备参数
@@ -1440,42 +2084,255 @@ async def batch_extract_pdf_content(
             
             tasks_args.append((
                 pdf_path, format, include_text, include_images, 
-                use_local_images_only, target_output_dir, None,
-                skip_table_detection, create_folder, custom_output_dir
+                use_local_images_only, target_output_dir, custom_image_output_dir,
+                skip_table_detection, create_folder, custom_output_dir, timings
             ))
     
+    # 增量处理：对比清单，跳过未变化的文件，并清理已删除源文件的输出
+    manifest_options = {
+        "format": format,
+        "include_text": include_text,
+        "include_images": include_images,
+        "use_local_images_only": use_local_images_only,
+        "skip_table_detection": skip_table_detection,
+        "create_folder": create_folder,
+        "preserve_structure": preserve_structure,
+        "custom_image_output_dir": custom_image_output_dir,
+    }
+    manifest, tasks_args, source_stats, skipped_count, removed_sources = await run_blocking(
+        "batch_extract_pdf_content", _plan_incremental_batch,
+        custom_output_dir, tasks_args, manifest_options, directory, pattern, incremental
+    )
+    
+    # 按页拆分大文件：页数已知后，把超过分片大小的文件拆成多个页码区间，
+    # 任意空闲的工作进程都可以处理任意分片，避免单个超大 PDF 拖慢整个批次
+    page_counts = await _get_page_counts([args[0] for args in tasks_args], manifest, source_stats)
+    shard_pages = _get_shard_pages(sum(page_counts), max_workers)
+    
+    jobs = [] # (页数, 文件序号, func, args)
+    for file_idx, (args, page_count) in enumerate(zip(tasks_args, page_counts)):
+        if shard_pages and page_count > shard_pages:
+            for shard_index, start in enumerate(range(0, page_count, shard_pages)):
+                end = min(start + shard_pages, page_count)
+                jobs.append((end - start, file_idx, _process_pdf_shard_worker, args + (shard_index, start, end)))
+        else:
+            jobs.append((page_count, file_idx, _process_single_pdf_worker, args))
+    
+    # 大任务优先提交，减少批次末尾只剩一个进程在工作的情况
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    shard_counts = Counter(file_idx for _, file_idx, func, _ in jobs if func is _process_pdf_shard_worker)
+    
+    # 性能分析：每个文件（分片）一份分析结果，按源文件的相对路径命名
+    profile_mode = resolve_profile_mode(profile)
+    profile_dir = _get_batch_profile_dir(custom_output_dir) if profile_mode else None
+    profile_bases = []
+    if profile_mode:
+        for _, file_idx, func, args in jobs:
+            base = os.path.join(profile_dir, profile_base_name(os.path.relpath(args[0], directory)))
+            if func is _process_pdf_shard_worker:
+                base += f".shard{args[-3]}"
+            profile_bases.append(base)
+    
     success_count = 0
     fail_count = 0
+    failures = []
+    file_shards = {}
+    write_stats = {}
+    stage_stats = {}
     
-    # 使用 ProcessPoolExecutor 执行 CPU 密集型任务
-    loop = asyncio.get_running_loop()
+    # 结果按完成顺序消费：逐文件记录写入报告文件，同时向客户端推送进度通知
+    report_path, report = _open_batch_report(custom_output_dir, "=== 批量处理报告 (逐文件) ===")
+    progress = BatchProgress(len(tasks_args), sum(page_counts), send=_get_progress_sender())
     
-    # 我们在一个线程中运行阻塞的 executor map，以避免阻塞 asyncio 循环
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-        results = await loop.run_in_executor(
-            None, 
-            functools.partial(list, executor.map(_process_single_pdf_worker, tasks_args))
-        )
-        
-    for success, name, out_path, error in results:
-        if success:
-            success_count += 1
-            summary.append(f"[OK] {name}")
-        else:
-            fail_count += 1
-            summary.append(f"[FAIL] {name}: {error}")
+    try:
+        # 在常驻进程池中执行 CPU 密集型任务（不阻塞 asyncio 循环）
+        async for job_idx, result in iter_process_pool(_profiled_jobs([(func, args) for _, _, func, args in jobs], profile_mode, profile_bases)):
+            job_pages, file_idx, func, _ = jobs[job_idx]
+            # 工作进程的写入统计（写入量、写入耗时、队列等待时间）和分阶段统计（分片逐个累加）
+            merge_write_stats(write_stats, result[-1] or {})
+            merge_timings(stage_stats, os.path.relpath(tasks_args[file_idx][0], directory), result[-2])
+            get_request_stats().record_pages(job_pages)
+            
+            if func is _process_pdf_shard_worker:
+                await progress.advance(pages=job_pages)
+                shard_results = file_shards.setdefault(file_idx, [])
+                shard_results.append(result)
+                if len(shard_results) < shard_counts[file_idx]:
+                    continue
+                # 该文件的所有分片均已完成，按页码顺序拼接
+                result = await _finish_sharded_file(
+                    tasks_args[file_idx][0], page_counts[file_idx], shard_results,
+                    format, include_text, include_images, use_local_images_only, skip_table_detection
+                )
+                await progress.advance(files=1)
+            else:
+                await progress.advance(files=1, pages=job_pages)
             
-    summary.append(f"\nTotal: {file_count}, Success: {success_count}, Failed: {fail_count}")
+            success, name, out_path, error = result[:4]
+            pdf_path = tasks_args[file_idx][0]
+            if success:
+                success_count += 1
+                if pdf_path in source_stats:
+                    manifest.record(
+                        pdf_path, source_stats[pdf_path], manifest_options, directory, pattern,
+                        _get_batch_outputs(tasks_args[file_idx], out_path), page_counts[file_idx]
+                    )
+                if file_idx in shard_counts:
+                    line = f"[OK] {name} ({page_counts[file_idx]} 页, 分 {shard_counts[file_idx]} 片并行处理)"
+                else:
+                    line = f"[OK] {name}"
+            else:
+                fail_count += 1
+                line = f"[FAIL] {name}: {error}"
+                failures.append(line)
+                # 失败的文件从清单中移除，下次运行时重试
+                manifest.forget(pdf_path)
+            report.write(line + "\n")
+            report.flush()
+    finally:
+        report.close()
+        await run_blocking("batch_extract_pdf_content", manifest.save)
+    
+    if include_images and (tasks_args or removed_sources):
+        # 重新提取的文件会替换图片目录中的旧链接，已删除源文件的图片目录也已移除：
+        # 所有任务完成后，共享目录中不再被引用的图片一并清理
+        await run_blocking(
+            "batch_extract_pdf_content", prune_shared_images,
+            get_shared_image_dir(custom_image_output_dir or custom_output_dir)
+        )
+    
+    summary.append(f"Total: {file_count}, Success: {success_count}, Failed: {fail_count}")
+    summary.append(f"Incremental: skipped {skipped_count} unchanged, removed outputs of {len(removed_sources)} deleted sources")
+    summary.append(f"Pages: {progress.pages_done}, Elapsed: {progress.elapsed:.2f}s, Throughput: {progress.pages_per_second:.1f} pages/s")
+    summary.append(format_write_stats(write_stats))
+    summary.extend(format_timings(stage_stats))
+    if profile_mode and profile_bases:
+        summary.extend(await run_blocking(
+            "batch_extract_pdf_content", merge_batch_profiles, profile_bases, os.path.join(profile_dir, "merged"), profile_mode
+        ))
+    summary.extend(_summarize_failures(failures))
+    summary.append(f"\n逐文件报告: {report_path}")
     return [types.TextContent(type="text", text="\n".join(summary))]
 
+def _plan_incremental_batch(output_dir, tasks_args, options, directory, pattern, incremental):
+    """
+    根据模式目录下的清单筛选需要处理的任务，并删除已移除源文件的输出。
+    Returns: (manifest, 需要处理的任务参数列表, {源文件: (size, mtime_ns, sha256)}, 跳过数, 已移除的源文件列表)
+    """
+    manifest = ExtractManifest.load(output_dir)
+    removed_sources = manifest.remove_stale(directory, pattern, [args[0] for args in tasks_args])
+    
+    pending_args = []
+    source_stats = {}
+    skipped_count = 0
+    for args in tasks_args:
+        pdf_path = args[0]
+        try:
+            unchanged, stat_info = manifest.check(pdf_path, options)
+        except OSError:
+            # 无法读取的文件交给工作进程报告错误
+            pending_args.append(args)
+            continue
+        if incremental and unchanged:
+            manifest.touch(pdf_path, stat_info)
+            skipped_count += 1
+        else:
+            pending_args.append(args)
+            source_stats[pdf_path] = stat_info
+    
+    return manifest, pending_args, source_stats, skipped_count, removed_sources
+
+def _get_batch_outputs(task_args, out_path):
+    """清单中记录的输出路径：文本输出文件和该 PDF 的图片目录（未生成时为 None）"""
+    pdf_path, format, include_text, include_images, _, target_output_dir, custom_image_output_dir, _, create_folder, root_output_dir = task_args[:10]
+    text_output = out_path if (include_text or not include_images) else None
+    image_dir = None
+    if include_images:
+        _, image_output_dir, _ = _resolve_batch_output_paths(
+            pdf_path, format, target_output_dir, custom_image_output_dir, create_folder, root_output_dir, create_dirs=False
+        )
+        image_dir, _ = _get_image_output_dir(pdf_path, image_output_dir)
+    return {"text": text_output, "images": image_dir}
+
+async def _finish_sharded_file(pdf_path, total_pages, shard_results, format, include_text, include_images, use_local_images_only, skip_table_detection):
+    """所有分片完成后拼接输出文件。Returns: (success, pdf_name, output_file_path, error)"""
+    shard_results.sort(key=lambda r: r[2])
+    pdf_name = os.path.basename(pdf_path)
+    # 成功分片的临时文件：文件失败时不会拼接，需要在这里删除，否则会留在输出目录中（失败的分片已自行删除）
+    part_paths = [r[3][1] for r in shard_results if r[0] and r[3]]
+    errors = [r[4] for r in shard_results if not r[0]]
+    if errors:
+        await run_blocking("batch_extract_pdf_content", _remove_part_files, part_paths)
+        return (False, pdf_name, None, errors[0])
+    try:
+        out_path = await run_blocking(
+            "batch_extract_pdf_content", _assemble_sharded_output,
+            pdf_path, total_pages, [r[3] for r in shard_results],
+            format, include_text, include_images, use_local_images_only, skip_table_detection
+        )
+        return (True, pdf_name, out_path, None)
+    except Exception as e:
+        # 拼接在进入 _assemble_sharded_output 的 finally 之前就失败时（例如线程池调度失败），临时文件仍然存在
+        _remove_part_files(part_paths)
+        return (False, pdf_name, None, str(e))
+
+# 返回给客户端的汇总中最多列出的失败文件数，完整记录见报告文件
+MAX_SUMMARY_FAILURES = 20
+
+def _summarize_failures(failures):
+    if not failures:
+        return []
+    lines = [f"\n失败文件 ({len(failures)}):"]
+    lines.extend(failures[:MAX_SUMMARY_FAILURES])
+    if len(failures) > MAX_SUMMARY_FAILURES:
+        lines.append(f"... 另有 {len(failures) - MAX_SUMMARY_FAILURES} 个失败文件，详见报告文件")
+    return lines
+
+def _open_batch_report(report_dir, title):
+    """
+    创建本次批量任务的逐文件报告 (batch_report_<时间戳>.txt)。
+    Returns: (report_path, 已打开的文件对象)
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    report_path = os.path.join(report_dir, f"batch_report_{timestamp}.txt")
+    report = open(report_path, "w", encoding="utf-8")
+    report.write(title + "\n")
+    return report_path, report
+
+def _get_progress_sender():
+    """
+    如果当前 MCP 请求携带了 progressToken，返回推送进度通知的异步函数 send(progress, total, message)；
+    客户端未请求进度（或不在请求上下文中，例如直接调用）时返回 None。
+    """
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    progress_token = ctx.meta.progressToken if ctx.meta else None
+    if progress_token is None:
+        return None
+    
+    async def send(progress, total, message):
+        try:
+            await ctx.session.send_progress_notification(progress_token, progress, total, message=message)
+        except TypeError:
+            # 旧版本 mcp 的 send_progress_notification 不支持 message 参数
+            await ctx.session.send_progress_notification(progress_token, progress, total)
+    return send
+
 
 async def batch_extract_tables(
     directory: str,
     output_dir: str = None,
-    pattern: str = "**/*.pdf"
+    pattern: str = "**/*.pdf",
+    timings: bool = False,
+    profile: bool | str = False
 ) -> list[types.TextContent]:
     """
     批量提取指定目录下的PDF表格并保存为Markdown文件。
+    timings: 如果为 True，统计各处理阶段的耗时和计数，在报告中汇总（见 stage_timing）
+    profile: 性能分析，见 batch_extract_pdf_content
     """
     if not os.path.isdir(directory):
         return [types.TextContent(type="text", text=f"Error: 目录不存在 - {directory}")]
@@ -1489,6 +2346,7 @@ async def batch_extract_tables(
     os.makedirs(output_dir, exist_ok=True)
     
     # 搜索文件
+    import glob
     search_path = os.path.join(directory, pattern)
     files = glob.glob(search_path, recursive=True)
     
@@ -1504,43 +2362,64 @@ async def batch_extract_tables(
     # 准备任务参数
     tasks_args = []
     for pdf_path in files:
-        tasks_args.append((pdf_path, output_dir))
+        tasks_args.append((pdf_path, output_dir, timings))
+    
+    profile_mode = resolve_profile_mode(profile)
+    profile_dir = _get_batch_profile_dir(output_dir) if profile_mode else None
+    profile_bases = [
+        os.path.join(profile_dir, profile_base_name(os.path.relpath(args[0], directory))) for args in tasks_args
+    ] if profile_mode else []
         
-    max_workers = min(32, os.cpu_count() or 4)
     success_count = 0
     fail_count = 0
     total_tables = 0
     files_with_tables = 0
+    failures = []
+    write_stats = {}
+    stage_stats = {}
     
-    loop = asyncio.get_running_loop()
+    report_path, report = _open_batch_report(output_dir, "=== 批量表格提取报告 (逐文件) ===")
+    progress = BatchProgress(len(tasks_args), send=_get_progress_sender())
     
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-        results = await loop.run_in_executor(
-            None,
-            functools.partial(list, executor.map(_process_single_pdf_tables, tasks_args))
-        )
-        
-    for success, name, out_path, result_info in results:
-        if success:
-            success_count += 1
-            table_count = result_info
-            if table_count > 0:
-                files_with_tables += 1
-                total_tables += table_count
-                summary.append(f"[OK] {name}: Found {table_count} tables -> {os.path.basename(out_path)}")
+    try:
+        async for idx, (success, name, out_path, result_info, file_stage_stats, file_write_stats) in iter_process_pool(_profiled_jobs([(_process_single_pdf_tables, args) for args in tasks_args], profile_mode, profile_bases)):
+            await progress.advance(files=1)
+            merge_write_stats(write_stats, file_write_stats)
+            merge_timings(stage_stats, os.path.relpath(tasks_args[idx][0], directory), file_stage_stats)
+            if success:
+                success_count += 1
+                table_count = result_info
+                if table_count > 0:
+                    files_with_tables += 1
+                    total_tables += table_count
+                    line = f"[OK] {name}: Found {table_count} tables -> {os.path.basename(out_path)}"
+                else:
+                    line = f"[OK] {name}: No tables found"
             else:
-                summary.append(f"[OK] {name}: No tables found")
-        else:
-            fail_count += 1
-            error_msg = result_info
-            summary.append(f"[FAIL] {name}: {error_msg}")
+                fail_count += 1
+                error_msg = result_info
+                line = f"[FAIL] {name}: {error_msg}"
+                failures.append(line)
+            report.write(line + "\n")
+            report.flush()
+    finally:
+        report.close()
             
-    summary.append(f"\nProcessing Summary:")
+    summary.append(f"Processing Summary:")
     summary.append(f"- Total Files: {file_count}")
     summary.append(f"- Successful: {success_count}")
     summary.append(f"- Failed: {fail_count}")
     summary.append(f"- Files with Tables: {files_with_tables}")
     summary.append(f"- Total Tables Extracted: {total_tables}")
+    summary.append(f"- Elapsed: {progress.elapsed:.2f}s")
+    summary.append(f"- {format_write_stats(write_stats)}")
+    summary.extend(format_timings(stage_stats))
+    if profile_mode and profile_bases:
+        summary.extend(await run_blocking(
+            "batch_extract_tables", merge_batch_profiles, profile_bases, os.path.join(profile_dir, "merged"), profile_mode
+        ))
+    summary.extend(_summarize_failures(failures))
+    summary.append(f"\n逐文件报告: {report_path}")
     
     return [types.TextContent(type="text", text="\n".join(summary))]
 
@@ -1556,6 +2435,25 @@ async def search_pdf_files(
     如果未指定 directory，默认搜索当前目录。
     可以通过环境变量 PDF_SEARCH_PATHS 配置额外的搜索路径 (使用系统路径分隔符分隔)。
     """
+    return await run_blocking("search_pdf_files", _search_pdf_files, query, directory, threshold, limit)
+
+def _get_default_search_dirs():
+    """默认搜索路径：当前目录 + 环境变量 PDF_SEARCH_PATHS 中配置的目录"""
+    cwd = os.getcwd()
+    search_dirs = [cwd]
+    
+    # 从环境变量获取额外搜索路径
+    env_paths = os.environ.get("PDF_SEARCH_PATHS")
+    if env_paths:
+        # 使用 os.pathsep (Windows是;, Unix是:) 分割
+        for p in env_paths.split(os.pathsep):
+            p = p.strip()
+            if p and os.path.exists(p) and p != cwd:
+                search_dirs.append(p)
+    return search_dirs
+
+def _search_pdf_files(query, directory=None, threshold=0.45, limit=10):
+    """search_pdf_files 的同步实现（递归扫描目录是阻塞 IO）"""
     search_dirs = []
     
     if directory:
@@ -1563,52 +2461,14 @@ async def search_pdf_files(
             return [types.TextContent(type="text", text=f"Error: 目录不存在 - {directory}")]
         search_dirs.append(directory)
     else:
-        # 默认搜索路径
-        cwd = os.getcwd()
-        search_dirs.append(cwd)
-        
-        # 从环境变量获取额外搜索路径
-        env_paths = os.environ.get("PDF_SEARCH_PATHS")
-        if env_paths:
-            # 使用 os.pathsep (Windows是;, Unix是:) 分割
-            for p in env_paths.split(os.pathsep):
-                p = p.strip()
-                if p and os.path.exists(p) and p != cwd:
-                    search_dirs.append(p)
-    
-    matches = []
-    scanned_files_count = 0
-    
-    for search_root in search_dirs:
-        # 获取所有 PDF 文件
-        # 使用 glob.glob 可能会受限于路径长度或权限，但在 Python 3.10+ 通常表现良好
-        # 显式使用 recursive=True
-        try:
-            search_pattern = os.path.join(search_root, "**", "*.pdf")
-            files = glob.glob(search_pattern, recursive=True)
-            scanned_files_count += len(files)
-            
-            query_lower = query.lower()
-            
-            for file_path in files:
-                filename = os.path.basename(file_path)
-                filename_lower = filename.lower()
-                
-                # 1. 精确包含 (优先级最高)
-                if query_lower in filename_lower:
-                    # 包含匹配给高分，越短的完全匹配分数越高
-                    score = 0.8 + (len(query_lower) / len(filename_lower)) * 0.2
-                    matches.append((score, file_path))
-                    continue
-                    
-                # 2. 模糊匹配
-                ratio = difflib.SequenceMatcher(None, query_lower, filename_lower).ratio()
-                if ratio >= threshold:
-                    matches.append((ratio, file_path))
-                    
-        except Exception as e:
-            # 忽略权限错误等
-            continue
+        search_dirs = _get_default_search_dirs()
+    
+    # 文件名目录：扫描结果缓存在内存和本地文件中，过期后在后台增量刷新；
+    # 查询时先用 trigram 索引缩小候选范围，再计算模糊匹配分数
+    search_dirs = [os.path.abspath(d) for d in search_dirs]
+    catalog = get_file_catalog()
+    catalog.ensure_fresh(search_dirs)
+    scanned_files_count, matches = catalog.search(query, search_dirs, threshold, limit)
     
     # 去重 (同一文件可能被多次扫描)
     unique_matches = {}
@@ -1636,13 +2496,84 @@ async def search_pdf_files(
         
     return [types.TextContent(type="text", text=result_text)]
 
+# 全文索引更新锁：并发的搜索请求不重复提取同一批文件
+_content_index_lock = None
+
+async def update_content_index(roots):
+    """
+    增量更新全文索引：新增或修改过的文件在批量处理进程池中提取文本，逐个写入索引。
+    Returns: (新增/更新的文件数, 移除的文件数, 扫描的文件数)
+    """
+    global _content_index_lock
+    if _content_index_lock is None:
+        _content_index_lock = asyncio.Lock()
+    
+    async with _content_index_lock:
+        to_index, removed_count, scanned_count = await run_blocking(
+            "search_pdf_content", content_index.plan_update, roots
+        )
+        if to_index:
+            calls = [(content_index.extract_page_texts, path) for path, _, _ in to_index]
+            async for idx, (page_texts, error) in iter_process_pool(calls):
+                path, size, mtime_ns = to_index[idx]
+                await run_blocking(
+                    "search_pdf_content", content_index.store_document,
+                    path, size, mtime_ns, page_texts, error
+                )
+        return len(to_index), removed_count, scanned_count
+
+async def search_pdf_content(query: str, directory: str = None, limit: int = 20, refresh: bool = True):
+    """
+    在 PDF 全文索引中搜索内容，返回按相关度排序的 (文件, 页码, 片段)。
+    如果未指定 directory，搜索当前目录和 PDF_SEARCH_PATHS 中的目录。
+    refresh: 搜索前是否增量更新索引（默认 True；只查询已有索引时设为 False 可立即返回）
+    """
+    if not query or not query.strip():
+        return [types.TextContent(type="text", text="Error: 搜索内容不能为空")]
+    
+    if directory:
+        if not os.path.isdir(directory):
+            return [types.TextContent(type="text", text=f"Error: 目录不存在 - {directory}")]
+        roots = [directory]
+    else:
+        roots = _get_default_search_dirs()
+    
+    result_text = "=== 全文搜索结果 ===\n"
+    start_time = time.perf_counter()
+    try:
+        if refresh:
+            updated_count, removed_count, scanned_count = await update_content_index(roots)
+            result_text += f"索引更新: 扫描 {scanned_count} 个文件，新增/更新 {updated_count} 个，移除 {removed_count} 个\n"
+        hits = await run_blocking("search_pdf_content", content_index.search, query, roots, limit)
+        stats = await run_blocking("search_pdf_content", content_index.index_stats)
+    except Exception as e:
+        return [types.TextContent(type="text", text=f"Error searching PDF content: {str(e)}")]
+    elapsed = time.perf_counter() - start_time
+    
+    result_text += f"索引: {stats['documents']} 个文件 / {stats['pages']} 页（提取失败 {stats['failed']} 个）\n"
+    result_text += f"查询: '{query}' | 命中 {len(hits)} 页 | 耗时 {elapsed * 1000:.0f} ms\n"
+    if not hits:
+        result_text += f"未找到包含 '{query}' 的页面\n已搜索路径: {', '.join(roots)}\n"
+        return [types.TextContent(type="text", text=result_text)]
+    
+    for path, page, snippet, score in hits:
+        result_text += f"- {os.path.basename(path)} (Page {page}) [score {score:.3g}]\n"
+        result_text += f"  Path: {path}\n"
+        result_text += f"  {snippet}\n"
+    return [types.TextContent(type="text", text=result_text)]
+
 async def generate_index_file(directory: str):
     """
     扫描指定目录下的 Markdown 文件，生成 README_INDEX.md 索引文件。
     """
+    return await run_blocking("generate_index_file", _generate_index_file, directory)
+
+def _generate_index_file(directory: str):
+    """generate_index_file 的同步实现"""
     if not os.path.isdir(directory):
         return [types.TextContent(type="text", text=f"Error: 目录不存在 - {directory}")]
         
+    import glob
     files = glob.glob(os.path.join(directory, "**/*.md"), recursive=True)
     
     # Filter out README_INDEX.md itself to avoid self-reference loop
@@ -1691,6 +2622,62 @@ async def generate_index_file(directory: str):
         return [types.TextContent(type="text", text=f"Error generating index file: {str(e)}")]
 
 
+def get_cache_stats():
+    """文档缓存和页面缓存的占用情况，以及本进程输出写入器的统计（JSON）"""
+    page_cache = get_page_cache()
+    stats = {
+        "document_cache": get_document_cache().stats(),
+        "page_cache": page_cache.stats() if page_cache else {"enabled": False},
+        "output_writer": get_output_writer().stats(),
+    }
+    return [types.TextContent(type="text", text=json.dumps(stats, ensure_ascii=False, indent=2))]
+
+def _collect_server_stats():
+    """服务器运行统计：各工具的调用数和耗时分布、页面吞吐量、执行层占用（见 executor.get_executor_stats）和缓存命中率"""
+    stats = get_request_stats().to_dict()
+    stats["executor"] = get_executor_stats()
+    doc_cache = get_document_cache().stats()
+    caches = {
+        "document_cache": {
+            "hits": doc_cache["hits"],
+            "misses": doc_cache["misses"],
+            "hit_ratio": hit_ratio(doc_cache["hits"], doc_cache["misses"]),
+            "handles": doc_cache["handles"],
+        },
+        "page_cache": {"enabled": False},
+    }
+    page_cache = get_page_cache()
+    if page_cache:
+        caches["page_cache"] = {
+            "hits": page_cache.hits,
+            "misses": page_cache.misses,
+            "hit_ratio": hit_ratio(page_cache.hits, page_cache.misses),
+        }
+    stats["caches"] = caches
+    return stats
+
+def get_server_stats():
+    """服务器运行统计（JSON）"""
+    return [types.TextContent(type="text", text=json.dumps(_collect_server_stats(), ensure_ascii=False, indent=2))]
+
+def _write_server_stats(path, stats):
+    """把统计快照追加到 path（PDF_STATS_FILE）"""
+    try:
+        append_stats_line(path, stats)
+    except OSError as e:
+        print(f"Warning: 无法写入运行统计 {path}: {e}", file=sys.stderr)
+
+def _server_stats_snapshot():
+    stats = _collect_server_stats()
+    stats["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return stats
+
+async def _dump_server_stats(path, interval):
+    """每隔 interval 秒写入一次运行统计（统计在事件循环中收集，写文件交给线程池）"""
+    while True:
+        await asyncio.sleep(interval)
+        await run_blocking("get_server_stats", _write_server_stats, path, _server_stats_snapshot())
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     return [
@@ -1722,6 +2709,34 @@ async def handle_list_tools() -> list[types.Tool]:
                 "required": ["query"],
             },
         ),
+        types.Tool(
+            name="search_pdf_content",
+            description="在 PDF 全文索引中搜索内容，返回按相关度排序的文件、页码和文本片段（索引自动增量更新）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "搜索内容，多个词用空格分隔（需同时出现在同一页中）",
+                    },
+                    "directory": {
+                        "type": "string",
+                        "description": "搜索根目录（可选，默认当前目录和 PDF_SEARCH_PATHS 中的目录）",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回最大结果数 (默认 20)",
+                        "default": 20
+                    },
+                    "refresh": {
+                        "type": "boolean",
+                        "description": "搜索前是否增量更新索引（默认 true）",
+                        "default": True
+                    }
+                },
+                "required": ["query"],
+            },
+        ),
         types.Tool(
             name="extract_pdf_content",
             description="提取PDF文件的文本和图片（支持指定页码范围或关键词搜索）",
@@ -1743,8 +2758,8 @@ async def handle_list_tools() -> list[types.Tool]:
                     },
                     "format": {
                         "type": "string",
-                        "enum": ["text", "markdown", "json"],
-                        "description": "输出格式，可选 'text' (默认), 'markdown' 或 'json'，markdown 格式更适合 LLM 阅读，json 格式适合程序化处理",
+                        "enum": ["text", "markdown", "json", "json_compact", "ndjson"],
+                        "description": "输出格式，可选 'text' (默认), 'markdown', 'json', 'json_compact' 或 'ndjson'，markdown 格式更适合 LLM 阅读，json 格式适合程序化处理（json_compact 不缩进，体积更小；ndjson 每行一条记录：第一行为文档信息，之后每页一行）",
                         "default": "text"
                     },
                     "include_text": {
@@ -1767,8 +2782,34 @@ async def handle_list_tools() -> list[types.Tool]:
                         "description": "自定义输出目录（可选）"
                     },
                     "skip_table_detection": {
+                        "type": ["boolean", "string"],
+                        "enum": [True, False, "auto", "always", "never"],
+                        "description": "表格检测模式（默认false）。设为true可大幅提升纯文本提取速度，但不会识别和格式化表格。false 使用默认模式（环境变量 PDF_TABLE_DETECTION，默认 auto）；也可指定 \"auto\"（根据页面矢量线条预判，只在可能存在表格的区域检测）、\"always\"（每页整页检测）或 \"never\"（同 true）。",
+                        "default": False
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": "分页：本次返回内容的字符数上限（按整页截止，至少返回一页）。还有剩余页面时返回续读游标 cursor。默认不限制（可通过环境变量 PDF_MAX_RESPONSE_CHARS 设置默认值）",
+                        "minimum": 0
+                    },
+                    "max_pages": {
+                        "type": "integer",
+                        "description": "分页：本次最多返回的页数。还有剩余页面时返回续读游标 cursor。默认不限制",
+                        "minimum": 0
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "上一次分页返回的续读游标（同一 file_path）。提供时从下一页继续读取，page_range/keyword 被忽略，其余参数沿用第一次调用的设置"
+                    },
+                    "timings": {
                         "type": "boolean",
-                        "description": "是否跳过表格检测（默认false）。设为true可大幅提升纯文本提取速度，但不会识别和格式化表格。",
+                        "description": "是否统计各处理阶段（表格检测、文本解析、段落合并、图片、矢量渲染等）的耗时和计数（默认false）。json 格式写入 meta.timings 和每页的 timings，其他格式附加在末尾",
+                        "default": False
+                    },
+                    "profile": {
+                        "type": ["boolean", "string"],
+                        "enum": [True, False, "pstats", "collapsed"],
+                        "description": "性能分析（默认false）。true 或 \"pstats\" 用 cProfile 分析本次调用并保存 .pstats 文件；\"collapsed\" 另外保存火焰图工具可读取的 collapsed stack 文件。文件保存在输出目录的 profiles 子目录下，累计耗时最多的函数写入 meta.profile（json 格式）或附加在末尾",
                         "default": False
                     }
                 },
@@ -1792,8 +2833,8 @@ async def handle_list_tools() -> list[types.Tool]:
                     },
                     "format": {
                         "type": "string",
-                        "enum": ["text", "markdown", "json"],
-                        "description": "输出格式",
+                        "enum": ["text", "markdown", "json", "json_compact", "ndjson"],
+                        "description": "输出格式（json_compact 不缩进；ndjson 每行一条记录，第一行为文档信息，之后每页一行，输出文件扩展名为 .ndjson）",
                         "default": "markdown"
                     },
                     "include_text": {
@@ -1812,10 +2853,6 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "string",
                         "description": "自定义输出目录（可选）"
                     },
-                    "skip_table_detection": {
-                        "type": "string",
-                        "description": "自定义输出目录（可选）"
-                    },
                     "custom_image_output_dir": {
                         "type": "string",
                         "description": "自定义图片输出目录（可选）"
@@ -1830,9 +2867,26 @@ async def handle_list_tools() -> list[types.Tool]:
                         "description": "是否保持源文件的目录层级结构（默认true）。如果为false，所有文件将平铺到输出目录。",
                         "default": True
                     },
-                    "skip_table_detection": {
+                    "incremental": {
                         "type": "boolean",
-                        "description": "是否跳过表格检测（默认false）。设为true可大幅提升纯文本提取速度，但不会识别和格式化表格。",
+                        "description": "是否增量提取（默认true）。根据输出目录中的清单跳过未变化的PDF，并删除已移除源文件的输出；设为false则全部重新提取。",
+                        "default": True
+                    },
+                    "timings": {
+                        "type": "boolean",
+                        "description": "是否统计各处理阶段的耗时和计数（默认false）。报告中汇总各阶段耗时、工作进程峰值内存，并列出最慢的文件和页面",
+                        "default": False
+                    },
+                    "profile": {
+                        "type": ["boolean", "string"],
+                        "enum": [True, False, "pstats", "collapsed"],
+                        "description": "性能分析（默认false）。true 或 \"pstats\" 在工作进程中用 cProfile 分析每个文件并保存 .pstats 文件；\"collapsed\" 另外保存火焰图工具可读取的 collapsed stack 文件。文件保存在输出目录的 profiles/<时间戳> 下（另有合并结果 merged.*），报告中列出累计耗时最多的函数",
+                        "default": False
+                    },
+                    "skip_table_detection": {
+                        "type": ["boolean", "string"],
+                        "enum": [True, False, "auto", "always", "never"],
+                        "description": "表格检测模式（默认false）。设为true可大幅提升纯文本提取速度，但不会识别和格式化表格。false 使用默认模式（环境变量 PDF_TABLE_DETECTION，默认 auto）；也可指定 \"auto\"（根据页面矢量线条预判，只在可能存在表格的区域检测）、\"always\"（每页整页检测）或 \"never\"（同 true）。",
                         "default": False
                     }
                 },
@@ -1857,6 +2911,17 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "string",
                         "description": "文件匹配模式 (默认: **/*.pdf)",
                         "default": "**/*.pdf"
+                    },
+                    "timings": {
+                        "type": "boolean",
+                        "description": "是否统计各处理阶段的耗时和计数（默认false），在报告中汇总",
+                        "default": False
+                    },
+                    "profile": {
+                        "type": ["boolean", "string"],
+                        "enum": [True, False, "pstats", "collapsed"],
+                        "description": "性能分析（默认false），同 batch_extract_pdf_content 的 profile 参数",
+                        "default": False
                     }
                 },
                 "required": ["directory"],
@@ -1925,6 +2990,22 @@ async def handle_list_tools() -> list[types.Tool]:
                 },
                 "required": ["directory"],
             },
+        ),
+        types.Tool(
+            name="get_cache_stats",
+            description="查看服务器缓存的占用情况（已打开文档缓存的句柄数/大小/命中率，页面结果缓存的命中率，以及输出写入的吞吐量/队列等待时间）",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+            },
+        ),
+        types.Tool(
+            name="get_server_stats",
+            description="查看服务器运行统计（各工具的调用数、出错数、正在处理的请求数和耗时分位数/直方图，每秒处理页数，线程池/进程池的占用和排队任务数，文档缓存和页面缓存的命中率）",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+            },
         )
     ]
 
@@ -1932,6 +3013,19 @@ async def handle_list_tools() -> list[types.Tool]:
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    # 所有工具调用计入运行统计（见 get_server_stats）
+    with get_request_stats().track(name):
+        return await _call_tool(name, arguments)
+
+async def _call_tool(
+    name: str, arguments: dict | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    # 无参数的工具
+    if name == "get_cache_stats":
+        return get_cache_stats()
+    if name == "get_server_stats":
+        return get_server_stats()
+
     if not arguments:
         raise ValueError("Missing arguments")
 
@@ -1944,6 +3038,13 @@ async def handle_call_tool(
         limit = arguments.get("limit", 10)
         return await search_pdf_files(query, directory, threshold, limit)
 
+    elif name == "search_pdf_content":
+        query = arguments.get("query")
+        directory = arguments.get("directory")
+        limit = arguments.get("limit", 20)
+        refresh = arguments.get("refresh", True)
+        return await search_pdf_content(query, directory, limit, refresh)
+
     elif name == "extract_pdf_content":
         page_range = arguments.get("page_range", "all")
         keyword = arguments.get("keyword")
@@ -1951,18 +3052,26 @@ async def handle_call_tool(
         include_text = arguments.get("include_text", True)
         include_images = arguments.get("include_images", False)
         use_local_images_only = arguments.get("use_local_images_only", True)
-        skip_table_detection = arguments.get("skip_table_detection", False)
+        skip_table_detection = resolve_table_detection(arguments.get("skip_table_detection", False))
         custom_output_dir = arguments.get("custom_output_dir")
         
         # Calculate consistent paths
         root_output_base = custom_output_dir if custom_output_dir else os.getcwd()
         _, image_output_dir = get_output_paths_for_mode(root_output_base, include_images, include_text, skip_table_detection)
         
+        max_chars = arguments.get("max_chars")
+        if max_chars is None:
+            max_chars = default_max_chars()
         return await extract_content(
             file_path, page_range, keyword, format, include_text, include_images, 
             use_local_images_only, 
             image_output_dir=image_output_dir,
-            skip_table_detection=skip_table_detection
+            skip_table_detection=skip_table_detection,
+            max_chars=max_chars,
+            max_pages=arguments.get("max_pages") or 0,
+            cursor=arguments.get("cursor"),
+            timings=arguments.get("timings", False),
+            profile=arguments.get("profile", False)
         )
     
     elif name == "batch_extract_pdf_content":
@@ -1974,18 +3083,23 @@ async def handle_call_tool(
         use_local_images_only = arguments.get("use_local_images_only", True)
         custom_output_dir = arguments.get("custom_output_dir")
         custom_image_output_dir = arguments.get("custom_image_output_dir")
-        skip_table_detection = arguments.get("skip_table_detection", False)
+        skip_table_detection = resolve_table_detection(arguments.get("skip_table_detection", False))
         create_folder = arguments.get("create_folder", False)
         preserve_structure = arguments.get("preserve_structure", True)
+        incremental = arguments.get("incremental", True)
+        timings = arguments.get("timings", False)
+        profile = arguments.get("profile", False)
         return await batch_extract_pdf_content(
-            directory, pattern, format, include_text, include_images, use_local_images_only, custom_output_dir, custom_image_output_dir, skip_table_detection, create_folder, preserve_structure
+            directory, pattern, format, include_text, include_images, use_local_images_only, custom_output_dir, custom_image_output_dir, skip_table_detection, create_folder, preserve_structure, incremental, timings, profile
         )
 
     elif name == "batch_extract_tables":
         directory = arguments.get("directory")
         output_dir = arguments.get("output_dir")
         pattern = arguments.get("pattern", "**/*.pdf")
-        return await batch_extract_tables(directory, output_dir, pattern)
+        timings = arguments.get("timings", False)
+        profile = arguments.get("profile", False)
+        return await batch_extract_tables(directory, output_dir, pattern, timings, profile)
 
     elif name == "get_pdf_metadata":
         return await get_pdf_metadata(file_path)
@@ -1997,8 +3111,8 @@ async def handle_call_tool(
             raise ValueError("Missing markdown_content or output_path")
         
         try:
-            # 由于 markdown_to_docx 是同步的，如果耗时较长可能需要 run_in_executor，但 pandoc 转换通常很快
-            result_path = markdown_to_docx(md_content, out_path)
+            # pandoc 转换是同步阻塞调用，分派到执行层
+            result_path = await run_blocking("convert_markdown_to_docx", markdown_to_docx, md_content, out_path)
             return [types.TextContent(type="text", text=f"Successfully converted to {result_path}")]
         except Exception as e:
             return [types.TextContent(type="text", text=f"Error converting markdown: {str(e)}")]
@@ -2010,7 +3124,7 @@ async def handle_call_tool(
             raise ValueError("Missing docx_path")
             
         try:
-            result_path = docx_to_pdf(docx_path, pdf_path)
+            result_path = await run_blocking("convert_docx_to_pdf", docx_to_pdf, docx_path, pdf_path)
             return [types.TextContent(type="text", text=f"Successfully converted to {result_path}")]
         except Exception as e:
             return [types.TextContent(type="text", text=f"Error converting to PDF: {str(e)}")]
@@ -2023,19 +3137,34 @@ async def handle_call_tool(
         raise ValueError(f"Unknown tool: {name}")
 
 async def run_server():
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="simple-pdf-extractor",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    # 可选：启动时预热批量处理进程池
+    if os.environ.get("PDF_POOL_PREWARM", "").lower() in ("1", "true", "yes"):
+        warm_up_process_pool()
+    # 运行统计从服务器启动时开始计时；可选：定期写入 PDF_STATS_FILE
+    get_request_stats()
+    stats_path, stats_interval = get_dump_settings()
+    dump_task = asyncio.create_task(_dump_server_stats(stats_path, stats_interval)) if stats_path else None
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="simple-pdf-extractor",
+                    server_version="0.1.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        if dump_task is not None:
+            dump_task.cancel()
+            # 退出前写入最后一次统计
+            _write_server_stats(stats_path, _server_stats_snapshot())
+        shutdown_executor()
+        get_document_cache().clear()
 
 def main():
     """Entry point for the application script"""
@@ -0,0 +1,167 @@
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 服务器运行统计（工具 get_server_stats，以及 PDF_STATS_FILE 配置的定期写入）
+# 记录每个工具的调用数、出错数（抛出异常的调用）、正在处理的请求数和耗时分布，以及处理的页数，
+# 用于容量规划和升级后发现性能退化。执行层和缓存的统计由 server.get_server_stats 合并。
+
+# 耗时直方图的桶上限（秒），超过最后一个上限的调用计入 "+Inf"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# 每个工具保留最近多少次调用的耗时用于计算分位数（直方图统计全部调用）
+LATENCY_WINDOW = 1000
+# 页面吞吐量的统计窗口（秒）
+THROUGHPUT_WINDOW = 60
+DEFAULT_DUMP_INTERVAL = 60
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def percentile(sorted_values, q):
+    """最近秩法分位数（sorted_values 已排序且非空）"""
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class ToolStats:
+    """单个工具的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds, ok):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+        latency = {"mean": round(self.total_seconds / self.calls, 4) if self.calls else None, "max": round(self.max_seconds, 4)}
+        for q in (50, 90, 99):
+            latency[f"p{q}"] = round(percentile(recent, q), 4) if recent else None
+        # 只列出非空的桶，键为桶的上限
+        bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        histogram = {f"le_{bound}": count for bound, count in zip(bounds, self.buckets) if count}
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "total_seconds": round(self.total_seconds, 3),
+            "latency_seconds": latency,
+            "histogram": histogram,
+        }
+
+
+class RequestStats:
+    """工具调用和页面处理的统计（线程安全）"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.tools = {}
+        self.pages = 0
+        # 统计窗口内的 (时间, 页数)
+        self._page_events = deque()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def track(self, tool_name):
+        """统计一次工具调用：调用期间计入 in_flight，结束时记录耗时；抛出异常时计为出错"""
+        with self._lock:
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                tool = self.tools[tool_name] = ToolStats()
+            tool.in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                tool.in_flight -= 1
+                tool.record(seconds, ok)
+
+    def record_pages(self, pages):
+        """记录处理完成的页数（包括命中页面缓存的页面）"""
+        if not pages:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.pages += pages
+            self._page_events.append((now, pages))
+            self._prune(now)
+
+    def _prune(self, now):
+        while self._page_events and self._page_events[0][0] < now - THROUGHPUT_WINDOW:
+            self._page_events.popleft()
+
+    def to_dict(self):
+        now = time.monotonic()
+        uptime = time.time() - self.started_at
+        with self._lock:
+            self._prune(now)
+            recent_pages = sum(pages for _, pages in self._page_events)
+            tools = {name: tool.to_dict() for name, tool in sorted(self.tools.items())}
+            pages = self.pages
+        return {
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "uptime_seconds": round(uptime, 1),
+            "in_flight": sum(tool["in_flight"] for tool in tools.values()),
+            "pages": {
+                "total": pages,
+                f"per_second_{THROUGHPUT_WINDOW}s": round(recent_pages / min(THROUGHPUT_WINDOW, uptime), 2) if uptime else None,
+                "per_second_overall": round(pages / uptime, 2) if uptime else None,
+            },
+            "tools": tools,
+        }
+
+
+def hit_ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def append_stats_line(path, stats):
+    """把一次统计快照追加到 path（每行一个 JSON 对象）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(stats, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def get_dump_settings():
+    """
+    定期写入的设置：PDF_STATS_FILE 为文件路径（未设置时不写入），PDF_STATS_INTERVAL 为间隔秒数。
+    Returns: (path 或 None, interval)
+    """
+    path = os.environ.get("PDF_STATS_FILE") or None
+    try:
+        interval = max(1, int(os.environ.get("PDF_STATS_INTERVAL") or DEFAULT_DUMP_INTERVAL))
+    except ValueError:
+        interval = DEFAULT_DUMP_INTERVAL
+    return path, interval
+
+
+def get_request_stats():
+    """获取（必要时创建）本进程的调用统计"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = RequestStats()
+        return _stats
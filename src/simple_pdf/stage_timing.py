@@ -0,0 +1,217 @@
+import contextlib
+import os
+import sys
+import time
+
+# 分阶段耗时统计（可选，工具参数 timings=true 时开启）
+# 逐页记录各处理阶段的耗时和计数，用于判断时间花在哪里、生产环境应该使用哪种模式：
+#   table_detection  表格检测预筛选 + page.find_tables()
+#   table_filter     候选表格的 table.extract() 和有效性判断 (is_valid_table)
+#   table_markdown   有效表格转换为 Markdown
+#   get_text         page.get_text("dict")
+#   paragraphs       文本块过滤、标题识别和段落合并
+#   images           位图的解码和保存
+#   drawings         page.get_drawings()
+#   merge_rects      矢量区域合并
+#   vector_render    矢量区域渲染 (get_pixmap) 和 PNG 编码
+#   write            批量处理时把结果写入输出文件（交给写入线程之前的部分）
+# 文档级阶段（open / layout / keyword_scan / image_index）记录在 DocumentTimings.document 中。
+# 未开启时使用 NULL_TIMER / NULL_TIMINGS，各阶段只多一次空的 with 语句。
+
+# 汇总中列出的最慢文档/页面数
+TOP_N = 5
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def peak_rss_mb():
+    """
+    本进程的峰值常驻内存 (MB)；平台不支持时返回 None。
+    批量工作进程是常驻的，这里是该进程启动以来（而不是当前任务）的峰值。
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageTimer:
+    """一页（或文档级处理）各阶段的累计耗时（秒）和计数"""
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+
+class _NullTimer:
+    """未开启统计时使用的计时器，不记录任何数据"""
+
+    def stage(self, name):
+        return _NULL_CONTEXT
+
+    def add(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def _rounded(seconds):
+    return {name: round(value, 4) for name, value in sorted(seconds.items(), key=lambda item: -item[1])}
+
+
+class DocumentTimings:
+    """一个文档（或批量处理中的一个分片）的分阶段统计：文档级阶段和逐页记录"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.document = StageTimer()
+        # [(页码, 该页总耗时, StageTimer)]
+        self.pages = []
+
+    @contextlib.contextmanager
+    def page(self, page_num):
+        """统计一页的处理：产出该页的 StageTimer，结束时记录该页的总耗时"""
+        timer = StageTimer()
+        start = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            self.pages.append((page_num, time.perf_counter() - start, timer))
+
+    def page_dict(self, index=-1):
+        """一页的统计（JSON 输出中每页的 timings 字段）"""
+        page_num, seconds, timer = self.pages[index]
+        return {"seconds": round(seconds, 4), "stages": _rounded(timer.seconds), "counts": dict(timer.counts)}
+
+    def to_dict(self, top_n=TOP_N):
+        """整个文档的统计：总耗时、各阶段合计、计数合计、最慢的页面和峰值内存"""
+        stages = dict(self.document.seconds)
+        counts = dict(self.document.counts)
+        for _, _, timer in self.pages:
+            for name, value in timer.seconds.items():
+                stages[name] = stages.get(name, 0.0) + value
+            for name, value in timer.counts.items():
+                counts[name] = counts.get(name, 0) + value
+        slowest = sorted(self.pages, key=lambda item: item[1], reverse=True)[:top_n]
+        peak = peak_rss_mb()
+        return {
+            "seconds": round(time.perf_counter() - self.start, 4),
+            "pages": len(self.pages),
+            "stages": _rounded(stages),
+            "counts": counts,
+            "slowest_pages": [
+                {"page": page_num, "seconds": round(seconds, 4), "stages": _rounded(timer.seconds)}
+                for page_num, seconds, timer in slowest
+            ],
+            "peak_rss_mb": peak,
+            "workers": {str(os.getpid()): peak},
+        }
+
+
+class _NullDocumentTimings:
+    document = NULL_TIMER
+
+    def page(self, page_num):
+        return contextlib.nullcontext(NULL_TIMER)
+
+
+NULL_TIMINGS = _NullDocumentTimings()
+
+
+class TimedStream:
+    """把 write 调用计入 write 阶段的输出流包装"""
+
+    def __init__(self, stream, timer):
+        self.stream = stream
+        self.timer = timer
+
+    def write(self, text):
+        with self.timer.stage("write"):
+            return self.stream.write(text)
+
+
+def merge_timings(total, name, timings, top_n=TOP_N):
+    """
+    把一个文档的统计（DocumentTimings.to_dict 的结果）累加到批量汇总 total 中。
+    同一文档的多个分片依次累加即可（耗时、页数相加，最慢页面合并）。
+    """
+    if not timings:
+        return total
+    total["seconds"] = total.get("seconds", 0.0) + timings["seconds"]
+    total["pages"] = total.get("pages", 0) + timings["pages"]
+    stages = total.setdefault("stages", {})
+    for stage, value in timings["stages"].items():
+        stages[stage] = stages.get(stage, 0.0) + value
+    counts = total.setdefault("counts", {})
+    for key, value in timings["counts"].items():
+        counts[key] = counts.get(key, 0) + value
+    documents = total.setdefault("documents", {})
+    doc = documents.setdefault(name, {"seconds": 0.0, "pages": 0})
+    doc["seconds"] += timings["seconds"]
+    doc["pages"] += timings["pages"]
+    pages = total.setdefault("slowest_pages", [])
+    pages.extend(dict(page, file=name) for page in timings["slowest_pages"])
+    pages.sort(key=lambda page: page["seconds"], reverse=True)
+    del pages[top_n:]
+    workers = total.setdefault("workers", {})
+    for pid, peak in timings["workers"].items():
+        if peak is not None:
+            workers[pid] = max(workers.get(pid, 0.0), peak)
+    return total
+
+
+def _format_stages(stages, total_seconds, limit=None):
+    items = sorted(stages.items(), key=lambda item: -item[1])[:limit]
+    parts = []
+    for stage, value in items:
+        share = f" ({value / total_seconds * 100:.0f}%)" if total_seconds else ""
+        parts.append(f"{stage} {value:.2f}s{share}")
+    return ", ".join(parts)
+
+
+def format_timings(total, top_n=TOP_N):
+    """批量处理报告（或单个文档的文本输出）中的分阶段统计行"""
+    if not total:
+        return []
+    seconds = total["seconds"]
+    lines = [
+        f"Timings: {total['pages']} pages in {len(total['documents'])} files, {seconds:.2f}s processing time",
+        f"  Stages: {_format_stages(total['stages'], seconds) or '-'}",
+        f"  Counts: {', '.join(f'{key} {value}' for key, value in sorted(total['counts'].items())) or '-'}",
+    ]
+    documents = sorted(total["documents"].items(), key=lambda item: item[1]["seconds"], reverse=True)[:top_n]
+    if len(total["documents"]) > 1:
+        lines.append("  Slowest files: " + "; ".join(
+            f"{name} {doc['seconds']:.2f}s ({doc['pages']} pages)" for name, doc in documents
+        ))
+    if total["slowest_pages"]:
+        lines.append("  Slowest pages: " + "; ".join(
+            f"{page['file']} p{page['page']} {page['seconds']:.3f}s"
+            + (f" [{_format_stages(page['stages'], 0, limit=2)}]" if page["stages"] else "")
+            for page in total["slowest_pages"]
+        ))
+    workers = total.get("workers")
+    if workers:
+        lines.append(f"  Peak RSS: max {max(workers.values()):.1f} MB over {len(workers)} processes")
+    return lines
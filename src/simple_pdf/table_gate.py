@@ -0,0 +1,189 @@
+import os
+
+import fitz  # PyMuPDF
+
+# 表格检测预筛选
+# page.find_tables() 使用默认的 "lines" 策略：表格的边只来自矢量图形（直线、矩形和四边形的边，
+# 以及包含文字的相邻图形簇的外框），与文字的排列无关。find_tables 的主要开销是为整页文字逐字符建立数据，
+# 以及为每个图形簇在整页文字中查找内容，纯文字页面（只有页眉/页脚横线）同样要付出这些开销。
+# 这里先用 page.get_drawings() 做一次廉价的几何判断：
+# * 把相距不超过 CLUSTER_TOLERANCE 的图形合并成簇（比 find_tables 内部的合并更宽松，所以每个 find_tables
+#   的图形簇都完整落在某个簇内，不同簇的边彼此无法连接成表格）。
+# * 有效表格至少 2 行 2 列，需要至少 3 条不同位置的水平边和 3 条不同位置的垂直边；
+#   不满足的簇不可能产生有效表格（is_valid_table 会丢弃单行/单列表格）。
+# * 没有候选簇的页面直接跳过 find_tables；否则把 find_tables 限制在候选簇所在的区域 (clip) 内。
+# 模式 (skip_table_detection):
+#   "auto"   预筛选（默认）
+#   "always" 每页都对整页调用 find_tables（原行为，用于对比准确性）
+#   "never"  跳过表格检测（极速模式，等同于 skip_table_detection=true）
+
+TABLE_DETECTION_MODES = ("auto", "always", "never")
+DEFAULT_TABLE_DETECTION = "auto"
+
+# find_tables 的默认吸附容差为 3，这里取两倍
+CLUSTER_TOLERANCE = 6
+# 候选区域向外扩展的距离，保证跨越区域边界的字符完整包含在 clip 内
+CLIP_MARGIN = 20
+# 图形数超过该值时不做预筛选（直接对整页调用 find_tables）
+MAX_GATE_PATHS = 5000
+
+
+def resolve_table_detection(value=False):
+    """
+    把 skip_table_detection 参数转换为表格检测模式。
+    True -> "never"；False/None -> 默认模式（环境变量 PDF_TABLE_DETECTION: "auto" 或 "always"，未设置时为 "auto"）；
+    字符串 "auto" / "always" / "never"（以及 "true" / "false"）按原样解析。
+    """
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TABLE_DETECTION_MODES:
+            return text
+        if text in ("true", "1", "yes"):
+            return "never"
+        if text in ("false", "0", "no", ""):
+            value = False
+        else:
+            raise ValueError(f"skip_table_detection 只能是 true/false 或 {'/'.join(TABLE_DETECTION_MODES)}: {value}")
+    if value:
+        return "never"
+    default = (os.environ.get("PDF_TABLE_DETECTION") or DEFAULT_TABLE_DETECTION).strip().lower()
+    return default if default in ("auto", "always") else DEFAULT_TABLE_DETECTION
+
+
+def _path_edges(path):
+    """图形中可能成为表格边的水平位置 (y) 和垂直位置 (x)，与 find_tables 的取边规则相同（宁多勿少）"""
+    hs, vs = set(), set()
+    # 图形外框：find_tables 会为包含文字的图形簇添加外框，簇的外框由成员图形的外框组成
+    r = path["rect"]
+    hs.update((r.y0, r.y1))
+    vs.update((r.x0, r.x1))
+
+    def add_line(p1, p2):
+        if abs(p1.y - p2.y) <= 3:
+            hs.update((p1.y, p2.y))
+        if abs(p1.x - p2.x) <= 3:
+            vs.update((p1.x, p2.x))
+
+    items = path["items"]
+    if path.get("closePath") and items and items[0][0] == "l" and items[-1][0] == "l":
+        add_line(items[-1][2], items[0][1])
+    for item in items:
+        kind = item[0]
+        if kind == "l":
+            add_line(item[1], item[2])
+        elif kind == "re":
+            rect = item[1].normalize()
+            # 细长矩形被视为一条线（取中线），其余矩形贡献四条边
+            hs.update((rect.y0, rect.y1, (rect.y0 + rect.y1) / 2))
+            vs.update((rect.x0, rect.x1, (rect.x0 + rect.x1) / 2))
+        elif kind == "qu":
+            ul, ur, ll, lr = item[1]
+            add_line(ul, ll)
+            add_line(ll, lr)
+            add_line(lr, ur)
+            add_line(ur, ul)
+    return hs, vs
+
+
+def _group_neighbors(boxes, tol):
+    """
+    把外框相距不超过 tol 的矩形分组（传递闭包）。
+    boxes: [(x0, y0, x1, y1)]，Returns: [[索引]]
+    """
+    parent = list(range(len(boxes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # 按 x0 排序扫描，只比较 x 方向可能相邻的矩形
+    order = sorted(range(len(boxes)), key=lambda i: boxes[i][0])
+    active = []
+    for i in order:
+        x0, y0, x1, y1 = boxes[i]
+        active = [j for j in active if boxes[j][2] + tol >= x0]
+        for j in active:
+            if boxes[j][1] - tol <= y1 and y0 <= boxes[j][3] + tol:
+                ri, rj = find(i), find(j)
+                if ri != rj:
+                    parent[ri] = rj
+        active.append(i)
+
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def table_regions(page, drawings=None):
+    """
+    页面上可能包含有效表格的区域。
+    Returns: None 表示无法判断（应对整页检测）；[] 表示不可能有表格；否则为候选区域 fitz.Rect 列表
+    """
+    if page.rotation != 0:
+        # find_tables 会临时把页面旋转为 0 度，坐标与 get_drawings 不同
+        return None
+    if drawings is None:
+        drawings = page.get_drawings()
+    if not drawings:
+        return []
+    if len(drawings) > MAX_GATE_PATHS:
+        return None
+
+    # 每个簇: [x0, y0, x1, y1, 水平边位置, 垂直边位置]
+    clusters = []
+    for path in drawings:
+        r = path["rect"]
+        hs, vs = _path_edges(path)
+        clusters.append([min(r.x0, r.x1), min(r.y0, r.y1), max(r.x0, r.x1), max(r.y0, r.y1), hs, vs])
+
+    # 反复合并相邻簇，直到簇的外框彼此都不相邻
+    while True:
+        groups = _group_neighbors([c[:4] for c in clusters], CLUSTER_TOLERANCE)
+        if len(groups) == len(clusters):
+            break
+        merged = []
+        for group in groups:
+            members = [clusters[i] for i in group]
+            hs, vs = set(), set()
+            for m in members:
+                hs |= m[4]
+                vs |= m[5]
+            merged.append([
+                min(m[0] for m in members), min(m[1] for m in members),
+                max(m[2] for m in members), max(m[3] for m in members),
+                hs, vs,
+            ])
+        clusters = merged
+
+    return [
+        fitz.Rect(c[:4])
+        for c in clusters
+        if len(c[4]) >= 3 and len(c[5]) >= 3
+    ]
+
+
+def plan_table_detection(page, mode, drawings=None):
+    """
+    决定本页如何调用 find_tables。
+    drawings: 调用方已经取得的 page.get_drawings() 结果（未提供时在这里获取）
+    Returns: (是否调用, clip)；clip 为 None 表示整页
+    """
+    if mode == "never":
+        return False, None
+    if mode == "always":
+        return True, None
+    regions = table_regions(page, drawings)
+    if regions is None:
+        return True, None
+    if not regions:
+        return False, None
+    clip = fitz.Rect(regions[0])
+    for r in regions[1:]:
+        clip |= r
+    clip = fitz.Rect(clip.x0 - CLIP_MARGIN, clip.y0 - CLIP_MARGIN, clip.x1 + CLIP_MARGIN, clip.y1 + CLIP_MARGIN) & page.rect
+    if clip.is_empty:
+        return True, None
+    return True, clip
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 冷启动基准测试与启动预算检查
+# 分别在新进程中测量：
+#   import      导入 simple_pdf.server 的耗时（进程内计时，不含解释器启动）
+#   list_tools  从启动 `python -m simple_pdf.server` 到收到 tools/list 响应的耗时（MCP 客户端实际感受到的启动时间）
+# 同时检查导入之后不应出现在 sys.modules 中的模块（转换后端、全文索引、文件名模糊匹配等按需导入的依赖）。
+# 超出预算或按需导入的模块被提前导入时以退出码 1 结束，可以在 CI 或升级依赖后运行。
+# 启动耗时主要来自 mcp（及其依赖的 pydantic、starlette 等）和 PyMuPDF，预算按这两者留出余量。
+# 用法:
+#   python tools/bench_cold_start.py [--runs 5] [--import-budget 1.5] [--list-tools-budget 2.5] [--output result.json]
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+# 默认预算（秒，取多次运行的中位数比较）
+DEFAULT_IMPORT_BUDGET = 1.5
+DEFAULT_LIST_TOOLS_BUDGET = 2.5
+
+# 导入 simple_pdf.server 之后不应已导入的模块：只在调用对应工具时才需要
+# （glob、multiprocessing 虽然也改为按需导入，但 mcp 依赖的 uvicorn 启动时就会导入它们，这里不检查）
+LAZY_MODULES = ("pypandoc", "docx2pdf", "win32com", "difflib", "sqlite3", "cProfile", "pstats")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import simple_pdf.server
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+"""
+
+
+def _child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    # 不预热进程池、不写统计文件，只测量服务器本身的启动
+    env.pop("PDF_POOL_PREWARM", None)
+    env.pop("PDF_STATS_FILE", None)
+    return env
+
+
+def measure_import(python):
+    """在新进程中导入 simple_pdf.server，Returns: (耗时秒数, 已被导入的按需模块)"""
+    result = subprocess.run(
+        [python, "-c", _IMPORT_PROBE % (LAZY_MODULES,)],
+        env=_child_env(), capture_output=True, text=True, check=True,
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["seconds"], data["loaded"]
+
+
+def _send(proc, message):
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _read_response(proc, request_id):
+    """读取 stdout 直到收到 id 为 request_id 的响应"""
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("服务器在响应之前退出")
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            if "error" in message:
+                raise RuntimeError(f"服务器返回错误: {message['error']}")
+            return message["result"]
+
+
+def measure_list_tools(python):
+    """启动服务器并完成 initialize 和 tools/list，Returns: (从启动进程到收到 tools/list 响应的秒数, 工具数)"""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [python, "-m", "simple_pdf.server"],
+        env=_child_env(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, encoding="utf-8",
+    )
+    try:
+        _send(proc, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "bench_cold_start", "version": "1"},
+            },
+        })
+        _read_response(proc, 1)
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = _read_response(proc, 2)["tools"]
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    return elapsed, len(tools)
+
+
+def _summary(values):
+    return {
+        "min": round(min(values), 4),
+        "median": round(statistics.median(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def run(python, runs):
+    import_times, list_tools_times = [], []
+    loaded = set()
+    tool_count = 0
+    for _ in range(runs):
+        seconds, modules = measure_import(python)
+        import_times.append(seconds)
+        loaded.update(modules)
+        seconds, tool_count = measure_list_tools(python)
+        list_tools_times.append(seconds)
+    return {
+        "python": subprocess.run([python, "-c", "import platform; print(platform.python_version())"],
+                                 capture_output=True, text=True).stdout.strip(),
+        "runs": runs,
+        "import_seconds": _summary(import_times),
+        "list_tools_seconds": _summary(list_tools_times),
+        "tools": tool_count,
+        "eagerly_loaded": sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准测试：测量导入耗时和启动到响应 tools/list 的耗时，并检查启动预算")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数（取中位数与预算比较）")
+    parser.add_argument("--python", default=sys.executable, help="运行服务器的 Python 解释器")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET, help="导入耗时预算（秒）")
+    parser.add_argument("--list-tools-budget", type=float, default=DEFAULT_LIST_TOOLS_BUDGET,
+                        help="启动到响应 tools/list 的耗时预算（秒）")
+    parser.add_argument("--output", help="结果 JSON 文件路径；默认输出到标准输出")
+    args = parser.parse_args()
+
+    result = run(args.python, max(1, args.runs))
+    failures = []
+    if result["import_seconds"]["median"] > args.import_budget:
+        failures.append(f"导入耗时 {result['import_seconds']['median']}s 超出预算 {args.import_budget}s")
+    if result["list_tools_seconds"]["median"] > args.list_tools_budget:
+        failures.append(f"启动到响应 tools/list 耗时 {result['list_tools_seconds']['median']}s 超出预算 {args.list_tools_budget}s")
+    if result["eagerly_loaded"]:
+        failures.append(f"以下模块应按需导入，但在导入 simple_pdf.server 时已被导入: {', '.join(result['eagerly_loaded'])}")
+    result["budget"] = {"import_seconds": args.import_budget, "list_tools_seconds": args.list_tools_budget}
+    result["failures"] = failures
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+
+import argparse
+import hashlib
+import json
+import os
+import random
+
+import fitz
+
+# 端到端基准测试的合成 PDF 语料（用法见 tools/bench_e2e.py）
+# 只依赖 PyMuPDF，离线生成；相同的 seed 和 scale 生成的文件逐字节相同，不同机器之间的结果可以直接对比。
+# 页面类型覆盖提取流程的各个分支：
+#   prose   正文段落、标题、页眉页脚和页码
+#   tables  带边框线的表格（表格检测、有效性判断、Markdown 转换）
+#   code    底色矩形中的等宽代码（代码块判断）
+#   images  位图（含每页重复的 Logo，用于图片去重）
+#   vector  密集矢量图形（矢量区域合并与渲染、表格预筛选）
+#   cjk     中文正文（CJK 段落合并）
+#   mixed   以上各类页面轮流出现
+# 用法:
+#   python tools/bench_corpus.py OUT_DIR [--seed 20251210] [--scale 1]
+
+CORPUS_VERSION = 1
+DEFAULT_SEED = 20251210
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 60
+BODY_SIZE = 10.5
+LINE_HEIGHT = 14
+LOGO_RECT = fitz.Rect(PAGE_WIDTH - MARGIN - 40, 12, PAGE_WIDTH - MARGIN, 44)
+
+# (类型, 文件数, 每个文件的页数)，scale 按比例放大文件数
+CORPUS_LAYOUT = [
+    ("prose", 4, 30),
+    ("tables", 3, 20),
+    ("code", 2, 20),
+    ("images", 3, 15),
+    ("vector", 2, 10),
+    ("cjk", 2, 20),
+    ("mixed", 2, 40),
+]
+
+WORDS = (
+    "system data process table value result method analysis model report page section design test "
+    "performance memory network server client request response cache index query document layout "
+    "extract merge detect render image vector text block line span font size margin header footer "
+    "number total average rate error latency throughput worker thread batch shard output input file"
+).split()
+CJK_CHARS = (
+    "数据处理系统分析方法结果模型报告页面设计测试性能内存网络服务客户请求响应缓存索引查询文档版面提取合并"
+    "检测渲染图片矢量文本段落字体大小边距页眉页脚数字总计平均错误延迟吞吐线程批量输出输入文件表格"
+)
+CODE_KEYWORDS = ["def", "return", "for", "in", "if", "else", "import", "class", "while", "with"]
+
+
+def _sentence(rng, words=None):
+    words = [rng.choice(WORDS) for _ in range(words or rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def _cjk_sentence(rng):
+    return "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(14, 30))) + "。"
+
+
+def _wrap(text, width, fontname, fontsize):
+    """按宽度折行（英文按单词）"""
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and fitz.get_text_length(candidate, fontname=fontname, fontsize=fontsize) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _wrap_cjk(text, width, fontsize):
+    per_line = max(1, int(width // fontsize))
+    return [text[i:i + per_line] for i in range(0, len(text), per_line)]
+
+
+class _PageWriter:
+    """在页面上自上而下排版的简单游标"""
+
+    def __init__(self, page, title, page_number):
+        self.page = page
+        self.y = MARGIN + 20
+        page.insert_text((MARGIN, 40), f"Benchmark Corpus - {title}", fontname="helv", fontsize=8)
+        page.draw_line((MARGIN, 46), (PAGE_WIDTH - MARGIN, 46), width=0.5)
+        page.insert_text((PAGE_WIDTH / 2 - 5, PAGE_HEIGHT - 30), str(page_number), fontname="helv", fontsize=8)
+
+    def room(self, height):
+        return self.y + height <= PAGE_HEIGHT - MARGIN
+
+    def heading(self, text, size=16, fontname="hebo"):
+        self.y += size * 0.6
+        self.page.insert_text((MARGIN, self.y + size), text, fontname=fontname, fontsize=size)
+        self.y += size * 1.8
+
+    def paragraph(self, lines, fontname="helv", size=BODY_SIZE):
+        for line in lines:
+            if not self.room(LINE_HEIGHT):
+                return False
+            self.page.insert_text((MARGIN, self.y + size), line, fontname=fontname, fontsize=size)
+            self.y += LINE_HEIGHT
+        self.y += LINE_HEIGHT * 0.6
+        return True
+
+
+def _prose_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"{page_number}. {_sentence(rng, 4)[:-1]}")
+    while w.room(LINE_HEIGHT * 3):
+        text = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+        if not w.paragraph(_wrap(text, PAGE_WIDTH - 2 * MARGIN, "helv", BODY_SIZE)):
+            break
+        if rng.random() < 0.15 and w.room(60):
+            w.heading(_sentence(rng, 3)[:-1], size=13)
+
+
+def _draw_table(page, rng, top, rows, cols):
+    """带完整边框线的表格，返回表格底部的 y 坐标"""
+    width = PAGE_WIDTH - 2 * MARGIN
+    col_width = width / cols
+    row_height = 18
+    bottom = top + rows * row_height
+    for r in range(rows + 1):
+        y = top + r * row_height
+        page.draw_line((MARGIN, y), (MARGIN + width, y), width=0.6)
+    for c in range(cols + 1):
+        x = MARGIN + c * col_width
+        page.draw_line((x, top), (x, bottom), width=0.6)
+    for r in range(rows):
+        for c in range(cols):
+            if r == 0:
+                text, font = f"{rng.choice(WORDS).capitalize()} {c + 1}", "hebo"
+            elif c == 0:
+                text, font = rng.choice(WORDS), "helv"
+            else:
+                text, font = f"{rng.randint(0, 99999) / 100:.2f}", "helv"
+            page.insert_text((MARGIN + c * col_width + 4, top + r * row_height + 13), text, fontname=font, fontsize=9)
+    return bottom
+
+
+def _tables_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"Table set {page_number}", size=14)
+    for _ in range(rng.randint(1, 2)):
+        w.paragraph(_wrap(_sentence(rng) + " " + _sentence(rng), PAGE_WIDTH - 2 * MARGIN, "helv", BODY_SIZE))
+        rows, cols = rng.randint(4, 12), rng.randint(3, 6)
+        if not w.room(rows * 18 + 20):
+            break
+        w.y = _draw_table(page, rng, w.y, rows, cols) + 20
+
+
+def _code_lines(rng, count):
+    lines, indent = [], 0
+    for _ in range(count):
+        kw = rng.choice(CODE_KEYWORDS)
+        name = "_".join(rng.choice(WORDS) for _ in range(2))
+        if kw in ("def", "class", "for", "if", "while", "with"):
+            line = f"{kw} {name}({rng.choice(WORDS)}):"
+        else:
+            line = f"{kw} {name} = {rng.randint(0, 999)}  # {rng.choice(WORDS)}"
+        lines.append("    " * indent + line)
+        indent = min(3, indent + 1) if line.endswith(":") else max(0, indent - (rng.random() < 0.3))
+    return lines
+
+
+def _code_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"Listing {page_number}", size=14)
+    while w.room(120):
+        w.paragraph(_wrap(_sentence(rng), PAGE_WIDTH - 2 * MARGIN, "helv", BODY_SIZE))
+        lines = _code_lines(rng, rng.randint(6, 16))
+        height = len(lines) * 11 + 10
+        if not w.room(height):
+            break
+        page.draw_rect(fitz.Rect(MARGIN - 4, w.y, PAGE_WIDTH - MARGIN + 4, w.y + height), color=None, fill=(0.94, 0.94, 0.94))
+        for k, line in enumerate(lines):
+            page.insert_text((MARGIN, w.y + 14 + k * 11), line, fontname="cour", fontsize=8.5)
+        w.y += height + 14
+
+
+def _pixmap(rng, width, height):
+    """确定性的位图：平滑渐变或随机噪点"""
+    if rng.random() < 0.5:
+        r0, g0, b0 = rng.randrange(256), rng.randrange(256), rng.randrange(256)
+        rows = []
+        for y in range(height):
+            row = bytearray()
+            for x in range(width):
+                row += bytes(((r0 + x) % 256, (g0 + y) % 256, (b0 + x + y) % 256))
+            rows.append(bytes(row))
+        samples = b"".join(rows)
+    else:
+        samples = rng.randbytes(width * height * 3)
+    return fitz.Pixmap(fitz.csRGB, width, height, samples, 0)
+
+
+def _images_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"Figures {page_number}", size=14)
+    for k in range(rng.randint(1, 3)):
+        width, height = rng.choice([(160, 120), (240, 160), (120, 120)])
+        if not w.room(height + 40):
+            break
+        page.insert_image(fitz.Rect(MARGIN, w.y, MARGIN + width, w.y + height), pixmap=_pixmap(rng, width // 2, height // 2))
+        w.y += height + 6
+        w.paragraph([f"Figure {page_number}.{k + 1}: {_sentence(rng, 6)}"], size=9)
+
+
+def _vector_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"Chart {page_number}", size=14)
+    shape = page.new_shape()
+    left, top, right, bottom = MARGIN, w.y + 10, PAGE_WIDTH - MARGIN, w.y + 330
+    # 坐标轴和网格线
+    shape.draw_line((left, bottom), (right, bottom))
+    shape.draw_line((left, top), (left, bottom))
+    for k in range(1, 10):
+        y = bottom - k * (bottom - top) / 10
+        shape.draw_line((left, y), (right, y))
+    shape.finish(color=(0.6, 0.6, 0.6), width=0.3)
+    # 柱状图
+    bars = rng.randint(12, 30)
+    bar_width = (right - left) / bars
+    for k in range(bars):
+        h = rng.uniform(10, bottom - top - 10)
+        shape.draw_rect(fitz.Rect(left + k * bar_width + 2, bottom - h, left + (k + 1) * bar_width - 2, bottom))
+    shape.finish(color=None, fill=(0.3, 0.5, 0.8))
+    # 折线（大量短线段）
+    points = [fitz.Point(left + (right - left) * k / 600, top + (bottom - top) * (0.5 + 0.4 * rng.uniform(-1, 1))) for k in range(601)]
+    shape.draw_polyline(points)
+    shape.finish(color=(0.8, 0.2, 0.2), width=0.5)
+    # 散点
+    for _ in range(300):
+        x, y = rng.uniform(left, right), rng.uniform(top, bottom)
+        shape.draw_circle((x, y), 1.2)
+    shape.finish(color=(0.1, 0.1, 0.1), fill=(0.1, 0.1, 0.1))
+    shape.commit()
+    w.y = bottom + 20
+    w.paragraph(_wrap(" ".join(_sentence(rng) for _ in range(4)), PAGE_WIDTH - 2 * MARGIN, "helv", BODY_SIZE))
+
+
+def _cjk_page(page, rng, title, page_number):
+    w = _PageWriter(page, title, page_number)
+    w.heading(f"第{page_number}章 " + "".join(rng.choice(CJK_CHARS) for _ in range(6)), size=15, fontname="china-s")
+    while w.room(LINE_HEIGHT * 3):
+        text = "".join(_cjk_sentence(rng) for _ in range(rng.randint(2, 5)))
+        if not w.paragraph(_wrap_cjk(text, PAGE_WIDTH - 2 * MARGIN, BODY_SIZE), fontname="china-s"):
+            break
+
+
+PAGE_BUILDERS = {
+    "prose": _prose_page,
+    "tables": _tables_page,
+    "code": _code_page,
+    "images": _images_page,
+    "vector": _vector_page,
+    "cjk": _cjk_page,
+}
+
+
+def build_pdf(path, kind, pages, seed):
+    """生成一个 PDF 文件，返回页数"""
+    rng = random.Random(f"{seed}:{os.path.basename(path)}")
+    doc = fitz.open()
+    logo_xref = None
+    kinds = list(PAGE_BUILDERS) if kind == "mixed" else [kind]
+    title = os.path.splitext(os.path.basename(path))[0]
+    for n in range(pages):
+        page_kind = kinds[n % len(kinds)]
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        if page_kind == "images":
+            # Logo 在第一个图片页插入，之后的图片页引用同一个图片对象 (xref)
+            if logo_xref is None:
+                logo_xref = page.insert_image(LOGO_RECT, pixmap=_pixmap(rng, 32, 32))
+            else:
+                page.insert_image(LOGO_RECT, xref=logo_xref)
+        PAGE_BUILDERS[page_kind](page, rng, title, n + 1)
+    doc.set_metadata({
+        "title": title, "producer": "simple-pdf bench_corpus",
+        "creationDate": "D:20250101000000Z", "modDate": "D:20250101000000Z",
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    with open(path, "wb") as f:
+        f.write(data)
+    return pages
+
+
+def build_corpus(out_dir, seed=DEFAULT_SEED, scale=1):
+    """
+    生成语料（已存在且版本、参数相同时直接复用），并写入 corpus.json。
+    Returns: corpus.json 的内容 {"version", "seed", "scale", "files": [{"path", "kind", "pages", "sha256"}]}
+    """
+    manifest_path = os.path.join(out_dir, "corpus.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if (manifest.get("version"), manifest.get("seed"), manifest.get("scale")) == (CORPUS_VERSION, seed, scale) and all(
+            os.path.exists(os.path.join(out_dir, item["path"])) for item in manifest["files"]
+        ):
+            return manifest
+
+    files = []
+    for kind, count, pages in CORPUS_LAYOUT:
+        for n in range(count * scale):
+            # 混合文档放在带空格的多级子目录中（覆盖保持目录结构的输出路径）
+            subdir = os.path.join("mixed", "part 2") if kind == "mixed" else kind
+            rel_path = os.path.join(subdir, f"{kind}_{n + 1:02d}.pdf")
+            path = os.path.join(out_dir, rel_path)
+            build_pdf(path, kind, pages, seed)
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            files.append({"path": rel_path.replace(os.sep, "/"), "kind": kind, "pages": pages, "sha256": digest})
+
+    manifest = {"version": CORPUS_VERSION, "seed": seed, "scale": scale, "files": files}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成端到端基准测试的合成 PDF 语料")
+    parser.add_argument("out_dir")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scale", type=int, default=1, help="文件数倍数")
+    args = parser.parse_args()
+    manifest = build_corpus(args.out_dir, args.seed, args.scale)
+    pages = sum(item["pages"] for item in manifest["files"])
+    print(f"{len(manifest['files'])} files, {pages} pages -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
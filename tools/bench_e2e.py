@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_corpus import DEFAULT_SEED, build_corpus
+
+# 端到端基准测试：复现 BENCHMARK_REPORT.md 中的 6 种模式
+# 在合成语料（tools/bench_corpus.py）上依次运行 batch_extract_pdf_content（5 种模式）和
+# batch_extract_tables（纯表格），输出每种模式的耗时、页/秒、逐文件延迟分位数和峰值内存（JSON）。
+# 只依赖 PyMuPDF 和本仓库代码，离线运行；峰值内存通过 /proc 统计（仅 Linux）。
+# 用法:
+#   python tools/bench_e2e.py [--corpus DIR] [--workers 4] [--modes standard_no_image,only_table] [--output result.json]
+# 不指定 --corpus 时在临时目录生成语料；指定时复用目录中已生成的语料（corpus.json 与 seed/scale 一致时）。
+
+BENCHMARK_VERSION = 1
+
+# (模式名, include_text, include_images, skip_table_detection)，顺序与 BENCHMARK_REPORT.md 一致；
+# include_text 为 None 表示纯表格模式（batch_extract_tables）
+MODES = [
+    ("only_image", False, True, False),
+    ("fast_no_image_and_table", True, False, True),
+    ("fast_with_image_no_table", True, True, True),
+    ("standard_no_image", True, False, False),
+    ("only_table", None, False, False),
+    ("standard_with_image", True, True, False),
+]
+
+# 峰值内存的采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def _read_status_kb(pid, fields):
+    """读取 /proc/<pid>/status 中的内存字段（kB）；进程已退出时返回 None"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return values
+
+
+def _descendants(root_pid):
+    """root_pid 的所有后代进程（进程池的 forkserver 和工作进程）"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格和括号，从最后一个 ")" 之后解析
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    result = []
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+class PeakMemorySampler:
+    """
+    在后台线程中定期统计主进程和所有子进程的峰值内存。
+    每个进程取 VmHWM（内核记录的峰值常驻内存，开始前通过 clear_refs 重置），
+    总量取各次采样时所有进程 VmRSS 之和的最大值。
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.main_kb = 0
+        self.worker_kb = 0
+        self.total_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _reset_peaks(self):
+        for pid in [os.getpid()] + _descendants(os.getpid()):
+            try:
+                with open(f"/proc/{pid}/clear_refs", "w") as f:
+                    f.write("5")
+            except OSError:
+                pass
+
+    def _sample(self):
+        main_pid = os.getpid()
+        total = 0
+        for pid in [main_pid] + _descendants(main_pid):
+            values = _read_status_kb(pid, ("VmHWM", "VmRSS"))
+            if not values:
+                continue
+            total += values.get("VmRSS", 0)
+            peak = values.get("VmHWM", values.get("VmRSS", 0))
+            if pid == main_pid:
+                self.main_kb = max(self.main_kb, peak)
+            else:
+                self.worker_kb = max(self.worker_kb, peak)
+        self.total_kb = max(self.total_kb, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        if sys.platform.startswith("linux"):
+            self._reset_peaks()
+            self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+        return False
+
+    def to_dict(self):
+        return {
+            "main_mb": round(self.main_kb / 1024, 1),
+            "worker_max_mb": round(self.worker_kb / 1024, 1),
+            "total_mb": round(self.total_kb / 1024, 1),
+        }
+
+
+def percentiles(values):
+    """逐文件延迟的分位数（秒）"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        # 最近秩法：不插值，结果总是某个实测值
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": round(pick(0.50), 4),
+        "p90": round(pick(0.90), 4),
+        "p99": round(pick(0.99), 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.fmean(ordered), 4),
+    }
+
+
+def _parse_counts(text, only_table):
+    """从批量工具的报告中解析成功/失败文件数"""
+    if only_table:
+        success = re.search(r"- Successful: (\d+)", text)
+        failed = re.search(r"- Failed: (\d+)", text)
+    else:
+        success = re.search(r"Success: (\d+)", text)
+        failed = re.search(r"Failed: (\d+)", text)
+    return (int(success.group(1)) if success else None, int(failed.group(1)) if failed else None)
+
+
+def _measure_latency(server, pdf_paths, mode, out_root):
+    """在当前进程中逐个处理文件（与批量工具的工作进程调用相同的函数），记录每个文件的耗时"""
+    name, include_text, include_images, skip = mode
+    latencies = []
+    if include_text is None:
+        output_dir = os.path.join(out_root, "output", "output_only_table")
+    else:
+        output_dir, _ = server.get_output_paths_for_mode(out_root, include_images, include_text, skip)
+    for pdf_path in pdf_paths:
+        if include_text is None:
+            args = (pdf_path, output_dir, False)
+            func = server._process_single_pdf_tables
+        else:
+            args = (pdf_path, "markdown", include_text, include_images, True, output_dir, None,
+                    server.resolve_table_detection(skip), False, output_dir, False)
+            func = server._process_single_pdf_worker
+        start = time.perf_counter()
+        result = func(args)
+        latencies.append(time.perf_counter() - start)
+        if not result[0]:
+            raise RuntimeError(f"{name}: {pdf_path} 处理失败: {result[3]}")
+    return latencies
+
+
+async def run_mode(server, corpus_dir, pdf_paths, pages, mode, work_dir, measure_latency):
+    name, include_text, include_images, skip = mode
+    out_root = os.path.join(work_dir, name)
+    shutil.rmtree(out_root, ignore_errors=True)
+    os.makedirs(out_root)
+
+    if include_text is None:
+        mode_dir = os.path.join(out_root, "output", "output_only_table")
+    else:
+        mode_dir, _ = server.get_output_paths_for_mode(out_root, include_images, include_text, skip)
+    # 模式名与服务器的模式目录一致，避免报告中的模式与实际运行的模式对不上
+    dir_name = os.path.basename(mode_dir)
+    if dir_name != f"output_{name}":
+        raise RuntimeError(f"模式 {name} 对应的输出目录为 {dir_name}")
+
+    with PeakMemorySampler() as memory:
+        start = time.perf_counter()
+        if include_text is None:
+            result = await server.batch_extract_tables(corpus_dir, out_root)
+        else:
+            result = await server.batch_extract_pdf_content(
+                corpus_dir, format="markdown", include_text=include_text, include_images=include_images,
+                custom_output_dir=out_root, skip_table_detection=skip, incremental=False,
+            )
+        elapsed = time.perf_counter() - start
+    success, failed = _parse_counts(result[0].text, include_text is None)
+
+    entry = {
+        "mode": name,
+        "output_dir": dir_name,
+        "files": len(pdf_paths),
+        "pages": pages,
+        "success": success,
+        "failed": failed,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 1) if elapsed else None,
+        "s_per_file": round(elapsed / len(pdf_paths), 4) if pdf_paths else None,
+        "peak_rss": memory.to_dict(),
+    }
+    if measure_latency:
+        latency_root = os.path.join(work_dir, name + "_latency")
+        shutil.rmtree(latency_root, ignore_errors=True)
+        entry["latency_s"] = percentiles(_measure_latency(server, pdf_paths, mode, latency_root))
+    return entry
+
+
+def _print_table(report):
+    print(f"{'mode':<26} {'files':>5} {'pages':>6} {'elapsed':>9} {'pages/s':>8} {'p50':>7} {'p90':>7} "
+          f"{'p99':>7} {'rss main':>9} {'rss wkr':>8}", file=sys.stderr)
+    for entry in report["modes"]:
+        latency = entry.get("latency_s", {})
+        print(
+            f"{entry['mode']:<26} {entry['files']:>5} {entry['pages']:>6} {entry['elapsed_s']:>8.2f}s "
+            f"{entry['pages_per_s'] or 0:>8.1f} {latency.get('p50', 0):>7.3f} {latency.get('p90', 0):>7.3f} "
+            f"{latency.get('p99', 0):>7.3f} {entry['peak_rss']['main_mb']:>8.1f}M {entry['peak_rss']['worker_max_mb']:>7.1f}M",
+            file=sys.stderr,
+        )
+
+
+async def run_benchmark(args, corpus_dir, manifest, work_dir):
+    from simple_pdf import server
+    from simple_pdf.executor import get_process_pool_size, shutdown
+
+    import fitz
+
+    pdf_paths = [os.path.join(corpus_dir, item["path"]) for item in manifest["files"]]
+    pages = sum(item["pages"] for item in manifest["files"])
+    selected = args.modes.split(",") if args.modes else [mode[0] for mode in MODES]
+    unknown = set(selected) - {mode[0] for mode in MODES}
+    if unknown:
+        raise SystemExit(f"未知的模式: {', '.join(sorted(unknown))}")
+
+    report = {
+        "benchmark": "simple-pdf-e2e",
+        "version": BENCHMARK_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": get_process_pool_size(),
+        },
+        "corpus": {
+            "path": corpus_dir,
+            "seed": manifest["seed"],
+            "scale": manifest["scale"],
+            "files": len(pdf_paths),
+            "pages": pages,
+            "bytes": sum(os.path.getsize(p) for p in pdf_paths),
+            "kinds": sorted({item["kind"] for item in manifest["files"]}),
+        },
+        "modes": [],
+    }
+    try:
+        # 先启动进程池，进程启动时间不计入第一个模式
+        for future in server.warm_up_process_pool().result():
+            future.result()
+        for mode in MODES:
+            if mode[0] in selected:
+                print(f"running {mode[0]} ...", file=sys.stderr)
+                report["modes"].append(
+                    await run_mode(server, corpus_dir, pdf_paths, pages, mode, work_dir, not args.no_latency)
+                )
+    finally:
+        shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试：在合成语料上运行 6 种批量提取模式")
+    parser.add_argument("--corpus", help="语料目录（不存在或与 seed/scale 不一致时重新生成）；默认使用临时目录")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scale", type=int, default=1, help="语料文件数倍数")
+    parser.add_argument("--workers", type=int, help="工作进程数（设置 PDF_MAX_WORKERS）")
+    parser.add_argument("--modes", help="只运行指定的模式（逗号分隔）：" + ",".join(mode[0] for mode in MODES))
+    parser.add_argument("--no-latency", action="store_true", help="不测量逐文件延迟（省去逐个处理文件的第二遍运行）")
+    parser.add_argument("--output", help="结果 JSON 文件路径；默认输出到标准输出")
+    args = parser.parse_args()
+
+    if args.workers:
+        # 必须在导入服务器、创建进程池之前设置
+        os.environ["PDF_MAX_WORKERS"] = str(args.workers)
+
+    temp_dir = tempfile.mkdtemp(prefix="simple_pdf_bench_")
+    try:
+        corpus_dir = os.path.abspath(args.corpus) if args.corpus else os.path.join(temp_dir, "corpus")
+        print(f"preparing corpus in {corpus_dir} ...", file=sys.stderr)
+        manifest = build_corpus(corpus_dir, args.seed, args.scale)
+        report = asyncio.run(run_benchmark(args, corpus_dir, manifest, os.path.join(temp_dir, "work")))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    _print_table(report)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
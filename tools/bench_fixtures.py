@@ -0,0 +1,130 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from simple_pdf.table_gate import plan_table_detection
+
+# 纯 Python 启发式规则的测试数据（用法见 tools/bench_heuristics.py）
+# 从真实 PDF 页面中截取启发式规则的输入并序列化到磁盘，之后不经过 MuPDF 就能反复运行这些规则：
+#   tables  page.find_tables() 的每个候选表格：bbox 和 table.extract() 的单元格
+#   blocks  page.get_text("dict", sort=True) 的文本块（与 _extract_page 的参数相同，不含图片块）
+#   rects   page.get_drawings() 中参与矢量区域合并的矩形（过滤规则与 _extract_page 相同）
+# 文件格式为 gzip 压缩的 JSON；浮点数按 repr 写出，读回后与截取时逐位相同。
+# 用法:
+#   python tools/bench_fixtures.py fixtures.json.gz a.pdf docs/ ...   # 目录按 **/*.pdf 递归查找
+
+FIXTURE_VERSION = 1
+
+
+class FixtureTable:
+    """表格数据的替身：提供 TableAnalysis 用到的 bbox 和 extract()"""
+
+    def __init__(self, bbox, rows):
+        self.bbox = tuple(bbox)
+        self.rows = rows
+
+    def extract(self):
+        return self.rows
+
+
+def _drawing_rects(page):
+    page_rect = page.rect
+    rects = []
+    for draw in page.get_drawings():
+        r = draw["rect"]
+        # 过滤掉全页背景或极小的噪点
+        if r.width > page_rect.width * 0.95 and r.height > page_rect.height * 0.95:
+            continue
+        if r.width < 5 and r.height < 5:
+            continue
+        rects.append([r.x0, r.y0, r.x1, r.y1])
+    return rects
+
+
+def capture_page(page, name):
+    """截取一页的启发式规则输入；页面上没有任何可用数据时返回 None"""
+    tables = []
+    run, clip = plan_table_detection(page, "always")
+    if run:
+        for t in page.find_tables(clip=clip):
+            try:
+                rows = t.extract()
+            except Exception:
+                continue
+            tables.append({"bbox": list(t.bbox), "rows": rows})
+    blocks = [b for b in page.get_text("dict", sort=True)["blocks"] if b["type"] == 0]
+    rects = _drawing_rects(page)
+    if not (tables or blocks or rects):
+        return None
+    return {"source": name, "page": page.number + 1, "tables": tables, "blocks": blocks, "rects": rects}
+
+
+def _expand_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True))
+        else:
+            yield path
+
+
+def capture(paths, max_pages=0):
+    """截取一组 PDF 的所有页面（max_pages > 0 时每个文件最多截取这么多页）"""
+    pages = []
+    for path in _expand_paths(paths):
+        with fitz.open(path) as doc:
+            for page in doc:
+                if max_pages and page.number >= max_pages:
+                    break
+                data = capture_page(page, os.path.basename(path))
+                if data:
+                    pages.append(data)
+    return {"version": FIXTURE_VERSION, "pages": pages}
+
+
+def save_fixtures(path, fixtures):
+    raw = json.dumps(fixtures, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # mtime=0：相同的输入得到相同的文件
+    with open(path, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(raw)
+
+
+def load_fixtures(path):
+    """
+    读取测试数据。
+    Returns: (fixtures, sha256)；sha256 是解压后内容的哈希，用于确认基线与测试数据对应
+    """
+    with gzip.open(path, "rb") as f:
+        raw = f.read()
+    fixtures = json.loads(raw.decode("utf-8"))
+    if fixtures.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"不支持的测试数据版本: {fixtures.get('version')}")
+    for page in fixtures["pages"]:
+        page["tables"] = [FixtureTable(t["bbox"], t["rows"]) for t in page["tables"]]
+        page["rects"] = [fitz.Rect(r) for r in page["rects"]]
+    return fixtures, hashlib.sha256(raw).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 PDF 页面截取启发式规则的测试数据")
+    parser.add_argument("output", help="输出文件 (.json.gz)")
+    parser.add_argument("pdf", nargs="+", help="PDF 文件或目录")
+    parser.add_argument("--max-pages", type=int, default=0, help="每个文件最多截取的页数（0 表示全部）")
+    args = parser.parse_args()
+    fixtures = capture(args.pdf, args.max_pages)
+    save_fixtures(args.output, fixtures)
+    pages = fixtures["pages"]
+    print(
+        f"{len(pages)} pages, {sum(len(p['tables']) for p in pages)} tables, "
+        f"{sum(len(p['blocks']) for p in pages)} blocks, {sum(len(p['rects']) for p in pages)} rects -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
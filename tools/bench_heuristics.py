@@ -0,0 +1,232 @@
+import argparse
+import gc
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_fixtures import load_fixtures
+from simple_pdf.rect_merge import merge_rects
+from simple_pdf.server import extract_block_text, is_list_item_start, is_valid_table, smart_merge_text, table_to_markdown
+
+# 纯 Python 启发式规则的微基准测试（测试数据由 tools/bench_fixtures.py 生成）
+# 每项测试对全部测试数据运行一轮，重复 --repeat 次取最短耗时；同时记录输出的哈希，
+# 优化启发式规则时可以同时证明输出不变。
+# 用法:
+#   python tools/bench_heuristics.py fixtures.json.gz --save-baseline baseline.json    # 记录基线
+#   python tools/bench_heuristics.py fixtures.json.gz --baseline baseline.json         # 与基线对比
+# 与基线对比时，输出哈希不同或耗时超过基线 (1 + --threshold) 倍的测试会被列出，并以退出码 1 结束。
+# 同一段代码在不同进程中的耗时可能相差很多（内存布局不同，例如字符串 += 能否原地扩展），
+# 因此在 --processes 个新进程中分别测量，每项测试取所有进程中的最短耗时。
+
+BASELINE_VERSION = 1
+DEFAULT_REPEAT = 10
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_PROCESSES = 5
+
+
+def _block_texts(block):
+    """extract_block_text 交给 smart_merge_text 的文本（各 span 直接拼接）"""
+    return "".join(span["text"] for line in block["lines"] for span in line["spans"])
+
+
+def _line_texts(block):
+    return ["".join(span["text"] for span in line["spans"]) for line in block["lines"]]
+
+
+def prepare_inputs(fixtures):
+    """把测试数据展开成各项测试的输入列表（不计入耗时）"""
+    pages = fixtures["pages"]
+    tables = [t for p in pages for t in p["tables"]]
+    blocks = [b for p in pages for b in p["blocks"]]
+    # is_list_item_start 的输入：文本行（段落判断）和表格单元格中的各行（列表单元格判断）
+    list_texts = [text for b in blocks for text in _line_texts(b)]
+    for t in tables:
+        for row in t.rows:
+            for cell in row:
+                if cell:
+                    list_texts.extend(line.strip() for line in str(cell).split("\n") if line.strip())
+    return {
+        "tables": tables,
+        "blocks": blocks,
+        "block_texts": [_block_texts(b) for b in blocks],
+        "list_texts": list_texts,
+        "rect_pages": [p["rects"] for p in pages if p["rects"]],
+    }
+
+
+# 测试名 -> (输入列表名, 对单个输入调用的函数)
+BENCHMARKS = {
+    "is_valid_table": ("tables", is_valid_table),
+    "table_to_markdown": ("tables", table_to_markdown),
+    "smart_merge_text": ("block_texts", smart_merge_text),
+    "is_list_item_start": ("list_texts", is_list_item_start),
+    "extract_block_text": ("blocks", extract_block_text),
+    "merge_rects": ("rect_pages", lambda rects: [tuple(r) for r in merge_rects(rects, threshold=15)]),
+}
+
+
+def _time_rounds(func, items, repeat):
+    """
+    运行 repeat 轮，每轮对所有输入调用一次 func。
+    Returns: (每轮耗时列表, 最后一轮的输出)
+    """
+    times = []
+    outputs = None
+    # 与 timeit 相同，计时期间关闭垃圾回收，避免回收时机不同造成的波动
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = [func(item) for item in items]
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times, outputs
+
+
+def run_benchmark(func, items, repeat):
+    """
+    运行 repeat 轮，每轮对所有输入调用一次 func。
+    Returns: (最短耗时, 中位耗时, 输出的哈希)
+    """
+    times, outputs = _time_rounds(func, items, repeat)
+    digest = hashlib.sha256(repr(outputs).encode("utf-8")).hexdigest()
+    return min(times), statistics.median(times), digest
+
+
+def measure(fixtures_path, names, repeat):
+    """在当前进程中运行指定的测试。Returns: {测试名: {"items", "seconds", "median_seconds", "digest"}}"""
+    fixtures, _ = load_fixtures(fixtures_path)
+    inputs = prepare_inputs(fixtures)
+    results = {}
+    for name in names:
+        input_name, func = BENCHMARKS[name]
+        items = inputs[input_name]
+        best, median, digest = run_benchmark(func, items, repeat)
+        results[name] = {"items": len(items), "seconds": best, "median_seconds": median, "digest": digest}
+    return results
+
+
+def measure_in_processes(fixtures_path, names, repeat, processes):
+    """在 processes 个新进程中分别测量，合并为每项测试的最短耗时和中位耗时的中位数"""
+    runs = []
+    for _ in range(processes):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), fixtures_path, "--only", ",".join(names),
+             "--repeat", str(repeat), "--child"],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output))
+    results = {}
+    for name in names:
+        entries = [run[name] for run in runs]
+        if len({entry["digest"] for entry in entries}) > 1:
+            raise RuntimeError(f"{name}: 不同进程的输出不一致")
+        results[name] = {
+            "items": entries[0]["items"],
+            "seconds": min(entry["seconds"] for entry in entries),
+            "median_seconds": statistics.median(entry["median_seconds"] for entry in entries),
+            "digest": entries[0]["digest"],
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """与基线对比。Returns: 问题列表（为空表示通过）"""
+    problems = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["digest"] != base["digest"]:
+            problems.append(f"{name}: 输出与基线不同")
+        if base["seconds"] and result["seconds"] > base["seconds"] * (1 + threshold):
+            problems.append(
+                f"{name}: {result['seconds'] * 1000:.2f} ms，比基线 {base['seconds'] * 1000:.2f} ms "
+                f"慢 {(result['seconds'] / base['seconds'] - 1) * 100:.0f}%"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="纯 Python 启发式规则的微基准测试")
+    parser.add_argument("fixtures", help="测试数据文件（tools/bench_fixtures.py 生成）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个进程中每项测试的运行轮数")
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES, help="测量的进程数（取所有进程中的最短耗时）")
+    parser.add_argument("--only", help="只运行指定的测试（逗号分隔）：" + ",".join(BENCHMARKS))
+    parser.add_argument("--baseline", help="与该基线文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的耗时增长比例（默认 0.10）")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线文件")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"未知的测试: {', '.join(sorted(unknown))}")
+    if args.child:
+        # 子进程：只输出测量结果
+        print(json.dumps(measure(args.fixtures, names, args.repeat)))
+        return
+
+    _, fixtures_sha = load_fixtures(args.fixtures)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != BASELINE_VERSION or baseline.get("fixtures_sha256") != fixtures_sha:
+            print("Error: 基线不是用这份测试数据生成的", file=sys.stderr)
+            sys.exit(2)
+
+    if args.processes > 1:
+        results = measure_in_processes(args.fixtures, names, args.repeat, args.processes)
+    else:
+        results = measure(args.fixtures, names, args.repeat)
+
+    print(f"{'benchmark':<20} {'items':>7} {'best (ms)':>10} {'median (ms)':>12} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline["results"].get(name) if baseline else None
+        if base and base["seconds"]:
+            change = f"{(result['seconds'] / base['seconds'] - 1) * 100:+.1f}%"
+            if result["digest"] != base["digest"]:
+                change += " DIFF"
+            base_text = f"{base['seconds'] * 1000:.2f}"
+        else:
+            change = base_text = "-"
+        print(
+            f"{name:<20} {result['items']:>7} {result['seconds'] * 1000:>10.2f} "
+            f"{result['median_seconds'] * 1000:>12.2f} {base_text:>10} {change:>8}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": BASELINE_VERSION,
+                    "fixtures_sha256": fixtures_sha,
+                    "repeat": args.repeat,
+                    "processes": args.processes,
+                    "results": results,
+                },
+                f, ensure_ascii=False, indent=2,
+            )
+        print(f"baseline saved: {args.save_baseline}")
+
+    if baseline:
+        problems = compare(results, baseline, args.threshold)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from simple_pdf.rect_merge import merge_rects, _merge_rects_reference
+
+# 矢量图形合并的基准测试：对比网格索引实现 (merge_rects) 与原实现 (_merge_rects_reference)
+# 用法:
+#   python tools/bench_merge_rects.py                 # 合成的密集绘图页面
+#   python tools/bench_merge_rects.py drawing.pdf     # 真实 PDF 的每一页（与提取时相同的过滤规则）
+
+
+def cad_page(n, seed=0):
+    """模拟 CAD 图纸：大量短线段和小图元，分布在若干个设备区域中，另有贯穿全页的水平/垂直线"""
+    rnd = random.Random(seed)
+    centers = [(rnd.uniform(50, 550), rnd.uniform(50, 750)) for _ in range(max(1, n // 400))]
+    rects = []
+    for i in range(n):
+        if i % 50 == 0:
+            y = rnd.uniform(0, 842)
+            rects.append(fitz.Rect(20, y, 575, y))
+            continue
+        cx, cy = rnd.choice(centers)
+        x = cx + rnd.gauss(0, 40)
+        y = cy + rnd.gauss(0, 40)
+        w, h = rnd.uniform(0, 12), rnd.uniform(0, 12)
+        rects.append(fitz.Rect(x, y, x + w, y + h))
+    return rects
+
+
+def schematic_page(n, seed=0):
+    """模拟 A0 电路图/平面图：大量彼此分离的小符号（每个由几条路径组成），区域数很多"""
+    rnd = random.Random(seed)
+    spacing = 40
+    columns = 2384 // spacing
+    rects = []
+    for i in range(n):
+        symbol = i // 4
+        sx = (symbol % columns) * spacing + 10
+        sy = (symbol // columns) * spacing + 10
+        x, y = sx + rnd.uniform(0, 8), sy + rnd.uniform(0, 8)
+        rects.append(fitz.Rect(x, y, x + rnd.uniform(2, 8), y + rnd.uniform(0, 8)))
+    return rects
+
+
+def pdf_pages(path):
+    """真实 PDF 中每一页的绘图矩形（过滤规则与 server._extract_page 相同）"""
+    with fitz.open(path) as doc:
+        for page in doc:
+            page_rect = page.rect
+            rects = []
+            for draw in page.get_drawings():
+                r = draw["rect"]
+                if r.width > page_rect.width * 0.95 and r.height > page_rect.height * 0.95:
+                    continue
+                if r.width < 5 and r.height < 5:
+                    continue
+                rects.append(r)
+            if rects:
+                yield f"{os.path.basename(path)} p{page.number + 1}", rects
+
+
+def timed(func, rects, threshold):
+    start = time.perf_counter()
+    result = func(rects, threshold)
+    return time.perf_counter() - start, result
+
+
+def run_case(name, rects, threshold, max_reference):
+    new_time, new_result = timed(merge_rects, rects, threshold)
+    if len(rects) > max_reference:
+        print(f"{name:<28} {len(rects):>7} {len(new_result):>7} {new_time:>10.3f} {'-':>10} {'-':>8}")
+        return
+    ref_time, ref_result = timed(_merge_rects_reference, rects, threshold)
+    same = [tuple(r) for r in new_result] == [tuple(r) for r in ref_result]
+    speedup = ref_time / new_time if new_time else float("inf")
+    print(f"{name:<28} {len(rects):>7} {len(new_result):>7} {new_time:>10.3f} {ref_time:>10.3f} {speedup:>7.1f}x{'' if same else '  MISMATCH'}")
+    if not same:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="merge_rects 基准测试")
+    parser.add_argument("pdf", nargs="*", help="(可选) 使用真实 PDF 的绘图数据")
+    parser.add_argument("--threshold", type=float, default=15)
+    parser.add_argument("--sizes", default="500,2000,5000,20000", help="合成页面的矩形数")
+    parser.add_argument("--max-reference", type=int, default=2000, help="超过该矩形数时不运行原实现（太慢）")
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'rects':>7} {'regions':>7} {'grid (s)':>10} {'orig (s)':>10} {'speedup':>8}")
+    if args.pdf:
+        for path in args.pdf:
+            for name, rects in pdf_pages(path):
+                run_case(name, rects, args.threshold, args.max_reference)
+        return
+    for n in [int(s) for s in args.sizes.split(",")]:
+        run_case(f"cad n={n}", cad_page(n), args.threshold, args.max_reference)
+        run_case(f"schematic n={n}", schematic_page(n), args.threshold, args.max_reference)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+
+import argparse
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from simple_pdf.server import detect_tables
+from simple_pdf.table_gate import plan_table_detection
+
+# 表格检测预筛选的准确性与耗时对比："auto"（预筛选 + clip）与 "always"（每页整页 find_tables）
+# 用法:
+#   python tools/bench_table_detection.py a.pdf b.pdf ...
+# 两种模式检测到的有效表格（位置和 Markdown）不一致的页面会被列出，并以退出码 1 结束。
+
+
+def page_tables(page, mode):
+    return [(tuple(t.bbox), t.to_markdown()) for t in detect_tables(page, mode)]
+
+
+def run_file(path):
+    with fitz.open(path) as doc:
+        results = {}
+        times = {}
+        for mode in ("always", "auto"):
+            start = time.perf_counter()
+            results[mode] = [page_tables(page, mode) for page in doc]
+            times[mode] = time.perf_counter() - start
+        skipped = sum(1 for page in doc if not plan_table_detection(page, "auto")[0])
+        mismatches = [
+            i + 1 for i, (a, b) in enumerate(zip(results["always"], results["auto"])) if a != b
+        ]
+        tables = sum(len(r) for r in results["always"])
+        speedup = times["always"] / times["auto"] if times["auto"] else float("inf")
+        print(
+            f"{os.path.basename(path)[:28]:<28} {doc.page_count:>6} {skipped:>8} {tables:>7} "
+            f"{times['always']:>10.2f} {times['auto']:>9.2f} {speedup:>7.1f}x"
+            f"{'  MISMATCH pages ' + ','.join(map(str, mismatches)) if mismatches else ''}"
+        )
+        return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="表格检测预筛选对比")
+    parser.add_argument("pdf", nargs="+")
+    args = parser.parse_args()
+
+    print(f"{'file':<28} {'pages':>6} {'skipped':>8} {'tables':>7} {'always (s)':>10} {'auto (s)':>9} {'speedup':>8}")
+    ok = True
+    for path in args.pdf:
+        ok = run_file(path) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from simple_pdf import server
+
+# 分片临时文件清理检查
+# 大文件分片处理时，任一分片失败则该文件不会拼接；检查此时所有 <输出文件>.partN 临时文件都被删除，
+# 不会留在输出目录中（失败的文件从清单中移除，每次重试都会再留下一批）。
+# 分片直接在本进程中运行：前几个分片正常完成，最后一个分片的页码范围超出文档页数，处理到越界页面时失败。
+# 另外检查所有分片成功时拼接后同样没有临时文件残留。检查失败时以退出码 1 结束。
+# 用法:
+#   python tools/check_shard_cleanup.py [--pages 12] [--shard-pages 4] [--format markdown]
+
+
+def _build_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}", fontsize=14)
+        page.insert_text((72, 100), "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 2, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def _run_file(pdf_path, output_dir, pages, shard_pages, format, fail_last):
+    """在本进程中依次运行各分片并拼接，Returns: (success, error)"""
+    args = (pdf_path, format, True, False, True, output_dir, None, False, False, output_dir, False)
+    ranges = [(start, min(start + shard_pages, pages)) for start in range(0, pages, shard_pages)]
+    if fail_last:
+        # 最后一个分片越过文档末尾，处理到第 pages + 1 页时失败（此时分片临时文件已开始写入）
+        start, end = ranges[-1]
+        ranges[-1] = (start, end + 1)
+    shard_results = [
+        server._process_pdf_shard_worker(args + (shard_index, start, end))
+        for shard_index, (start, end) in enumerate(ranges)
+    ]
+    result = asyncio.run(server._finish_sharded_file(
+        pdf_path, pages, shard_results, format, True, False, True, False
+    ))
+    return result[0], result[3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片临时文件清理检查：强制一个分片失败，确认不残留 .part 临时文件")
+    parser.add_argument("--pages", type=int, default=12, help="测试文档的页数")
+    parser.add_argument("--shard-pages", type=int, default=4, help="每个分片的页数")
+    parser.add_argument("--format", default="markdown", help="输出格式")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "sharded.pdf")
+        _build_pdf(pdf_path, args.pages)
+        for fail_last in (True, False):
+            output_dir = os.path.join(tmp, "out_fail" if fail_last else "out_ok")
+            os.makedirs(output_dir)
+            success, error = _run_file(pdf_path, output_dir, args.pages, args.shard_pages, args.format, fail_last)
+            label = "分片失败" if fail_last else "全部成功"
+            if success == fail_last:
+                failures.append(f"{label}: 处理结果不符合预期 (success={success}, error={error})")
+            leftovers = sorted(glob.glob(os.path.join(output_dir, "**", "*.part*"), recursive=True))
+            if leftovers:
+                failures.append(f"{label}: 残留分片临时文件 {', '.join(os.path.basename(p) for p in leftovers)}")
+            print(f"{label}: success={success}, error={error}, 残留临时文件 {len(leftovers)} 个")
+    server.shutdown_executor()
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from simple_pdf.image_store import get_shared_image_dir, prune_shared_images, write_image_file
+
+# 共享图片清理检查
+# 批量处理的图片按内容保存在 .shared_images/ 中，各 PDF 图片目录中的文件是指向它的硬链接。
+# 检查 prune_shared_images 只删除不再被任何图片目录引用的内容：
+#   仍被某个图片目录链接的共享图片必须保留（Windows 上 DirEntry.stat() 的 st_nlink 始终为 0，曾导致全部被删除），
+#   图片目录被删除、或图片被替换为其他内容之后，不再被引用的共享图片必须删除。
+# 文件系统不支持硬链接时无法检查，直接跳过。检查失败时以退出码 1 结束。
+# 用法:
+#   python tools/check_shared_images.py [--dir DIR]
+
+
+def _shared_files(shared_dir):
+    return sorted(os.listdir(shared_dir)) if os.path.isdir(shared_dir) else []
+
+
+def run_checks(base_dir):
+    """Returns: 失败原因列表；文件系统不支持硬链接时返回 None"""
+    shared_dir = get_shared_image_dir(base_dir)
+    kept_dir = os.path.join(base_dir, "a_images")
+    removed_dir = os.path.join(base_dir, "b_images")
+    os.makedirs(kept_dir)
+    os.makedirs(removed_dir)
+
+    # a 和 b 共用一张图片，b 另有一张独有的图片
+    write_image_file(os.path.join(kept_dir, "page_1_img_1.png"), b"shared-image", "png", shared_dir)
+    write_image_file(os.path.join(removed_dir, "page_1_img_1.png"), b"shared-image", "png", shared_dir)
+    write_image_file(os.path.join(removed_dir, "page_2_img_1.png"), b"only-in-b", "png", shared_dir)
+    if os.stat(os.path.join(kept_dir, "page_1_img_1.png")).st_nlink < 2:
+        return None
+
+    failures = []
+    # 所有共享图片都仍被引用：不应删除任何文件
+    before = _shared_files(shared_dir)
+    removed = prune_shared_images(shared_dir)
+    if removed or _shared_files(shared_dir) != before:
+        failures.append(f"仍被引用的共享图片被删除 ({removed} 个)")
+
+    # 删除 b 的图片目录：只有 b 独有的图片不再被引用
+    shutil.rmtree(removed_dir)
+    removed = prune_shared_images(shared_dir)
+    if removed != 1 or len(_shared_files(shared_dir)) != 1:
+        failures.append(f"删除图片目录后应清理 1 个共享图片，实际 {removed} 个，剩余 {len(_shared_files(shared_dir))} 个")
+    if not os.path.exists(os.path.join(kept_dir, "page_1_img_1.png")):
+        failures.append("图片目录中的文件被删除")
+
+    # a 的图片被替换为其他内容（重新提取修改过的 PDF）：旧内容不再被引用
+    write_image_file(os.path.join(kept_dir, "page_1_img_1.png"), b"changed-image", "png", shared_dir)
+    removed = prune_shared_images(shared_dir)
+    if removed != 1 or len(_shared_files(shared_dir)) != 1:
+        failures.append(f"图片被替换后应清理 1 个共享图片，实际 {removed} 个，剩余 {len(_shared_files(shared_dir))} 个")
+    with open(os.path.join(kept_dir, "page_1_img_1.png"), "rb") as f:
+        if f.read() != b"changed-image":
+            failures.append("图片目录中的文件内容不正确")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享图片清理检查：仍被图片目录链接的共享图片在清理后必须保留")
+    parser.add_argument("--dir", help="在该目录下创建测试文件（检查硬链接行为与输出目录所在的文件系统一致）；默认使用临时目录")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        failures = run_checks(tmp)
+    if failures is None:
+        print("文件系统不支持硬链接，跳过检查")
+        return
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()